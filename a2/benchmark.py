@@ -0,0 +1,1050 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for route_manager.py
+Sample input: ./benchmark.py cache, ./benchmark.py stream 10000000, ./benchmark.py parse 10000000 8, ./benchmark.py sweep 10 4, 
+./benchmark.py suite 1 10 --RESULTS="baseline.json", ./benchmark.py suite 1 10 --BASELINE="baseline.json"
+"""
+
+import collections
+import copy
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import yaml
+
+import route_client
+import route_manager
+
+
+DATA_FOLDER = os.path.dirname(os.path.abspath(__file__))
+AIRLINES = os.path.join(DATA_FOLDER, 'airlines.yaml')
+AIRPORTS = os.path.join(DATA_FOLDER, 'airports.yaml')
+ROUTES = os.path.join(DATA_FOLDER, 'routes.yaml')
+
+
+def timed(function, *args, **kwargs):
+    """Calls function and returns its result together with the elapsed wall time in seconds"""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def print_row(label: str, seconds: float) -> None:
+    """Prints one line of benchmark output"""
+    print(f'{label:<40} {seconds * 1000:10.1f} ms')
+
+
+def bench_cache(repeat: int = 3) -> None:
+    """Compares loading the bundled yaml files without (cold) and with (warm) the columnar cache"""
+    shutil.rmtree(os.path.join(DATA_FOLDER, route_manager.CACHE_DIRECTORY), ignore_errors=True)
+    cold, cold_seconds = timed(route_manager.load_datasets, AIRLINES, AIRPORTS, ROUTES)
+    print_row('cold load (yaml parse + cache write)', cold_seconds)
+
+    best = float('inf')
+    for _ in range(repeat):
+        warm, warm_seconds = timed(route_manager.load_datasets, AIRLINES, AIRPORTS, ROUTES)
+        best = min(best, warm_seconds)
+    print_row('warm load (memory-mapped cache)', best)
+    print(f'{"speedup":<40} {cold_seconds / best:10.1f} x')
+
+    for cold_frame, warm_frame in zip(cold, warm):
+        if not cold_frame.equals(warm_frame):
+            print('ERROR: cached dataset differs from the parsed yaml')
+            sys.exit(1)
+
+
+def write_synthetic_routes(path: str, count: int, seed: int = 265) -> None:
+    """Writes a routes.yaml with count random routes between ids found in the bundled files"""
+    generator = random.Random(seed)
+    with open(path, 'w') as file:
+        file.write('routes:\n')
+        for _ in range(count):
+            file.write(
+                f"- route_airline_id: '{generator.randint(1, 20000)}'\n"
+                f"  route_from_aiport_id: '{generator.randint(1, 10000)}'\n"
+                f"  route_to_airport_id: '{generator.randint(1, 10000)}'\n"
+            )
+
+
+PEAK_MEMORY_SCRIPT = """
+import json, sys, tracemalloc
+import route_manager
+
+def status_kb(field):
+    with open('/proc/self/status') as file:
+        return next(int(line.split()[1]) for line in file if line.startswith(field + ':'))
+
+try:
+    # Resets the peak RSS, so that the imports above do not count (Linux 4.0 and later)
+    with open('/proc/self/clear_refs', 'w') as file:
+        file.write('5')
+    before = status_kb('VmRSS')
+except OSError:
+    # tracemalloc also sees the numpy buffers, but slows the parser down a lot
+    before = None
+    tracemalloc.start()
+routes = route_manager.read_routes(sys.argv[1], int(sys.argv[2]))
+if before is None:
+    peak_kb, method = tracemalloc.get_traced_memory()[1] / 1024, 'tracemalloc'
+else:
+    peak_kb, method = status_kb('VmHWM') - before, 'peak RSS'
+print(json.dumps({'rows': len(routes), 'peak_kb': peak_kb, 'method': method}))
+"""
+
+
+def check_count_routes(count: int = 50) -> None:
+    """Checks count_routes against the parsed routes with blocks so small that the item separators 
+       fall across block boundaries at every offset"""
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'routes.yaml')
+        write_synthetic_routes(path, count)
+        parsed = len(route_manager.read_routes(path))
+        for block_size in range(1, 8):
+            counted = route_manager.count_routes(path, block_size)
+            if counted != parsed:
+                print(f'ERROR: count_routes counted {counted} of {parsed} routes with {block_size} byte blocks')
+                sys.exit(1)
+
+
+def bench_stream(count: int = 10000000, chunk_size: int = route_manager.ROUTE_CHUNK_SIZE) -> None:
+    """Streams a synthetic routes file of 10 million routes (or count) in a fresh process, checks 
+       that count_routes counts items split between blocks and that the peak memory growth while 
+       reading stays close to the size of the int32 columns"""
+    check_count_routes()
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'routes.yaml')
+        write_synthetic_routes(path, count)
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, '-c', PEAK_MEMORY_SCRIPT, path, str(chunk_size)],
+            cwd=DATA_FOLDER, capture_output=True, text=True, check=True
+        ).stdout
+        seconds = time.perf_counter() - start
+    result = json.loads(output)
+    columns_kb = count * len(route_manager.ROUTE_COLUMNS) * 4 / 1024
+    print_row(f'stream {count} routes', seconds)
+    print(f'{"peak memory growth (" + result["method"] + ")":<40} {result["peak_kb"] / 1024:10.1f} MB')
+    print(f'{"int32 columns":<40} {columns_kb / 1024:10.1f} MB')
+
+    # Columns plus one chunk of parsed rows, with slack for the parser
+    if result['rows'] != count or result['peak_kb'] > columns_kb + 16 * 1024:
+        print('ERROR: streaming loader used more memory than expected')
+        sys.exit(1)
+
+
+def bench_parse(count: int = 1000000, workers: int = 0) -> None:
+    """Parses the bundled airlines.yaml and airports.yaml with a synthetic routes.yaml of count routes, 
+       one file after the other and then with parse_datasets on 2, 4, ... up to workers processes 
+       (the number of CPUs by default), checks that the columns are the same and reports the speedup, 
+       e.g. ./benchmark.py parse 10000000 8"""
+    workers = workers or os.cpu_count() or 1
+    keys = ('airlines', 'airports', 'routes')
+    print(f'{"yaml loader":<40} {route_manager.yaml_loader().__name__:>10}')
+    with tempfile.TemporaryDirectory() as folder:
+        paths = {key: os.path.join(folder, f'{key}.yaml') for key in keys}
+        shutil.copy(AIRLINES, paths['airlines'])
+        shutil.copy(AIRPORTS, paths['airports'])
+        write_synthetic_routes(paths['routes'], count)
+
+        expected, serial = timed(lambda: {key: route_manager.parse_dataset(path, key) for key, path in paths.items()})
+        print_row(f'parse {count} routes, 1 process', serial)
+        processes = 2
+        while processes <= max(workers, 2):
+            frames, seconds = timed(route_manager.parse_datasets, paths, processes)
+            print_row(f'parse {count} routes, {processes} processes', seconds)
+            print(f'{"speedup":<40} {serial / seconds:10.2f}x')
+            for key in keys:
+                if not frames[key].equals(expected[key]):
+                    print(f'ERROR: {key} parsed by {processes} processes differs from the serial parse')
+                    sys.exit(1)
+            processes *= 2
+
+
+RUN_SCRIPT = """
+import json, resource, sys
+import route_manager
+route_manager.run(route_manager.parse_args(sys.argv[1:]))
+print(json.dumps({'peak_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+"""
+
+
+def bench_outofcore(count: int = 5000000, chunk_size: int = route_manager.ROUTE_CHUNK_SIZE) -> None:
+    """Answers q1 to q4 over a synthetic routes file of count routes in memory and with --OUT_OF_CORE, 
+       in fresh processes, reports their peak RSS next to the size of the route columns and checks 
+       that the csv files are the same, e.g. ./benchmark.py outofcore 20000000"""
+    with tempfile.TemporaryDirectory() as folder:
+        shutil.copy(AIRLINES, os.path.join(folder, 'airlines.yaml'))
+        shutil.copy(AIRPORTS, os.path.join(folder, 'airports.yaml'))
+        write_synthetic_routes(os.path.join(folder, 'routes.yaml'), count)
+        arguments = [
+            f'--{name}={os.path.join(folder, name.lower() + ".yaml")}' for name in ('AIRLINES', 'AIRPORTS', 'ROUTES')
+        ] + ['--QUESTION=q1,q2,q3,q4', '--GRAPH_TYPE=none']
+
+        peaks = {}
+        for mode, extra in (('in memory', []), ('out of core', [f'--OUT_OF_CORE={chunk_size}'])):
+            output = os.path.join(folder, mode.replace(' ', '_'))
+            os.mkdir(output)
+            start = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, '-c', RUN_SCRIPT] + arguments + extra + [f'--OUTPUT={output}'], 
+                cwd=DATA_FOLDER, capture_output=True, text=True, check=True
+            ).stdout
+            print_row(f'q1-q4 {mode}, {count} routes', time.perf_counter() - start)
+            peaks[mode] = json.loads(result.splitlines()[-1])['peak_kb'] / 1024
+            print(f'{"peak RSS " + mode:<40} {peaks[mode]:10.1f} MB')
+
+        same = folder_contents(os.path.join(folder, 'in_memory')) == folder_contents(os.path.join(folder, 'out_of_core'))
+    columns_mb = count * len(route_manager.ROUTE_COLUMNS) * 4 / 1024 / 1024
+    print(f'{"int32 route columns":<40} {columns_mb:10.1f} MB')
+
+    if not same:
+        print('ERROR: the out-of-core csv files differ from the in-memory ones')
+        sys.exit(1)
+
+
+def replicate_routes(routes: pd.DataFrame, factor: int) -> pd.DataFrame:
+    """Returns the routes repeated factor times"""
+    return pd.DataFrame({name: np.tile(routes[name].to_numpy(), factor) for name in routes.columns})
+
+
+def merge_counts(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame) -> tuple:
+    """Destination country and Canadian airline counts with pd.merge on string ids, the way 
+       route_manager.py computed them before the dense indexes"""
+    destination = pd.merge(routes, airports, left_on='route_to_airport_id', right_on='airport_id')
+    with_airlines = pd.merge(destination, airlines, left_on='route_airline_id', right_on='airline_id')
+    countries = destination['airport_country'].value_counts()
+    canadian = with_airlines[with_airlines['airport_country'] == 'Canada']['airline_name'].value_counts()
+    return countries, canadian
+
+
+def index_counts(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame) -> tuple:
+    """The same counts as merge_counts through the dense indexes of route_manager.py"""
+    joins = {}
+    destination_rows = route_manager.join_routes(airlines, airports, routes, joins, 'destination')
+    airline_rows = route_manager.join_routes(airlines, airports, routes, joins, 'airline')
+    country_codes, country_rows = route_manager.group_codes(airports, joins, ['airport_country'])
+    countries = route_manager.count_codes(country_codes, destination_rows[destination_rows >= 0], len(country_rows))
+
+    matched = (destination_rows >= 0) & (airline_rows >= 0)
+    canadian_airports = (airports['airport_country'] == 'Canada').to_numpy()
+    canadian_rows = airline_rows[matched][canadian_airports[destination_rows[matched]]]
+    name_codes, name_rows = route_manager.group_codes(airlines, joins, ['airline_name'])
+    canadian = route_manager.count_codes(name_codes, canadian_rows, len(name_rows))
+
+    countries = pd.Series(countries, index=airports['airport_country'].to_numpy()[country_rows])
+    canadian = pd.Series(canadian, index=airlines['airline_name'].to_numpy()[name_rows])
+    return countries[countries > 0], canadian[canadian > 0]
+
+
+def with_string_ids(frame: pd.DataFrame) -> pd.DataFrame:
+    """Returns a copy of frame with its int32 id columns turned back into the strings of the yaml files"""
+    frame = frame.copy()
+    for name in frame.columns:
+        if name.endswith('_id'):
+            frame[name] = frame[name].astype(str)
+    return frame
+
+
+def bench_index(repeat: int = 3) -> None:
+    """Compares the dense index joins with pd.merge on string ids at 1x, 10x and 100x the bundled routes"""
+    airlines, airports, routes = route_manager.load_datasets(AIRLINES, AIRPORTS, ROUTES)
+    string_airlines = with_object_strings(with_string_ids(airlines))
+    string_airports = with_object_strings(with_string_ids(airports))
+    for factor in (1, 10, 100):
+        scaled = replicate_routes(routes, factor)
+        string_routes = with_string_ids(scaled)
+        merged = min(timed(merge_counts, string_airlines, string_airports, string_routes)[1] for _ in range(repeat))
+        indexed = min(timed(index_counts, airlines, airports, scaled)[1] for _ in range(repeat))
+        print_row(f'{factor}x routes, pd.merge', merged)
+        print_row(f'{factor}x routes, dense index', indexed)
+        print(f'{"speedup":<40} {merged / indexed:10.1f} x')
+
+        expected = merge_counts(string_airlines, string_airports, string_routes)
+        for old, new in zip(expected, index_counts(airlines, airports, scaled)):
+            if not old.sort_index().equals(new.sort_index().rename(old.name).rename_axis(old.index.name)):
+                print('ERROR: dense index counts differ from pd.merge')
+                sys.exit(1)
+
+
+def check_build_subject() -> None:
+    """Checks build_subject against formatting every row on its own, with missing strings in 
+       categorical and object columns and missing numbers"""
+    data = pd.DataFrame({
+        'airport_city': pd.Categorical(['Toronto', None, 'Montreal']),
+        'airport_country': ['Canada', 'Canada', None],
+        'statistic': [1.5, np.nan, 3.0]
+    })
+    # What formatting the rows one at a time gave, with the yaml nulls as None
+    expected = ['Toronto, Canada (1.5)', 'None, Canada (nan)', 'Montreal, None (3.0)']
+    built = route_manager.build_subject(data, '{airport_city}, {airport_country} ({statistic})').tolist()
+    if built != expected:
+        print(f'ERROR: build_subject gave {built} instead of {expected}')
+        sys.exit(1)
+
+
+def bench_topk(trials: int = 500, rows: int = 1000000) -> None:
+    """Checks top_k against a full stable sort on random frames with many ties and missing values, 
+       and the labels build_subject makes of the selected rows, then times top_k and the sort on a 
+       large frame"""
+    check_build_subject()
+    generator = np.random.default_rng(265)
+    for trial in range(trials):
+        size = int(generator.integers(0, 60))
+        data = pd.DataFrame({
+            'statistic': generator.integers(0, 5, size).astype(np.float64),
+            'name': generator.choice(['a', 'b', 'c', 'd'], size),
+            'other': generator.integers(0, 3, size)
+        })
+        data.loc[generator.random(size) < 0.1, 'statistic'] = np.nan
+        k = int(generator.integers(0, 40))
+        by = [['statistic'], ['statistic', 'name'], ['statistic', 'name', 'other']][trial % 3]
+        ascending = [bool(value) for value in generator.integers(0, 2, len(by))]
+        expected = data.sort_values(by=by, ascending=ascending, kind='stable').head(k)
+        if not route_manager.top_k(data, k, by, ascending).equals(expected):
+            print(f'ERROR: top_k differs from sort_values on trial {trial}')
+            sys.exit(1)
+    print(f'{"random trials matching sort_values":<40} {trials:10d}')
+
+    data = pd.DataFrame({
+        'statistic': generator.integers(0, rows, rows),
+        'name': generator.integers(0, rows, rows).astype(str)
+    })
+    by, ascending = ['statistic', 'name'], [False, True]
+    sorted_seconds = min(timed(lambda: data.sort_values(by=by, ascending=ascending).head(20))[1] for _ in range(3))
+    selected_seconds = min(timed(route_manager.top_k, data, 20, by, ascending)[1] for _ in range(3))
+    print_row(f'sort_values + head(20), {rows} rows', sorted_seconds)
+    print_row(f'top_k(20), {rows} rows', selected_seconds)
+
+
+def same_as_expected(folder: str, questions: list, expected_folder: str = os.path.join(DATA_FOLDER, 'tests')) -> bool:
+    """Checks the csv files written to folder against the expected ones in tests/, or in expected_folder"""
+    for question in questions:
+        with open(os.path.join(folder, f'{question}.csv'), 'rb') as written:
+            with open(os.path.join(expected_folder, f'{question}.csv'), 'rb') as expected:
+                if written.read() != expected.read():
+                    return False
+    return True
+
+
+def bench_server(clients: int = 8, requests: int = 5) -> None:
+    """Compares a cold command line run with warm requests to a server, then sends requests from 
+       several clients at once and checks every answer. Every other request filters the airports, 
+       so clients build the joins of the same filter at the same time"""
+    dataset_arguments = [f'--AIRLINES={AIRLINES}', f'--AIRPORTS={AIRPORTS}', f'--ROUTES={ROUTES}']
+    airlines, airports, routes = route_manager.load_datasets(AIRLINES, AIRPORTS, ROUTES)
+    # Both keep Canadian airports, so q1 and q5 have routes to draw
+    airport_filters = [{'country': 'Canada'}, {'min_alt': 1000.0}]
+    with tempfile.TemporaryDirectory() as folder:
+        for number, airport_filter in enumerate(airport_filters):
+            os.makedirs(os.path.join(folder, f'filter{number}'))
+            route_manager.solve(airlines, airports, routes, 'all', 'none', {}, os.path.join(folder, f'filter{number}'), 
+                                airport_filter=airport_filter)
+        socket_path = os.path.join(folder, 'route_manager.sock')
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(DATA_FOLDER, 'route_manager.py'), *dataset_arguments, f'--SERVE={socket_path}']
+        )
+        try:
+            _, cli_seconds = timed(
+                subprocess.run,
+                [sys.executable, os.path.join(DATA_FOLDER, 'route_manager.py'), *dataset_arguments, '--QUESTION=q1', '--GRAPH_TYPE=none'],
+                cwd=folder, check=True
+            )
+            while not os.path.exists(socket_path):
+                time.sleep(0.05)
+            _, client_seconds = timed(
+                subprocess.run,
+                [sys.executable, os.path.join(DATA_FOLDER, 'route_client.py'), *dataset_arguments, '--QUESTION=q1', 
+                 '--GRAPH_TYPE=none', f'--SOCKET={socket_path}'],
+                cwd=folder, check=True
+            )
+            request = {'airlines': AIRLINES, 'airports': AIRPORTS, 'routes': ROUTES, 'question': 'q1', 
+                       'graph_type': 'none', 'output': folder}
+            request_seconds = min(timed(route_client.send_request, socket_path, request)[1] for _ in range(10))
+            print_row('cold command line, q1', cli_seconds)
+            print_row('warm server through route_client.py, q1', client_seconds)
+            print_row('warm server request, q1', request_seconds)
+
+            failures = []
+            latencies = []
+
+            def client(number: int) -> None:
+                output = os.path.join(folder, f'client{number}')
+                os.makedirs(output)
+                for index in range(requests):
+                    question = f'q{(number + index) % 5 + 1}'
+                    graph_type = ['none', 'bar', 'pie'][index % 3]
+                    filtered = index % 2 == 1
+                    response, seconds = timed(route_client.send_request, socket_path, dict(
+                        request, question=question, graph_type=graph_type, output=output, 
+                        filter=airport_filters[number % 2] if filtered else {}
+                    ))
+                    latencies.append(seconds)
+                    expected = os.path.join(folder, f'filter{number % 2}') if filtered else os.path.join(DATA_FOLDER, 'tests')
+                    if response['status'] != 'ok' or not same_as_expected(output, [question], expected):
+                        failures.append((number, question, response))
+
+            def run_clients() -> None:
+                threads = [threading.Thread(target=client, args=(number,)) for number in range(clients)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+
+            _, total_seconds = timed(run_clients)
+            print_row(f'{clients} clients x {requests} requests, wall', total_seconds)
+            print_row('median request latency', sorted(latencies)[len(latencies) // 2])
+            if failures:
+                print(f'ERROR: concurrent requests failed: {failures[:3]}')
+                sys.exit(1)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def import_time(statement: str, module: str) -> float:
+    """Runs statement in a fresh interpreter with -X importtime and returns the cumulative import 
+       time of module in seconds, or 0 if it was never imported"""
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=DATA_FOLDER, capture_output=True, text=True, check=True
+    ).stderr
+    for line in stderr.splitlines():
+        fields = [field.strip() for field in line.split('|')]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]) / 1e6
+    return 0.0
+
+
+def bench_startup(repeat: int = 3) -> None:
+    """Shows the import cost route_manager.py avoids by loading matplotlib only when a graph is drawn, 
+       against an eager import matplotlib.pyplot at startup, and checks that importing route_manager 
+       does not load matplotlib"""
+    manager = min(import_time('import route_manager', 'route_manager') for _ in range(repeat))
+    eager = min(import_time('import route_manager; import matplotlib.pyplot', 'matplotlib.pyplot') for _ in range(repeat))
+    figure = min(import_time('import route_manager; route_manager.new_figure()', 'matplotlib.figure') for _ in range(repeat))
+    print_row('import route_manager', manager)
+    print_row('import matplotlib.pyplot at startup', eager)
+    print_row('startup with matplotlib imported eagerly', manager + eager)
+    print_row('matplotlib when a graph is drawn', figure)
+    if import_time('import route_manager', 'matplotlib'):
+        print('ERROR: importing route_manager loads matplotlib')
+        sys.exit(1)
+
+    dataset_arguments = [f'--AIRLINES={AIRLINES}', f'--AIRPORTS={AIRPORTS}', f'--ROUTES={ROUTES}']
+    route_manager.load_datasets(AIRLINES, AIRPORTS, ROUTES)
+    with tempfile.TemporaryDirectory() as folder:
+        for graph_type in ('none', 'bar'):
+            seconds = min(timed(
+                subprocess.run,
+                [sys.executable, os.path.join(DATA_FOLDER, 'route_manager.py'), *dataset_arguments, 
+                 '--QUESTION=q1', f'--GRAPH_TYPE={graph_type}'],
+                cwd=folder, check=True
+            )[1] for _ in range(repeat))
+            print_row(f'command line, q1, --GRAPH_TYPE={graph_type}', seconds)
+
+
+def bench_render(workers: int = 0) -> None:
+    """Draws the bar and pie graphs of all five questions one by one and with a process pool, and 
+       checks that both give the same files"""
+    workers = workers or os.cpu_count() or 1
+    airlines, airports, routes = route_manager.load_datasets(AIRLINES, AIRPORTS, ROUTES)
+    with tempfile.TemporaryDirectory() as folder:
+        contents = {}
+        for label, count in (('serial', 1), (f'pool of {max(workers, 2)}', max(workers, 2))):
+            seconds = 0.0
+            for graph_type in ('bar', 'pie'):
+                output = os.path.join(folder, f'{count}-{graph_type}')
+                os.makedirs(output)
+                seconds += timed(route_manager.solve, airlines, airports, routes, 'all', graph_type, 
+                                 output=output, workers=count)[1]
+                for question in range(1, 6):
+                    with open(os.path.join(output, f'q{question}.pdf'), 'rb') as file:
+                        contents.setdefault((graph_type, question), set()).add(file.read())
+            print_row(f'10 graphs, {label}', seconds)
+    if any(len(versions) != 1 for versions in contents.values()):
+        print('ERROR: graphs drawn by the pool differ from the serial ones')
+        sys.exit(1)
+
+
+def write_route_delta(path: str, added: pd.DataFrame, removed: pd.DataFrame) -> None:
+    """Writes a delta file for route_manager.apply_route_delta"""
+    def records(routes: pd.DataFrame) -> list:
+        return [{name: str(value) for name, value in row.items()} for row in routes.to_dict('records')]
+    with open(path, 'w') as file:
+        yaml.safe_dump({'added': records(added), 'removed': records(removed)}, file)
+
+
+def bench_aggregates(factor: int = 100, delta: int = 1000) -> None:
+    """Updates an aggregate store with a delta file, compares that with recounting all routes and 
+       checks the store and the csv files it gives against the full recount, and that a delta 
+       applied twice or removing routes that were never counted is rejected"""
+    airlines, airports, routes = route_manager.load_datasets(AIRLINES, AIRPORTS, ROUTES)
+    routes = replicate_routes(routes, factor)
+    base = routes.iloc[:-delta]
+    added = routes.iloc[-delta:]
+    removed = base.iloc[:delta // 2]
+    final = pd.concat([base.iloc[delta // 2:], added], ignore_index=True)
+
+    # The joins of the airlines and airports are shared, as in solve_from_aggregates
+    joins = {}
+    store = route_manager.build_aggregates(AIRLINES, AIRPORTS, airlines, airports, base, joins)
+    mismatches = []
+    with tempfile.TemporaryDirectory() as folder:
+        delta_path = os.path.join(folder, 'delta.yaml')
+        write_route_delta(delta_path, added, removed)
+        _, parse_seconds = timed(route_manager.read_route_delta, delta_path)
+        _, delta_seconds = timed(route_manager.apply_route_delta, store, airlines, airports, delta_path, joins)
+        _, full_seconds = timed(route_manager.route_counters, airlines, airports, final, joins)
+        print_row(f'apply delta of {delta + delta // 2} routes', delta_seconds)
+        print_row('  of which parsing the delta file', parse_seconds)
+        print_row(f'recount all {len(final)} routes', full_seconds)
+
+        # Applying the delta again, or removing its routes from a store that never counted them
+        empty = route_manager.build_aggregates(AIRLINES, AIRPORTS, airlines, airports, base.iloc[:0], joins)
+        for label, target in (('applied twice', store), ('never counted', empty)):
+            counters = copy.deepcopy(target['counters'])
+            try:
+                route_manager.apply_route_delta(target, airlines, airports, delta_path, joins)
+                mismatches.append(f'delta {label} accepted')
+            except ValueError as error:
+                print(f'rejected, {label}: {error}')
+            if target['counters'] != counters:
+                mismatches.append(f'delta {label} changed the store')
+
+        mismatches += route_manager.verify_aggregates(store, airlines, airports, final, joins)
+        questions = 'q1,q2,q3,q4'
+        question_joins = {}
+        route_manager.aggregate_joins(store, airlines, airports, question_joins)
+        os.makedirs(os.path.join(folder, 'store'))
+        os.makedirs(os.path.join(folder, 'full'))
+        route_manager.solve(airlines, airports, final.iloc[:0], questions, 'none', question_joins, os.path.join(folder, 'store'))
+        route_manager.solve(airlines, airports, final, questions, 'none', output=os.path.join(folder, 'full'))
+        for question in questions.split(','):
+            with open(os.path.join(folder, 'store', f'{question}.csv')) as store_csv:
+                with open(os.path.join(folder, 'full', f'{question}.csv')) as full_csv:
+                    if store_csv.read() != full_csv.read():
+                        mismatches.append(f'{question}.csv')
+    if mismatches:
+        print(f'ERROR: aggregate store differs from a full recount for {mismatches}')
+        sys.exit(1)
+
+
+def folder_contents(folder: str) -> dict:
+    """Reads every file of a folder, keyed by file name"""
+    contents = {}
+    for name in sorted(os.listdir(folder)):
+        with open(os.path.join(folder, name), 'rb') as file:
+            contents[name] = file.read()
+    return contents
+
+
+def bench_sweep(factor: int = 10, workers: int = 0) -> None:
+    """Sweeps q1 and q5 over every country with 1, 2, 4, ... worker processes up to the number 
+       of CPUs, compares that with solving the countries one by one, and checks that all give 
+       the same csv files"""
+    workers = workers or os.cpu_count() or 1
+    airlines, airports, routes = route_manager.load_datasets(AIRLINES, AIRPORTS, ROUTES)
+    routes = replicate_routes(routes, factor)
+    countries = sorted(airports['airport_country'].dropna().unique())
+    counts = sorted({1, 2, workers} | {2 ** power for power in range(workers.bit_length()) if 2 ** power < workers})
+
+    with tempfile.TemporaryDirectory() as folder:
+        contents = []
+        for count in counts:
+            output = os.path.join(folder, f'sweep-{count}')
+            os.makedirs(output)
+            _, seconds = timed(route_manager.sweep_countries, airlines, airports, routes, ['q1', 'q5'], 
+                               output=output, workers=count)
+            print_row(f'sweep {len(countries)} countries, {count} workers', seconds)
+            contents.append(folder_contents(output))
+
+        output = os.path.join(folder, 'one-by-one')
+        os.makedirs(output)
+        joins = {}
+        start = time.perf_counter()
+        for country in countries:
+            route_manager.solve(airlines, airports, routes, 'q1,q5', 'none', joins, output, country=country)
+            for question in ('q1', 'q5'):
+                os.replace(os.path.join(output, f'{question}.csv'), 
+                           route_manager.country_filename(output, question, country))
+        print_row(f'{len(countries)} countries one by one', time.perf_counter() - start)
+        contents.append(folder_contents(output))
+
+    if any(version != contents[0] for version in contents):
+        print('ERROR: sweeps with different numbers of workers give different csv files')
+        sys.exit(1)
+
+
+def with_object_strings(frame: pd.DataFrame) -> pd.DataFrame:
+    """Returns a copy of frame with its categorical columns turned back into Python strings"""
+    frame = frame.copy()
+    for name in frame.columns:
+        if isinstance(frame[name].dtype, pd.CategoricalDtype):
+            frame[name] = frame[name].astype(object)
+    return frame
+
+
+def frame_mb(*frames: pd.DataFrame) -> float:
+    """Returns the memory held by DataFrames, strings included, in MB"""
+    return sum(frame.memory_usage(deep=True).sum() for frame in frames) / 2 ** 20
+
+
+def solve_peak_mb(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, output: str) -> float:
+    """Solves all questions and returns the peak memory traced while doing so, in MB"""
+    tracemalloc.start()
+    route_manager.solve(airlines, airports, routes, 'all', 'none', output=output)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 2 ** 20
+
+
+def bench_memory(factor: int = 50) -> None:
+    """Measures the memory of the airline and airport tables, of a routes-length merge of routes with 
+       airports and of solving all questions, with Python string columns and with the categorical 
+       columns of the loader, on the bundled data and factor times replicated data"""
+    airlines, airports, routes = route_manager.load_datasets(AIRLINES, AIRPORTS, ROUTES)
+    encodings = {
+        'strings': (with_object_strings(airlines), with_object_strings(airports)), 
+        'categorical': (airlines, airports)
+    }
+    mismatches = []
+    with tempfile.TemporaryDirectory() as folder:
+        for scale in (1, factor):
+            scaled_routes = replicate_routes(routes, scale)
+            contents = []
+            for label, (scaled_airlines, scaled_airports) in encodings.items():
+                copies = pd.concat([scaled_airports] * scale, ignore_index=True)
+                if label == 'categorical':
+                    copies = route_manager.encode_strings(copies)
+                merged = pd.merge(scaled_routes, scaled_airports, left_on='route_to_airport_id', right_on='airport_id')
+                print(f'{f"{scale}x airports table, {label}":<40} {frame_mb(copies):10.1f} MB')
+                print(f'{f"{scale}x routes merged, {label}":<40} {frame_mb(merged):10.1f} MB')
+                output = os.path.join(folder, f'{scale}-{label}')
+                os.makedirs(output)
+                peak = solve_peak_mb(scaled_airlines, scaled_airports, scaled_routes, output)
+                print(f'{f"{scale}x solve all, {label} peak":<40} {peak:10.1f} MB')
+                contents.append(folder_contents(output))
+            if contents[0] != contents[1]:
+                mismatches.append(f'{scale}x')
+    print(f'{"1x airlines and airports, strings":<40} {frame_mb(*encodings["strings"]):10.1f} MB')
+    print(f'{"1x airlines and airports, categorical":<40} {frame_mb(*encodings["categorical"]):10.1f} MB')
+    if mismatches:
+        print(f'ERROR: categorical columns give different csv files at {mismatches}')
+        sys.exit(1)
+
+
+def reference_hops(adjacency: tuple, source: int) -> np.ndarray:
+    """Fewest edges from source to every node, -1 for unreached nodes, with a node by node search"""
+    indptr, indices = adjacency
+    hops = np.full(len(indptr) - 1, -1, dtype=np.int32)
+    hops[source] = 0
+    queue = collections.deque([source])
+    while queue:
+        node = queue.popleft()
+        for target in indices[indptr[node]:indptr[node + 1]].tolist():
+            if hops[target] < 0:
+                hops[target] = hops[node] + 1
+                queue.append(target)
+    return hops
+
+
+def bench_graph(edges: int = 1000000, nodes: int = 100000, batch: int = 64) -> None:
+    """Builds the route network of the bundled data and a random graph with edges edges, times 
+       degree, reach and path queries and a batch of searches, and checks the searches against a 
+       node by node breadth first search"""
+    airlines, airports, routes = route_manager.load_datasets(AIRLINES, AIRPORTS, ROUTES)
+    joins = {}
+    graph, seconds = timed(route_manager.route_graph, airlines, airports, routes, joins)
+    print_row(f'route network, {len(graph["forward"][1])} edges', seconds)
+    airport_rows = np.flatnonzero(graph['out_degree'] > 0)[:512]
+    _, seconds = timed(lambda: [route_manager.breadth_first(graph['forward'], airport_rows[[row]])
+                                for row in range(len(airport_rows))])
+    print_row(f'{len(airport_rows)} airports one search each', seconds)
+    _, seconds = timed(route_manager.breadth_first, graph['forward'], airport_rows)
+    print_row(f'{len(airport_rows)} airports in one batch', seconds)
+
+    generator = np.random.default_rng(265)
+    sources = generator.integers(0, nodes, edges)
+    targets = generator.integers(0, nodes, edges)
+    adjacency, seconds = timed(route_manager.csr_adjacency, sources, targets, nodes)
+    print_row(f'CSR build, {edges} edges', seconds)
+    _, seconds = timed(np.bincount, sources, minlength=nodes)
+    print_row('out-degree', seconds)
+
+    timings = {}
+    start = generator.integers(0, nodes)
+    timings['reach within 3 hops'] = timed(route_manager.breadth_first, adjacency, np.array([start]), 3)[1]
+    timings['shortest hops to all'] = timed(route_manager.breadth_first, adjacency, np.array([start]))[1]
+    starts = generator.integers(0, nodes, batch)
+    timings[f'batch of {batch} searches'] = timed(route_manager.breadth_first, adjacency, starts)[1]
+    for label, seconds in timings.items():
+        print_row(label, seconds)
+    per_search = timings[f'batch of {batch} searches'] / batch
+    print_row('batch, per search', per_search)
+    print(f'{"speedup over one search":<40} {timings["shortest hops to all"] / per_search:10.1f}x')
+
+    mismatches = 0
+    for network in (graph['forward'], adjacency):
+        checked = generator.integers(0, len(network[0]) - 1, 8)
+        hops, parents = route_manager.breadth_first(network, checked)
+        for row, source in enumerate(checked):
+            expected = reference_hops(network, int(source))
+            reached = np.flatnonzero(hops[row] > 0)
+            # Every parent is one hop closer to the source and has an edge to the node
+            parent_hops = hops[row][parents[row][reached]]
+            edge_ok = all(node in network[1][network[0][parent]:network[0][parent + 1]]
+                          for node, parent in zip(reached[:100], parents[row][reached[:100]]))
+            if not np.array_equal(hops[row], expected) or np.any(parent_hops != hops[row][reached] - 1) or not edge_ok:
+                mismatches += 1
+    if mismatches:
+        print(f'ERROR: {mismatches} searches differ from a node by node breadth first search')
+        sys.exit(1)
+    if timings['shortest hops to all'] > 1 or timings['reach within 3 hops'] > 1:
+        print('ERROR: a single query on the random graph took more than a second')
+        sys.exit(1)
+
+
+def scan_airports(airports: pd.DataFrame, airport_filter: dict) -> np.ndarray:
+    """The rows of route_manager.select_airports with a boolean mask over every column"""
+    mask = np.ones(len(airports), dtype=bool)
+    if 'country' in airport_filter:
+        mask &= (airports['airport_country'] == airport_filter['country']).to_numpy()
+    if 'city' in airport_filter:
+        mask &= (airports['airport_city'] == airport_filter['city']).to_numpy()
+    if 'icao' in airport_filter:
+        mask &= airports['airport_icao_unique_code'].astype(str).str.startswith(airport_filter['icao']).to_numpy()
+    altitudes = airports['airport_altitude'].to_numpy(dtype=np.float64)
+    if 'min_alt' in airport_filter:
+        mask &= altitudes >= airport_filter['min_alt']
+    if 'max_alt' in airport_filter:
+        mask &= altitudes <= airport_filter['max_alt']
+    return np.flatnonzero(mask)
+
+
+def bench_filter(factor: int = 100, repeat: int = 20) -> None:
+    """Finds the airports of a few filters with the indexes of route_manager.py and with boolean 
+       masks, on the airports repeated factor times, and checks that both find the same rows"""
+    _, airports, _ = route_manager.load_datasets(AIRLINES, AIRPORTS, ROUTES)
+    airports = route_manager.encode_strings(pd.concat([airports] * factor, ignore_index=True))
+    filters = {
+        'country': {'country': 'Canada'}, 
+        'city': {'city': 'Toronto'}, 
+        'icao prefix': {'icao': 'CY'}, 
+        'altitude band': {'min_alt': 1000, 'max_alt': 5000}, 
+        'country and altitude band': {'country': 'Canada', 'min_alt': 1000}
+    }
+    joins = {}
+    _, seconds = timed(lambda: [route_manager.select_airports(airports, joins, airport_filter) for airport_filter in filters.values()])
+    print_row(f'build indexes, {len(airports)} airports', seconds)
+
+    for label, airport_filter in filters.items():
+        scanned = min(timed(scan_airports, airports, airport_filter)[1] for _ in range(repeat))
+        indexed = min(timed(route_manager.select_airports, airports, joins, airport_filter)[1] for _ in range(repeat))
+        print_row(f'{label}, boolean mask', scanned)
+        print_row(f'{label}, index', indexed)
+        if not np.array_equal(scan_airports(airports, airport_filter), route_manager.select_airports(airports, joins, airport_filter)):
+            print(f'ERROR: the index finds different airports than a boolean mask for {label}')
+            sys.exit(1)
+
+
+def bench_profile(calls: int = 1000000, repeat: int = 5) -> None:
+    """Measures the cost of the profiling hooks of route_manager.py when profiling is disabled, per call 
+       and on solving all questions, compares it with profiling enabled and checks the trace events"""
+    def noop() -> None:
+        pass
+
+    hooked = route_manager.profiled(noop)
+    plain = min(timed(lambda: [noop() for _ in range(calls)])[1] for _ in range(repeat))
+    disabled = min(timed(lambda: [hooked() for _ in range(calls)])[1] for _ in range(repeat))
+    print(f'{"hook overhead per call, disabled":<40} {(disabled - plain) / calls * 1e9:10.1f} ns')
+
+    airlines, airports, routes = route_manager.load_datasets(AIRLINES, AIRPORTS, ROUTES)
+    with tempfile.TemporaryDirectory() as folder:
+        def solve_all() -> None:
+            route_manager.solve(airlines, airports, routes, 'all', 'none', output=folder)
+
+        seconds = min(timed(solve_all)[1] for _ in range(repeat))
+        print_row('solve all, profiling disabled', seconds)
+        for trace_memory in (False, True):
+            route_manager.enable_profile(trace_memory)
+            try:
+                seconds = min(timed(solve_all)[1] for _ in range(repeat))
+                path = os.path.join(folder, 'trace.json')
+                route_manager.write_profile(path)
+            finally:
+                route_manager.PROFILE = None
+                tracemalloc.stop()
+            print_row(f'solve all, profiling{" with allocations" if trace_memory else ""}', seconds)
+            with open(path) as file:
+                events = json.load(file)['traceEvents']
+            names = {event['name'] for event in events if event['ph'] == 'X'}
+            expected = {'solve'} | {f'solve_Q{question}' for question in range(1, 6)}
+            if not expected <= names or any(event['dur'] < 0 for event in events if event['ph'] == 'X'):
+                print(f'ERROR: the trace is missing {sorted(expected - names)} or has negative durations')
+                sys.exit(1)
+
+
+SUITE_VERSION = 1
+# Phases faster than this in both runs are never reported as regressions, their timings are noise
+SUITE_NOISE_SECONDS = 0.01
+
+
+def write_records(file, records: list) -> None:
+    """Appends records to an open yaml file as the items of its top level list"""
+    dumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+    if records:
+        yaml.dump(records, file, Dumper=dumper, sort_keys=False, allow_unicode=True)
+
+
+def write_scaled_dataset(folder: str, factor: int) -> None:
+    """Writes airlines.yaml, airports.yaml and routes.yaml with factor copies of the bundled files. 
+       Every copy gets its own ids, and copies after the first add the copy number to the airline 
+       and airport names and cities, so the copies are new airlines and airports in the same countries"""
+    airlines, airports, routes = route_manager.load_datasets(AIRLINES, AIRPORTS, ROUTES)
+    airlines = with_object_strings(airlines)
+    airports = with_object_strings(airports)
+    strides = {
+        'airline': int(airlines['airline_id'].max()) + 1, 
+        'airport': int(airports['airport_id'].max()) + 1
+    }
+
+    for key, frame, renamed in (('airlines', airlines, ['airline_name']), 
+                                ('airports', airports, ['airport_name', 'airport_city'])):
+        stride = strides[key[:-1]]
+        with open(os.path.join(folder, f'{key}.yaml'), 'w') as file:
+            file.write(f'{key}:\n')
+            for copy in range(factor):
+                records = frame.copy()
+                records[f'{key[:-1]}_id'] = (records[f'{key[:-1]}_id'].astype(np.int64) + copy * stride).astype(str)
+                if 'airport_altitude' in records.columns:
+                    records['airport_altitude'] = records['airport_altitude'].astype(str)
+                for column in renamed:
+                    if copy:
+                        records[column] = records[column].astype(str) + f' {copy}'
+                write_records(file, records.to_dict('records'))
+
+    columns = [('route_airline_id', 'airline'), ('route_from_aiport_id', 'airport'), ('route_to_airport_id', 'airport')]
+    with open(os.path.join(folder, 'routes.yaml'), 'w') as file:
+        file.write('routes:\n')
+        for copy in range(factor):
+            values = []
+            for column, kind in columns:
+                ids = routes[column].to_numpy().astype(np.int64)
+                values.append(np.where(ids == route_manager.MISSING_ID, '\\N', (ids + copy * strides[kind]).astype(str)))
+            file.writelines(
+                f"- route_airline_id: '{airline}'\n  route_from_aiport_id: '{origin}'\n  route_to_airport_id: '{destination}'\n"
+                for airline, origin, destination in zip(*values)
+            )
+
+
+def peak_rss_mb() -> float:
+    """Returns the peak resident set size of this process so far, in MB"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def time_phases(folder: str) -> dict:
+    """Answers q1 to q5 from the yaml files of folder the way route_manager.py does, timing every phase 
+       on its own, and returns the seconds of every phase and the peak RSS after it. Meant to run in 
+       a fresh process, see bench_suite, so that the peak RSS belongs to one dataset
+
+    The phases are 'yaml load' (route_manager.parse_dataset on the three yaml files, which is what 
+    load_dataset does when the columnar cache is not up to date), then for every question 'qN solve' 
+    with its csv file queued, 'qN csv' writing it and 'qN render' for its bar graph
+    """
+    phases = {}
+    peaks = {}
+
+    def record(name: str, seconds: float) -> None:
+        phases[name] = phases.get(name, 0.0) + seconds
+        peaks[name] = peak_rss_mb()
+
+    frames, seconds = timed(lambda: {
+        key: route_manager.parse_dataset(os.path.join(folder, f'{key}.yaml'), key)
+        for key in ('airlines', 'airports', 'routes')
+    })
+    record('yaml load', seconds)
+    routes = frames['routes']
+
+    solvers = [route_manager.solve_Q1, route_manager.solve_Q2, route_manager.solve_Q3, route_manager.solve_Q4, route_manager.solve_Q5]
+    with tempfile.TemporaryDirectory() as output:
+        for number, solver in enumerate(solvers, 1):
+            charts = []
+            tables = []
+            _, seconds = timed(solver, frames['airlines'], frames['airports'], routes, 'bar', {}, output, charts, tables=tables)
+            record(f'q{number} solve', seconds)
+            _, seconds = timed(route_manager.write_tables, tables)
+            record(f'q{number} csv', seconds)
+            _, seconds = timed(route_manager.render_charts, charts, 1)
+            record(f'q{number} render', seconds)
+    return {'phases': phases, 'peak_rss_mb': peaks, 'routes': len(routes), 'airports': len(frames['airports'])}
+
+
+SUITE_SCRIPT = """
+import json, sys
+import benchmark
+print(json.dumps(benchmark.time_phases(sys.argv[1])))
+"""
+
+
+def compare_results(results: dict, baseline: dict, threshold: float) -> list:
+    """Lists the phases and peak RSS of results that are more than threshold times those of baseline, 
+       for the scales in both
+
+    Parameters
+    ----------
+    results: dict
+        The results of bench_suite
+    baseline: dict
+        Saved results of an earlier run
+    threshold: float
+        Allowed ratio, e.g. 1.25 for 25 % slower
+    """
+    regressions = []
+    for scale, current in results['scales'].items():
+        previous = baseline.get('scales', {}).get(scale)
+        if previous is None:
+            continue
+        for phase, seconds in current['phases'].items():
+            before = previous['phases'].get(phase)
+            if before is not None and seconds > before * threshold and seconds - before > SUITE_NOISE_SECONDS:
+                regressions.append(f'{scale}x {phase}: {before * 1000:.1f} ms -> {seconds * 1000:.1f} ms')
+        before, after = previous.get('max_rss_mb'), current['max_rss_mb']
+        if before is not None and after > before * threshold:
+            regressions.append(f'{scale}x peak RSS: {before:.1f} MB -> {after:.1f} MB')
+    return regressions
+
+
+def bench_suite(*scales: int, results: str = None, baseline: str = None, threshold: str = '1.25') -> None:
+    """Generates datasets at several scales of the bundled files, 1x and 10x by default, times every 
+       phase of answering q1 to q5 on each in a fresh process and tracks its peak RSS. 
+       --RESULTS="run.json" saves the results, --BASELINE="baseline.json" compares them with an 
+       earlier run and fails when a phase or the peak RSS grew by more than --THRESHOLD (1.25), 
+       e.g. ./benchmark.py suite 1 10 100 --BASELINE="baseline.json"
+    """
+    suite = {'version': SUITE_VERSION, 'python': sys.version.split()[0], 'scales': {}}
+    for scale in scales or (1, 10):
+        with tempfile.TemporaryDirectory() as folder:
+            _, seconds = timed(write_scaled_dataset, folder, scale)
+            print_row(f'{scale}x generate', seconds)
+            output = subprocess.run(
+                [sys.executable, '-c', SUITE_SCRIPT, folder], 
+                cwd=DATA_FOLDER, capture_output=True, text=True, check=True
+            ).stdout
+        result = json.loads(output)
+        result['max_rss_mb'] = max(result['peak_rss_mb'].values())
+        suite['scales'][str(scale)] = result
+        for phase, phase_seconds in result['phases'].items():
+            print_row(f'{scale}x {phase}', phase_seconds)
+        print(f'{f"{scale}x peak RSS":<40} {result["max_rss_mb"]:10.1f} MB')
+
+    if results:
+        with open(results, 'w') as file:
+            json.dump(suite, file, indent=2)
+    if baseline:
+        with open(baseline) as file:
+            regressions = compare_results(suite, json.load(file), float(threshold))
+        if regressions:
+            print(f'ERROR: regressions against {baseline}:')
+            for regression in regressions:
+                print(f'  {regression}')
+            sys.exit(1)
+
+
+def bench_formats(factor: int = 1) -> None:
+    """Reads the datasets, repeated factor times, as yaml with yaml.safe_load and with route_manager.py, 
+       as csv and as columnar .npz, in full and with the columns of q2 only, and checks that every 
+       reader gives the same DataFrames"""
+    keys = ('airlines', 'airports', 'routes')
+    with tempfile.TemporaryDirectory() as folder:
+        write_scaled_dataset(folder, factor)
+        yaml_paths = [os.path.join(folder, f'{key}.yaml') for key in keys]
+
+        def safe_load_all() -> None:
+            for key, path in zip(keys, yaml_paths):
+                with open(path) as file:
+                    yaml.safe_load(file)[key]
+
+        def read_yaml_all() -> tuple:
+            return route_manager.read_yaml(yaml_paths[0], 'airlines'), route_manager.read_yaml(yaml_paths[1], 'airports'), route_manager.read_routes(yaml_paths[2])
+
+        expected, seconds = timed(read_yaml_all)
+        print_row(f'{factor}x route_manager yaml readers', seconds)
+        _, seconds = timed(safe_load_all)
+        print_row(f'{factor}x yaml.safe_load', seconds)
+
+        mismatches = []
+        for extension in ('csv', 'npz'):
+            paths = [os.path.join(folder, f'{key}.{extension}') for key in keys]
+            _, seconds = timed(lambda: [route_manager.write_dataset(path, key, frame) for path, key, frame in zip(paths, keys, expected)])
+            print_row(f'{factor}x convert to {extension}', seconds)
+            if extension == 'csv':
+                frames, seconds = timed(lambda: [route_manager.read_csv(path, key) for path, key in zip(paths, keys)])
+            else:
+                frames, seconds = timed(lambda: [route_manager.read_columnar(path) for path in paths])
+            print_row(f'{factor}x read {extension}', seconds)
+            for key, frame, expected_frame in zip(keys, frames, expected):
+                if not frame.equals(expected_frame) or not (frame.dtypes == expected_frame.dtypes).all():
+                    mismatches.append(f'{key}.{extension}')
+
+        columns = route_manager.question_columns('q2')
+        paths = [os.path.join(folder, f'{key}.npz') for key in keys]
+        _, seconds = timed(lambda: [route_manager.read_columnar(path, names) for path, names in zip(paths, columns)])
+        print_row(f'{factor}x read npz, columns of q2', seconds)
+
+    if mismatches:
+        print(f'ERROR: {mismatches} read back differently from the yaml files')
+        sys.exit(1)
+
+
+BENCHMARKS = {
+    'cache': bench_cache,
+    'stream': bench_stream,
+    'parse': bench_parse,
+    'outofcore': bench_outofcore,
+    'index': bench_index,
+    'topk': bench_topk,
+    'server': bench_server,
+    'startup': bench_startup,
+    'render': bench_render,
+    'aggregates': bench_aggregates,
+    'sweep': bench_sweep,
+    'memory': bench_memory,
+    'graph': bench_graph,
+    'filter': bench_filter,
+    'profile': bench_profile,
+    'suite': bench_suite,
+    'formats': bench_formats
+}
+
+
+def main() -> None:
+    """Runs the benchmark named on the command line with its optional integer arguments and 
+       --OPTION="value" options, or all benchmarks with their defaults"""
+    if len(sys.argv) > 1:
+        print(f'== {sys.argv[1]} ==')
+        arguments = sys.argv[2:]
+        options = route_manager.parse_args([value for value in arguments if value.startswith('--')])
+        BENCHMARKS[sys.argv[1]](
+            *[int(value) for value in arguments if not value.startswith('--')], 
+            **{name.lower(): value for name, value in options.items()}
+        )
+        return
+    for name, benchmark in BENCHMARKS.items():
+        print(f'== {name} ==')
+        benchmark()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Thin client for a route_manager.py server started with --SERVE
+Sample input: --AIRLINES="airlines.yaml" --AIRPORTS="airports.yaml" --ROUTES="routes.yaml" --QUESTION="q1" --GRAPH_TYPE="bar"
+The socket is taken from --SOCKET="path", the ROUTE_MANAGER_SOCKET environment variable or /tmp/route_manager.sock
+"""
+
+import json
+import os
+import socket
+import sys
+
+
+DEFAULT_SOCKET = '/tmp/route_manager.sock'
+REQUIRED_OPTIONS = ('AIRLINES', 'AIRPORTS', 'ROUTES', 'QUESTION', 'GRAPH_TYPE')
+USAGE = 'usage: route_client.py --AIRLINES="airlines.yaml" --AIRPORTS="airports.yaml" --ROUTES="routes.yaml" --QUESTION="q1" --GRAPH_TYPE="bar" [--OPTION="value" ...]'
+
+
+def format_args(input: str) -> str:
+    """
+    Splits the command line argument by the "=" symbol to isolate the value.
+
+    Parameters
+    ----------
+    input : str
+        The command line argument in the form of --OPTION="value".
+
+    Returns
+    -------
+    str
+        The isolated value from the command line argument, e.g., "value".
+    """
+    sorted = input.split("=", 1)
+    return sorted[1]
+
+
+def parse_args(arguments: list) -> dict:
+    """
+    Collects command line arguments of the form --OPTION="value" into a dictionary, and exits with 
+    the usage message when an argument has no value or a required option is missing.
+
+    Parameters
+    ----------
+    arguments : list
+        The command line arguments, without the program name.
+
+    Returns
+    -------
+    dict
+        The value of every option keyed by its name, e.g., {"QUESTION": "q1"}.
+    """
+    options = {}
+    for argument in arguments:
+        if "=" not in argument:
+            sys.exit(f'{argument}: expected --OPTION="value"\n{USAGE}')
+        options[argument.split("=", 1)[0].lstrip("-")] = format_args(argument)
+    missing = [name for name in REQUIRED_OPTIONS if name not in options]
+    if missing:
+        sys.exit(f'missing {", ".join("--" + name for name in missing)}\n{USAGE}')
+    return options
+
+
+def send_request(socket_path: str, request: dict) -> dict:
+    """Sends one request to the server and waits for its response
+
+    Parameters
+    ----------
+    socket_path: str
+        Path of the unix socket the server listens on
+    request: dict
+        The request, see route_manager.QueryServer.answer
+
+    Returns
+    -------
+    dict
+        The response, with 'status' set to 'ok' or 'error'
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        with connection.makefile('rwb') as stream:
+            stream.write((json.dumps(request) + '\n').encode())
+            stream.flush()
+            return json.loads(stream.readline())
+
+
+def filter_options(options: dict) -> dict:
+    """Collects the airport filter options, the same way as route_manager.filter_options
+
+    Parameters
+    ----------
+    options: dict
+        The command line options
+
+    Returns
+    -------
+    dict
+        The given filters under the keys 'country', 'city', 'icao', 'min_alt' and 'max_alt'
+    """
+    airport_filter = {
+        name.lower(): options['FILTER_' + name] for name in ('COUNTRY', 'CITY', 'ICAO') if 'FILTER_' + name in options
+    }
+    for name in ('MIN_ALT', 'MAX_ALT'):
+        if 'FILTER_' + name in options:
+            airport_filter[name.lower()] = float(options['FILTER_' + name])
+    return airport_filter
+
+
+def main() -> None:
+    """Formats arguments from command line and asks the server to write the answer to the current directory"""
+    options = parse_args(sys.argv[1:])
+
+    request = {
+        'airlines': os.path.abspath(options['AIRLINES']),
+        'airports': os.path.abspath(options['AIRPORTS']),
+        'routes': os.path.abspath(options['ROUTES']),
+        'question': options['QUESTION'],
+        'graph_type': options['GRAPH_TYPE'],
+        'output': os.path.abspath(options.get('OUTPUT', '.')),
+        'country': options.get('COUNTRY', 'Canada'),
+        'query': {name.lower(): options[name] for name in ('FROM', 'TO', 'HOPS') if name in options},
+        'filter': filter_options(options)
+    }
+    socket_path = options.get('SOCKET', os.environ.get('ROUTE_MANAGER_SOCKET', DEFAULT_SOCKET))
+
+    response = send_request(socket_path, request)
+    if response['status'] != 'ok':
+        print(response['message'], file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,18 +4,179 @@
 Created on May 28 10:04:26 2024
 Based on: https://www.kaggle.com/datasets/arbazmohammad/world-airports-and-airlines-datasets
 Sample input: --AIRLINES="airlines.yaml" --AIRPORTS="airports.yaml" --ROUTES="routes.yaml" --QUESTION="q1" --GRAPH_TYPE="bar"
+--QUESTION also accepts a comma separated list such as "q1,q3", or "all"
+Server mode: --AIRLINES="airlines.yaml" --AIRPORTS="airports.yaml" --ROUTES="routes.yaml" --SERVE="/tmp/route_manager.sock",
+then query it with route_client.py, which takes the same arguments as this program
+--GRAPH_TYPE="none" only writes the csv file, matplotlib is then never imported
+--WORKERS="n" sets how many processes draw the graphs of several questions, and parse the datasets that are not 
+cached yet (the three files at once, routes.yaml split into one range per process)
+Aggregate store: --AGGREGATES="counts.json" keeps the counters behind q1-q4 on disk, --DELTA="delta.yaml" 
+updates them with the 'added' and 'removed' routes of a delta file, --VERIFY checks them against --ROUTES
+--COUNTRY="Canada" sets the country of q1 and q5, "all" sweeps every country of airports.yaml and 
+writes q1-<country>.csv and q5-<country>.csv, spread over --WORKERS processes
+Route network: --QUESTION="degree" ranks the hub airports, --QUESTION="reach" --FROM="CYYZ" --HOPS="2" lists 
+the airports within HOPS flights, --QUESTION="path" --FROM="CYYZ" --TO="YSSY" finds a path with the fewest 
+flights. Airports are given by ICAO code or airport id
+Input formats are picked by extension: .yaml, .csv (with the yaml keys as header) and .npz (columnar, only 
+the columns the questions need are read). --CONVERT="npz" (or "csv", "yaml") writes the three datasets to 
+--OUTPUT in that format, e.g. airlines.npz
+Profiling: --PROFILE="trace.json", or the ROUTE_MANAGER_PROFILE environment variable, writes a Chrome 
+trace-event file (open it in chrome://tracing or ui.perfetto.dev) with the time and RSS of every phase, 
+--PROFILE_MEMORY (or ROUTE_MANAGER_PROFILE_MEMORY=1) adds the Python allocations, at several times the run time
+Out-of-core: --OUT_OF_CORE (or --OUT_OF_CORE="n" routes per chunk) answers q1 to q4 by counting the routes 
+chunk by chunk, for routes files that do not fit in memory
+Airport filters: --FILTER_COUNTRY="Canada", --FILTER_CITY="Toronto", --FILTER_ICAO="CY" (code prefix), 
+--FILTER_MIN_ALT="1000" and --FILTER_MAX_ALT="5000" (feet) leave the other airports out of every question, as if 
+they were not in airports.yaml
 """
 
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
+import io
+import json
+import multiprocessing.shared_memory
+import os
+import re
+import resource
+import shutil
+import socketserver
+import string
 import sys
+import tempfile
+import threading
+import time
+import tracemalloc
 import yaml
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
 
+# Leave out the creation date so the same graph always gives the same pdf
+GRAPH_METADATA = {'CreationDate': None}
 
-def solve(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, question: str, graph_type: str):
-    """Using question, figures out which question is being asked for and calls the correct function 
-       to solve it
+# Questions that are asked about one country
+COUNTRY_QUESTIONS = {"q1", "q5"}
+# Questions about the route network, which take the airports and hops of the query
+GRAPH_QUESTIONS = {"degree", "reach", "path"}
+# The airports of the query each route network question needs
+QUERY_AIRPORTS = {"degree": (), "reach": ("from",), "path": ("from", "to")}
+
+
+# Environment variables naming the trace file and turning on allocation tracing, like --PROFILE 
+# and --PROFILE_MEMORY
+PROFILE_VARIABLE = 'ROUTE_MANAGER_PROFILE'
+PROFILE_MEMORY_VARIABLE = 'ROUTE_MANAGER_PROFILE_MEMORY'
+# The trace events recorded so far, None while profiling is disabled
+PROFILE = None
+
+
+def enable_profile(trace_memory: bool = False) -> None:
+    """Starts recording trace events
+
+    Parameters
+    ----------
+    trace_memory: bool
+        Also trace Python allocations with tracemalloc, which slows everything down
+    """
+    global PROFILE
+    if trace_memory:
+        tracemalloc.start()
+    PROFILE = {'events': [], 'lock': threading.Lock(), 'trace_memory': trace_memory}
+
+
+def write_profile(path: str) -> None:
+    """Writes the recorded trace events to a Chrome trace-event JSON file
+
+    Parameters
+    ----------
+    path: str
+        Path of the trace file
+    """
+    with open(path, 'w') as file:
+        json.dump({'traceEvents': PROFILE['events'], 'displayTimeUnit': 'ms'}, file)
+
+
+def current_rss_mb() -> float:
+    """Returns the resident set size of this process in MB, 0 where /proc is not available"""
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return 0.0
+
+
+def memory_counters() -> dict:
+    """Returns the current and peak RSS, and the memory traced by tracemalloc now and at its peak 
+       if it is on, in MB"""
+    counters = {
+        'rss_mb': current_rss_mb(), 
+        'rss_peak_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        counters.update(traced_mb=current / 2 ** 20, traced_peak_mb=peak / 2 ** 20)
+    return counters
+
+
+@contextlib.contextmanager
+def profile_span(name: str, category: str = 'route_manager'):
+    """Records the time spent in a with block as a complete ('X') trace event, with the growth of 
+       RSS (and of traced memory) in it, and a memory counter ('C') event when it ends. Does 
+       nothing while profiling is disabled
+
+    Parameters
+    ----------
+    name: str
+        Name of the event, e.g. the function name
+    category: str
+        Category of the event
+    """
+    if PROFILE is None:
+        yield
+        return
+    start = time.time_ns() // 1000
+    before = memory_counters()
+    try:
+        yield
+    finally:
+        end = time.time_ns() // 1000
+        counters = memory_counters()
+        growth = {f'{key}_growth': counters[key] - before[key] for key in ('rss_mb', 'traced_mb') if key in counters}
+        ids = {'pid': os.getpid(), 'tid': threading.get_ident()}
+        events = [
+            {'name': name, 'cat': category, 'ph': 'X', 'ts': start, 'dur': end - start, **ids, 
+             'args': {**growth, **counters}},
+            {'name': 'memory', 'ph': 'C', 'ts': end, **ids, 'args': counters}
+        ]
+        with PROFILE['lock']:
+            PROFILE['events'].extend(events)
+
+
+def profiled(function):
+    """Decorator recording every call of function with profile_span while profiling is enabled. 
+       When it is disabled, the only cost is one global lookup per call"""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if PROFILE is None:
+            return function(*args, **kwargs)
+        with profile_span(function.__name__):
+            return function(*args, **kwargs)
+    return wrapper
+
+
+def profiled_call(trace_memory: bool, function, *args) -> list:
+    """Calls function in a worker process with profiling enabled and returns the trace events recorded, 
+       so the parent process can add them to its own"""
+    enable_profile(trace_memory)
+    function(*args)
+    return PROFILE['events']
+
+
+@profiled
+def solve(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, question: str, graph_type: str, joins: dict = None, output: str = '.', workers: int = None, country: str = 'Canada', query: dict = None, airport_filter: dict = None):
+    """Using question, figures out which questions are being asked for and calls the correct 
+       functions to solve them. The joins are shared between the questions
 
     Parameters
     ----------
@@ -26,50 +187,195 @@ def solve(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame,
     routes: pd.DataFrame
         Pandas DataFrame containing list of dictionaries from routes.yaml
     question: str
-        String that specifies which question from 1-5 is being asked
+        String that specifies which question from 1-5 is being asked, a route network question 
+        ("degree", "reach" or "path"), a comma separated list of questions such as "q1,q3", or 
+        "all" for q1 to q5
     graph_type: str
         String that specifies what type of graph should be created
+    joins: dict
+        Joins kept from earlier calls, see join_routes
+    output: str
+        Directory the csv and pdf files are written to
+    workers: int
+        Number of processes drawing the graphs when several questions are asked, or sweeping the 
+        countries, defaults to the number of CPUs
+    country: str
+        Country of the per-country questions (q1 and q5), or "all" to sweep every country
+    query: dict
+        The 'from' and 'to' airports and the number of 'hops' of the route network questions
+    airport_filter: dict
+        The airports to keep, see select_airports. The joins of every filter are kept apart, 
+        in joins under the filter
     """
-    if question == "q1":
-        solve_Q1(
-            airlines, 
-            airports, 
-            routes, 
-            graph_type
-        )
-    elif question == "q2":
-        solve_Q2(
-            airlines, 
-            airports, 
-            routes, 
-            graph_type
-        )
-    elif question == "q3":
-        solve_Q3(
-            airlines, 
-            airports, 
-            routes, 
-            graph_type
-        )
-    elif question == "q4":
-        solve_Q4(
-            airlines,
-            airports, 
-            routes, 
-            graph_type
-        )
-    elif question == "q5":
-        solve_Q5(
-            airlines, 
-            airports, 
-            routes, 
-            graph_type
-        )
-    
-    
-def solve_Q1(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, graph_type: str):
-    """Generates a csv file containing top 20 airlines that offer the greatest number of routes 
-       to Canada, and calls function to generate a graph of the given graph type
+    solvers = {
+        "q1": solve_Q1,
+        "q2": solve_Q2,
+        "q3": solve_Q3,
+        "q4": solve_Q4,
+        "q5": solve_Q5,
+        "degree": solve_degree,
+        "reach": solve_reach,
+        "path": solve_path
+    }
+    questions = ["q1", "q2", "q3", "q4", "q5"] if question == "all" else question.split(",")
+
+    joins = {} if joins is None else joins
+    if airport_filter:
+        joins = filter_joins(airports, joins, airport_filter)
+
+    if country == "all":
+        sweep = [name for name in questions if name in COUNTRY_QUESTIONS]
+        if sweep:
+            sweep_countries(airlines, airports, routes, sweep, joins, output, workers)
+        questions = [name for name in questions if name not in COUNTRY_QUESTIONS]
+
+    charts = []
+    for name in questions:
+        if name in solvers:
+            solvers[name](
+                airlines, 
+                airports, 
+                routes, 
+                graph_type, 
+                joins, 
+                output, 
+                charts, 
+                **({"country": country} if name in COUNTRY_QUESTIONS else {}), 
+                **({"query": query or {}} if name in GRAPH_QUESTIONS else {})
+            )
+    render_charts(charts, workers)
+
+
+def filter_joins(airports: pd.DataFrame, joins: dict, airport_filter: dict) -> dict:
+    """Returns the joins of an airport filter, kept in joins under the filter so every filter has 
+       its own joins and counts
+
+    Parameters
+    ----------
+    airports: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airports.yaml
+    joins: dict
+        Joins and indexes computed so far, keyed by name
+    airport_filter: dict
+        The airports to keep, see select_airports
+    """
+    key = ('filter',) + tuple(sorted(airport_filter.items()))
+    if key not in joins:
+        joins[key] = {'airport_rows': select_airports(airports, joins, airport_filter)}
+    return joins[key]
+
+
+def copy_joins(joins: dict) -> dict:
+    """Returns a copy of joins that can be extended without touching joins, the joins of every 
+       airport filter included. The arrays themselves are shared, they are never changed in place
+
+    Parameters
+    ----------
+    joins: dict
+        Joins and indexes computed so far, keyed by name
+    """
+    return {key: dict(value) if is_filter_key(key) else value for key, value in joins.items()}
+
+
+def publish_joins(joins: dict, computed: dict, skip: tuple = ()) -> None:
+    """Adds the joins of computed that joins does not have yet, keeping those already there
+
+    Parameters
+    ----------
+    joins: dict
+        Joins and indexes computed so far, keyed by name, updated in place
+    computed: dict
+        Joins computed on a copy of joins, see copy_joins
+    skip: tuple
+        Keys that are not added
+    """
+    for key, value in computed.items():
+        if key in skip:
+            continue
+        if is_filter_key(key) and key in joins:
+            publish_joins(joins[key], value)
+        else:
+            joins.setdefault(key, value)
+
+
+def is_filter_key(key) -> bool:
+    """Tells whether a key of joins holds the joins of an airport filter, see filter_joins"""
+    return isinstance(key, tuple) and len(key) > 0 and key[0] == 'filter'
+
+
+def build_index(ids: np.ndarray) -> tuple:
+    """Builds a dense lookup array from ids to row positions
+
+    Parameters
+    ----------
+    ids: np.ndarray
+        The int32 id column of airlines or airports
+
+    Returns
+    -------
+    tuple
+        The smallest id and an array whose entry id - smallest id is the row holding that id, 
+        or -1 if no row does. The first row wins if an id is repeated
+    """
+    known = np.flatnonzero(ids != MISSING_ID)
+    if len(known) == 0:
+        return 0, np.empty(0, dtype=np.int32)
+    offset = int(ids[known].min())
+    rows = np.full(int(ids[known].max()) - offset + 1, -1, dtype=np.int32)
+    rows[ids[known[::-1]] - offset] = known[::-1]
+    return offset, rows
+
+
+def lookup_rows(index: tuple, ids: np.ndarray) -> np.ndarray:
+    """Resolves ids to row positions with a dense index from build_index
+
+    Parameters
+    ----------
+    index: tuple
+        The index returned by build_index
+    ids: np.ndarray
+        The ids to resolve
+
+    Returns
+    -------
+    np.ndarray
+        The row position of every id, or -1 for ids that are not in the index
+    """
+    offset, rows = index
+    positions = ids.astype(np.int64) - offset
+    found = (positions >= 0) & (positions < len(rows))
+    resolved = np.full(len(ids), -1, dtype=np.int32)
+    resolved[found] = rows[positions[found]]
+    return resolved
+
+
+def airport_index(airports: pd.DataFrame, joins: dict) -> tuple:
+    """Returns the dense index from airport ids to rows, see build_index. When joins holds the 
+       'airport_rows' kept by an airport filter, the other airports are left out of the index, 
+       so no route joins them
+
+    Parameters
+    ----------
+    airports: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airports.yaml
+    joins: dict
+        Joins and indexes computed so far, keyed by name
+    """
+    if 'airport_index' not in joins:
+        ids = airports['airport_id'].to_numpy()
+        if 'airport_rows' in joins:
+            kept = np.zeros(len(ids), dtype=bool)
+            kept[joins['airport_rows']] = True
+            ids = np.where(kept, ids, MISSING_ID)
+        joins['airport_index'] = build_index(ids)
+    return joins['airport_index']
+
+
+@profiled
+def join_routes(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, joins: dict, name: str) -> np.ndarray:
+    """Returns one of the joins of routes with airports and airlines, computing it the first time 
+       it is asked for and sharing it between questions afterwards. A join is the row position 
+       of the matching airport or airline for every route, found through a dense id index
 
     Parameters
     ----------
@@ -79,62 +385,389 @@ def solve_Q1(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFram
         Pandas DataFrame containing list of dictionaries from airports.yaml
     routes: pd.DataFrame
         Pandas DataFrame containing list of dictionaries from routes.yaml
-    graph_type: str
-        String that specifies what type of graph should be created
+    joins: dict
+        Joins and indexes computed so far, keyed by name
+    name: str
+        'destination' or 'origin' for the airport rows of the route endpoints, 'airline' for 
+        the airline rows of the routes
+
+    Returns
+    -------
+    np.ndarray
+        Row position per route, -1 where the route has no match. Must not be modified by the caller
     """
-    merged_routes_airports = pd.merge(
-        routes, 
-        airports, 
-        left_on='route_to_airport_id', 
-        right_on='airport_id'
-    )
-    merged_routes_airports_airlines = pd.merge(
-        merged_routes_airports, 
-        airlines, 
-        left_on='route_airline_id', 
-        right_on='airline_id'
-    )
-    # Sort merged airline airports for each route by country, and make a df for most frequent airlines
-    png_routes = merged_routes_airports_airlines[merged_routes_airports_airlines['airport_country'] == 'Canada']
-    top_airlines = png_routes['airline_name'].value_counts().reset_index()
-    top_airlines.columns = ['airline_name', 'statistic']
-
-    top_airlines = pd.merge(
-        top_airlines, airlines[['airline_name', 'airline_icao_unique_code']]
-        , on='airline_name', 
-        how='left'
-    )
+    if name in joins:
+        return joins[name]
 
-    # Format strings into format specified in test cases
-    top_airlines['subject'] = top_airlines.apply(
-        lambda x: f"{x['airline_name']} ({x['airline_icao_unique_code']})"
-        , axis=1
+    if name in ('destination', 'origin'):
+        column = 'route_to_airport_id' if name == 'destination' else 'route_from_aiport_id'
+        joined = lookup_rows(airport_index(airports, joins), routes[column].to_numpy())
+    elif name == 'airline':
+        if 'airline_index' not in joins:
+            joins['airline_index'] = build_index(airlines['airline_id'].to_numpy())
+        joined = lookup_rows(joins['airline_index'], routes['route_airline_id'].to_numpy())
+    else:
+        raise ValueError(f'unknown join {name}')
+
+    joins[name] = joined
+    return joined
+
+
+def group_codes(frame: pd.DataFrame, joins: dict, columns: list) -> tuple:
+    """Numbers the distinct values of some columns of airlines or airports, sharing the result 
+       between questions
+
+    Parameters
+    ----------
+    frame: pd.DataFrame
+        The airlines or airports DataFrame
+    joins: dict
+        Joins and indexes computed so far, keyed by name
+    columns: list
+        The columns whose values are numbered together
+
+    Returns
+    -------
+    tuple
+        The code of every row (-1 for missing values) and the first row of every code
+    """
+    key = ('codes',) + tuple(columns)
+    if key not in joins:
+        codes = frame.groupby(columns, sort=False).ngroup().fillna(-1).to_numpy(dtype=np.int64)
+        values, first_rows = np.unique(codes, return_index=True)
+        joins[key] = (codes, first_rows[values >= 0])
+    return joins[key]
+
+
+def count_codes(codes: np.ndarray, rows: np.ndarray, size: int) -> np.ndarray:
+    """Counts how many times each code appears among the given rows
+
+    Parameters
+    ----------
+    codes: np.ndarray
+        Code of every row, from group_codes
+    rows: np.ndarray
+        Row positions, one per route, without unmatched (-1) entries
+    size: int
+        The number of distinct codes
+    """
+    found = codes[rows]
+    return np.bincount(found[found >= 0], minlength=size)
+
+
+def attribute_index(airports: pd.DataFrame, joins: dict, column: str) -> tuple:
+    """Builds a hash index over a categorical column of airports, e.g. 'airport_country', and 
+       shares it between questions. The rows are grouped by value in the sorted order of the 
+       categories, so values starting with the same prefix have neighbouring groups
+
+    Parameters
+    ----------
+    airports: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airports.yaml
+    joins: dict
+        Joins and indexes computed so far, keyed by name
+    column: str
+        The indexed column
+
+    Returns
+    -------
+    tuple
+        A dictionary from every value to its category code, the sorted categories, the rows 
+        ordered by code and the start of every code in them
+    """
+    key = ('index', column)
+    if key not in joins:
+        values = pd.Categorical(airports[column])
+        categories = values.categories.to_numpy(dtype=object)
+        order = np.argsort(values.codes, kind='stable')
+        starts = np.searchsorted(values.codes[order], np.arange(len(categories) + 1))
+        joins[key] = ({value: code for code, value in enumerate(categories)}, categories, order, starts)
+    return joins[key]
+
+
+def lookup_value(index: tuple, value: str) -> np.ndarray:
+    """Returns the rows holding value, in row order, through an index from attribute_index"""
+    codes, _, order, starts = index
+    code = codes.get(value)
+    if code is None:
+        return np.empty(0, dtype=np.int64)
+    return order[starts[code]:starts[code + 1]]
+
+
+def lookup_prefix(index: tuple, prefix: str) -> np.ndarray:
+    """Returns the rows whose value starts with prefix, grouped by value, through an index from attribute_index"""
+    _, categories, order, starts = index
+    # The categories starting with prefix sort between prefix and prefix followed by the last character
+    first, last = np.searchsorted(categories, [prefix, prefix + chr(0x10ffff)])
+    return order[starts[first]:starts[last]]
+
+
+def altitude_index(airports: pd.DataFrame, joins: dict) -> tuple:
+    """Builds a sorted index over the airport altitudes for range queries, shared between questions
+
+    Parameters
+    ----------
+    airports: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airports.yaml
+    joins: dict
+        Joins and indexes computed so far, keyed by name
+
+    Returns
+    -------
+    tuple
+        The rows ordered by altitude, with missing altitudes last, and their altitudes
+    """
+    if ('index', 'airport_altitude') not in joins:
+        altitudes = airports['airport_altitude'].to_numpy(dtype=np.float64)
+        order = np.argsort(altitudes, kind='stable')
+        joins[('index', 'airport_altitude')] = (order, altitudes[order])
+    return joins[('index', 'airport_altitude')]
+
+
+def lookup_range(index: tuple, low: float = None, high: float = None) -> np.ndarray:
+    """Returns the rows with an altitude between low and high, both included, in order of altitude, 
+       through an index from altitude_index. Rows without an altitude are never returned"""
+    order, altitudes = index
+    first = 0 if low is None else np.searchsorted(altitudes, low, side='left')
+    last = np.searchsorted(altitudes, np.inf if high is None else high, side='right')
+    return order[first:last]
+
+
+@profiled
+def select_airports(airports: pd.DataFrame, joins: dict, airport_filter: dict) -> np.ndarray:
+    """Finds the airports that pass a filter through the indexes, without scanning the columns
+
+    Parameters
+    ----------
+    airports: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airports.yaml
+    joins: dict
+        Joins and indexes computed so far, keyed by name
+    airport_filter: dict
+        Any of 'country', 'city', 'icao' (a prefix of the ICAO code), 'min_alt' and 'max_alt'
+
+    Returns
+    -------
+    np.ndarray
+        The sorted rows of the airports that pass every part of the filter
+    """
+    selections = []
+    if 'country' in airport_filter:
+        selections.append(lookup_value(attribute_index(airports, joins, 'airport_country'), airport_filter['country']))
+    if 'city' in airport_filter:
+        selections.append(lookup_value(attribute_index(airports, joins, 'airport_city'), airport_filter['city']))
+    if 'icao' in airport_filter:
+        selections.append(lookup_prefix(attribute_index(airports, joins, 'airport_icao_unique_code'), airport_filter['icao']))
+    if 'min_alt' in airport_filter or 'max_alt' in airport_filter:
+        selections.append(lookup_range(altitude_index(airports, joins), airport_filter.get('min_alt'), airport_filter.get('max_alt')))
+
+    if not selections:
+        return np.arange(len(airports))
+    # Keep the rows of the smallest selection that are in all the others
+    selections.sort(key=len)
+    rows = selections[0]
+    for selection in selections[1:]:
+        selected = np.zeros(len(airports), dtype=bool)
+        selected[selection] = True
+        rows = rows[selected[rows]]
+    return np.sort(rows)
+
+
+QUESTION_GROUPS = {
+    'q1': ['airline_name'],
+    'q2': ['airport_country'],
+    'q3': ['airport_name'],
+    'q4': ['airport_city', 'airport_country']
+}
+
+
+@profiled
+def question_counts(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, joins: dict, question: str, country: str = 'Canada') -> np.ndarray:
+    """Counts the routes behind q1 to q4, per group code of the grouped columns. Counts put in joins 
+       beforehand, e.g. by the aggregate store, are used instead of the routes
+
+    Parameters
+    ----------
+    airlines: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airlines.yaml
+    airports: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airports.yaml
+    routes: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from routes.yaml
+    joins: dict
+        Joins and indexes computed so far, keyed by name
+    question: str
+        'q1' for routes to country per airline name, 'q2' for routes per destination country, 
+        'q3' per destination airport name and 'q4' per destination city and country
+    country: str
+        The destination country of q1
+
+    Returns
+    -------
+    np.ndarray
+        Number of routes per code of group_codes over QUESTION_GROUPS[question]
+    """
+    key = ('counts', question, country) if question == 'q1' else ('counts', question)
+    if key in joins:
+        return joins[key]
+    if question == 'q1' and ('counts', 'q1', 'all') in joins:
+        code = country_code(airports, joins, country)
+        counts = joins[('counts', 'q1', 'all')]
+        return counts[code] if code >= 0 else np.zeros(counts.shape[1], dtype=np.int64)
+
+    destination_rows = join_routes(airlines, airports, routes, joins, 'destination')
+    if question == 'q1':
+        # Keep the routes with a known airline whose destination airport is in country
+        airline_rows = join_routes(airlines, airports, routes, joins, 'airline')
+        in_country = np.zeros(len(airports), dtype=bool)
+        in_country[lookup_value(attribute_index(airports, joins, 'airport_country'), country)] = True
+        matched = (destination_rows >= 0) & (airline_rows >= 0)
+        rows = airline_rows[matched][in_country[destination_rows[matched]]]
+        frame = airlines
+    else:
+        rows = destination_rows[destination_rows >= 0]
+        frame = airports
+
+    codes, first_rows = group_codes(frame, joins, QUESTION_GROUPS[question])
+    joins[key] = count_codes(codes, rows, len(first_rows))
+    return joins[key]
+
+
+@profiled
+def country_airline_counts(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, joins: dict) -> np.ndarray:
+    """Counts the routes behind q1 for every destination country at once, in one pass over the routes
+
+    Parameters
+    ----------
+    airlines: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airlines.yaml
+    airports: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airports.yaml
+    routes: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from routes.yaml
+    joins: dict
+        Joins and indexes computed so far, keyed by name
+
+    Returns
+    -------
+    np.ndarray
+        Number of routes per airport country code (rows) and airline name code (columns)
+    """
+    key = ('counts', 'q1', 'all')
+    if key in joins:
+        return joins[key]
+
+    destination_rows = join_routes(airlines, airports, routes, joins, 'destination')
+    airline_rows = join_routes(airlines, airports, routes, joins, 'airline')
+    country_codes, countries = group_codes(airports, joins, ['airport_country'])
+    name_codes, names = group_codes(airlines, joins, ['airline_name'])
+
+    matched = (destination_rows >= 0) & (airline_rows >= 0)
+    route_countries = country_codes[destination_rows[matched]]
+    route_names = name_codes[airline_rows[matched]]
+    known = (route_countries >= 0) & (route_names >= 0)
+    counts = np.bincount(
+        route_countries[known] * len(names) + route_names[known], 
+        minlength=len(countries) * len(names)
     )
+    joins[key] = counts.reshape(len(countries), len(names))
+    return joins[key]
 
-    # Get top 20 airlines and print to .csv file
-    top_20_airlines = top_airlines.sort_values(
+
+def rank_airlines(airlines: pd.DataFrame, name_codes: np.ndarray, name_counts: np.ndarray) -> pd.DataFrame:
+    """Ranks the top 20 airlines of q1 from the number of routes per airline name
+
+    Parameters
+    ----------
+    airlines: pd.DataFrame
+        The airline_name and airline_icao_unique_code columns of airlines.yaml
+    name_codes: np.ndarray
+        Airline name code of every airline, from group_codes
+    name_counts: np.ndarray
+        Number of routes per airline name code
+
+    Returns
+    -------
+    pd.DataFrame
+        The 'subject' and 'statistic' of the top 20 airlines
+    """
+    # Every airline carrying a counted name gets its count
+    statistic = np.where(name_codes >= 0, name_counts[name_codes], 0)
+    top_airlines = airlines.loc[statistic > 0, ['airline_name', 'airline_icao_unique_code']]
+    top_airlines['statistic'] = statistic[statistic > 0]
+
+    # Get top 20 airlines, format strings into format specified in test cases
+    top_20_airlines = top_k(
+        top_airlines, 
+        20, 
         by=['statistic', 'airline_name'], 
         ascending=[False, True]
-    ).head(20)
-    top_20_airlines[['subject', 'statistic']].to_csv('q1.csv', index=False)
+    )
+    top_20_airlines['subject'] = build_subject(
+        top_20_airlines, 
+        '{airline_name} ({airline_icao_unique_code})'
+    )
+    return top_20_airlines[['subject', 'statistic']]
+
+
+@profiled
+def solve_Q1(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, graph_type: str, joins: dict = None, output: str = '.', charts: list = None, country: str = 'Canada', tables: list = None):
+    """Generates a csv file containing top 20 airlines that offer the greatest number of routes 
+       to a country (Canada by default), and calls function to generate a graph of the given graph type
+
+    Parameters
+    ----------
+    airlines: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airlines.yaml
+    airports: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airports.yaml
+    routes: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from routes.yaml
+    graph_type: str
+        String that specifies what type of graph should be created
+    joins: dict
+        Joins shared with the other questions being solved, see join_routes
+    output: str
+        Directory the csv and pdf files are written to
+    charts: list
+        If given, the graph is queued on it for render_charts instead of being drawn right away
+    country: str
+        Country the routes go to
+    tables: list
+        If given, the csv file is queued on it for write_tables instead of being written right away
+    """
+    joins = {} if joins is None else joins
+
+    # Count routes to the country per airline name and print the top 20 to .csv file
+    name_codes, first_rows = group_codes(airlines, joins, ['airline_name'])
+    name_counts = question_counts(airlines, airports, routes, joins, 'q1', country)
+    top_20_airlines = rank_airlines(airlines, name_codes, name_counts)
+    write_csv(tables, top_20_airlines, os.path.join(output, 'q1.csv'))
+
+    title = 'Top 20 Airlines with Canadian routes' if country == 'Canada' else f'Top 20 Airlines with routes to {country}'
 
     if(graph_type=='pie'):
-        pie_graph(
+        draw(
+            charts, 
+            pie_graph, 
             top_20_airlines, 
-            'q1.pdf', 
-            'Top 20 Airlines with Canadian routes'
+            os.path.join(output, 'q1.pdf'), 
+            title
         )
     elif(graph_type=='bar'):
-        bar_graph(
+        draw(
+            charts, 
+            bar_graph, 
             top_20_airlines, 
-            'q1.pdf', 
-            'Top 20 Airlines with Canadian routes', 
+            os.path.join(output, 'q1.pdf'), 
+            title, 
             'Subject', 
             'Number of Routes'
         )       
 
 
-def solve_Q2(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, graph_type: str):
+@profiled
+def solve_Q2(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, graph_type: str, joins: dict = None, output: str = '.', charts: list = None, tables: list = None):
     """Generates a csv file containing the top 30 countries with least appearances as 
        destination country in routes.yaml, and calls function to generate a graph of 
        the given graph type
@@ -149,40 +782,55 @@ def solve_Q2(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFram
         Pandas DataFrame containing list of dictionaries from routes.yaml
     graph_type: str
         String that specifies what type of graph should be created
+    joins: dict
+        Joins shared with the other questions being solved, see join_routes
+    output: str
+        Directory the csv and pdf files are written to
+    charts: list
+        If given, the graph is queued on it for render_charts instead of being drawn right away
+    tables: list
+        If given, the csv file is queued on it for write_tables instead of being written right away
     """
-    merged_routes_airports = pd.merge(
-        routes, 
-        airports, 
-        left_on='route_to_airport_id', 
-        right_on='airport_id'
-    )
+    joins = {} if joins is None else joins
 
     # Creat a df out of the airport countries that appear most frequently in routes
-    country_counts = merged_routes_airports['airport_country'].value_counts().reset_index()
-    country_counts.columns = ['subject', 'statistic']
+    country_codes, first_rows = group_codes(airports, joins, ['airport_country'])
+    counts = question_counts(airlines, airports, routes, joins, 'q2')
+    country_counts = pd.DataFrame({
+        'subject': airports['airport_country'].iloc[first_rows[counts > 0]].to_numpy(),
+        'statistic': counts[counts > 0]
+    })
 
-    least_frequent_countries = country_counts.sort_values(
+    least_frequent_countries = top_k(
+        country_counts, 
+        30, 
         by=['statistic', 'subject']
-    ).head(30)
+    )
 
-    least_frequent_countries.to_csv('q2.csv', index=False)
+    write_csv(tables, least_frequent_countries, os.path.join(output, 'q2.csv'))
 
     if(graph_type=='pie'):
-        pie_graph(
+        draw(
+            charts, 
+            pie_graph, 
             least_frequent_countries, 
-            'q2.pdf', 
+            os.path.join(output, 'q2.pdf'), 
             '30 Countries with Least Appearances as Destination'
         )
     elif(graph_type=='bar'):
-        bar_graph(least_frequent_countries, 
-        'q2.pdf', 
-        '30 Countries with Least Appearances as Destination', 
-        'Subject', 
-        'Number of Appearances'
+        draw(
+            charts, 
+            bar_graph, 
+            least_frequent_countries, 
+            os.path.join(output, 'q2.pdf'), 
+            '30 Countries with Least Appearances as Destination', 
+            'Subject', 
+            'Number of Appearances'
         ) 
 
 
-def solve_Q3(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, graph_type: str):
+@profiled
+def solve_Q3(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, graph_type: str, joins: dict = None, output: str = '.', charts: list = None, tables: list = None):
     """Generates a csv file containing the top 10 destination airports, and calls function to generate
        a graph of the given graph type
 
@@ -196,52 +844,64 @@ def solve_Q3(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFram
         Pandas DataFrame containing list of dictionaries from routes.yaml
     graph_type: str
         String that specifies what type of graph should be created
+    joins: dict
+        Joins shared with the other questions being solved, see join_routes
+    output: str
+        Directory the csv and pdf files are written to
+    charts: list
+        If given, the graph is queued on it for render_charts instead of being drawn right away
+    tables: list
+        If given, the csv file is queued on it for write_tables instead of being written right away
     """
-    merged_routes_airports = pd.merge(
-        routes, 
-        airports, 
-        left_on='route_to_airport_id', 
-        right_on='airport_id'
-    )
-    destination_airports = merged_routes_airports['airport_name'].value_counts().reset_index()
-    destination_airports.columns = ['airport_name', 'statistic']
-    final_destination_airports = pd.merge(
-        destination_airports, 
-        airports[['airport_name','airport_icao_unique_code', 'airport_country', 'airport_city']], 
-        on='airport_name', 
-        how='left'
-    )
+    joins = {} if joins is None else joins
 
-    # Creates new df of number of times each destination airport appears in merged list from above
-    top_destination_airports = final_destination_airports.sort_values(
-        by='statistic', 
-        ascending=False
-    ).head(10)
+    # Count routes per destination airport name, every airport carrying a counted name gets its count
+    name_codes, first_rows = group_codes(airports, joins, ['airport_name'])
+    name_counts = question_counts(airlines, airports, routes, joins, 'q3')
+    statistic = np.where(name_codes >= 0, name_counts[name_codes], 0)
+    final_destination_airports = airports.loc[
+        statistic > 0, ['airport_name','airport_icao_unique_code', 'airport_country', 'airport_city']
+    ]
+    final_destination_airports['statistic'] = statistic[statistic > 0]
+
+    # Creates new df of number of times each destination airport appears in merged list from above,
+    # airports with the same number of routes are ordered by name
+    top_destination_airports = top_k(
+        final_destination_airports, 
+        10, 
+        by=['statistic', 'airport_name'], 
+        ascending=[False, True]
+    )
 
     # Format strings into format specified in test cases
-    top_destination_airports['subject'] = top_destination_airports.apply(
-    lambda x: f"{x['airport_name']} ({x['airport_icao_unique_code']}), {x['airport_city']}, {x['airport_country']}", 
-    axis=1
+    top_destination_airports['subject'] = build_subject(
+        top_destination_airports, 
+        '{airport_name} ({airport_icao_unique_code}), {airport_city}, {airport_country}'
     )
-    top_destination_airports[['subject', 'statistic']].to_csv('q3.csv', index=False)
+    write_csv(tables, top_destination_airports[['subject', 'statistic']], os.path.join(output, 'q3.csv'))
 
     if(graph_type=='pie'):
-        pie_graph(
+        draw(
+            charts, 
+            pie_graph, 
             top_destination_airports[['subject', 'statistic']], 
-            'q3.pdf', 
+            os.path.join(output, 'q3.pdf'), 
             'Top 10 Destination Airports'
         )
     elif(graph_type=='bar'):
-        bar_graph(
+        draw(
+            charts, 
+            bar_graph, 
             top_destination_airports[['subject', 'statistic']], 
-            'q3.pdf', 
+            os.path.join(output, 'q3.pdf'), 
             'Top 10 Destination Airports', 
             'Subject', 
             'Number of Routes'
         ) 
 
 
-def solve_Q4(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, graph_type: str):
+@profiled
+def solve_Q4(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, graph_type: str, joins: dict = None, output: str = '.', charts: list = None, tables: list = None):
     """Generates a csv file containing the top 15 destination cities, and calls function to generate
        a graph of the given graph type
 
@@ -255,50 +915,144 @@ def solve_Q4(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFram
         Pandas DataFrame containing list of dictionaries from routes.yaml
     graph_type: str
         String that specifies what type of graph should be created
+    joins: dict
+        Joins shared with the other questions being solved, see join_routes
+    output: str
+        Directory the csv and pdf files are written to
+    charts: list
+        If given, the graph is queued on it for render_charts instead of being drawn right away
+    tables: list
+        If given, the csv file is queued on it for write_tables instead of being written right away
     """
-    merged_routes_airports = pd.merge(
-        routes, 
-        airports, 
-        left_on='route_to_airport_id', 
-        right_on='airport_id'
-    )
-    # Df created with a count for each time a city appears in the route airport df
-    destination_city = merged_routes_airports[['airport_city', 'airport_country']].value_counts().reset_index(name='statistic')
+    joins = {} if joins is None else joins
+
+    # Df created with a count for each time a city appears as a route destination
+    city_codes, first_rows = group_codes(airports, joins, ['airport_city', 'airport_country'])
+    counts = question_counts(airlines, airports, routes, joins, 'q4')
+    destination_city = airports.iloc[first_rows[counts > 0]][['airport_city', 'airport_country']]
+    destination_city['statistic'] = counts[counts > 0]
 
     # New df with the top 15 cities
-    sorted_destination_city = destination_city.sort_values(
+    sorted_destination_city = top_k(
+        destination_city, 
+        15, 
         by=['statistic', 'airport_city', 'airport_country'],
         ascending=[False, True, True]
-    ).head(15)
+    )
 
     # Format strings into format specified in test cases
-    sorted_destination_city['subject'] = sorted_destination_city.apply(
-        lambda x: f"{x['airport_city']}, {x['airport_country']}", 
-        axis=1
+    sorted_destination_city['subject'] = build_subject(
+        sorted_destination_city, 
+        '{airport_city}, {airport_country}'
     )
 
-    sorted_destination_city[['subject', 'statistic']].to_csv('q4.csv', index=False)
+    write_csv(tables, sorted_destination_city[['subject', 'statistic']], os.path.join(output, 'q4.csv'))
 
     if(graph_type=='pie'):
-        pie_graph(
+        draw(
+            charts, 
+            pie_graph, 
             sorted_destination_city[['subject', 'statistic']], 
-            'q4.pdf', 
+            os.path.join(output, 'q4.pdf'), 
             'Top 15 Destination Cities'
         )
     elif(graph_type=='bar'):
-        bar_graph(
+        draw(
+            charts, 
+            bar_graph, 
             sorted_destination_city[['subject', 'statistic']], 
-            'q4.pdf', 
+            os.path.join(output, 'q4.pdf'), 
             'Top 15 Destination Cities', 
             'Subject', 
             'Number of Routes'
         ) 
 
 
-def solve_Q5(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, graph_type: str):
-    """Generates a csv file containing the unique top 10 Canadian routes with most difference 
-       between the destination altitude and the origin altitude, and calls function to generate
-       a graph of the given graph type
+def country_code(airports: pd.DataFrame, joins: dict, country: str) -> int:
+    """Returns the group code of a country among the airport countries
+
+    Parameters
+    ----------
+    airports: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airports.yaml
+    joins: dict
+        Joins and indexes computed so far, keyed by name
+    country: str
+        Name of the country
+
+    Returns
+    -------
+    int
+        The code, or -2 (which no airport has) if there is no airport in the country
+    """
+    codes, first_rows = group_codes(airports, joins, ['airport_country'])
+    found = np.flatnonzero(airports['airport_country'].iloc[first_rows].to_numpy() == country)
+    return int(found[0]) if len(found) else -2
+
+
+@profiled
+def altitude_pairs(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, joins: dict) -> pd.DataFrame:
+    """Builds the index of unique domestic routes behind q5, for every country in one pass. A route 
+       is identified by its country and the integer codes of its origin and destination ICAO codes, 
+       the first route of every pair is kept
+
+    Parameters
+    ----------
+    airlines: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airlines.yaml
+    airports: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airports.yaml
+    routes: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from routes.yaml
+    joins: dict
+        Joins and indexes computed so far, keyed by name
+
+    Returns
+    -------
+    pd.DataFrame
+        The 'country' code, 'origin' and 'destination' airport rows and the absolute altitude 
+        difference as 'statistic' of every unique route, in the order of routes.yaml
+    """
+    if 'altitude_pairs' in joins:
+        return joins['altitude_pairs']
+
+    destination_rows = join_routes(airlines, airports, routes, joins, 'destination')
+    origin_rows = join_routes(airlines, airports, routes, joins, 'origin')
+    country_codes, _ = group_codes(airports, joins, ['airport_country'])
+    icao_codes, icao_rows = group_codes(airports, joins, ['airport_icao_unique_code'])
+    # Missing ICAO codes all print as the same subject, so they share one extra code
+    icao_codes = np.where(icao_codes >= 0, icao_codes, len(icao_rows))
+    radix = len(icao_rows) + 1
+
+    # Filter on airport countries before looking at any route attribute
+    matched = (destination_rows >= 0) & (origin_rows >= 0)
+    origin_rows = origin_rows[matched]
+    destination_rows = destination_rows[matched]
+    domestic = (country_codes[origin_rows] == country_codes[destination_rows]) & (country_codes[origin_rows] >= 0)
+    origin_rows = origin_rows[domestic]
+    destination_rows = destination_rows[domestic]
+
+    keys = (country_codes[origin_rows] * radix + icao_codes[origin_rows]) * radix + icao_codes[destination_rows]
+    _, first = np.unique(keys, return_index=True)
+    first.sort()
+    origin_rows = origin_rows[first]
+    destination_rows = destination_rows[first]
+
+    altitudes = airports['airport_altitude'].to_numpy(dtype=np.float64)
+    joins['altitude_pairs'] = pd.DataFrame({
+        'country': country_codes[origin_rows],
+        'origin': origin_rows,
+        'destination': destination_rows,
+        'statistic': np.abs(altitudes[origin_rows] - altitudes[destination_rows])
+    })
+    return joins['altitude_pairs']
+
+
+@profiled
+def solve_Q5(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, graph_type: str, joins: dict = None, output: str = '.', charts: list = None, country: str = 'Canada', tables: list = None):
+    """Generates a csv file containing the unique top 10 routes within a country (Canada by default) 
+       with most difference between the destination altitude and the origin altitude, and calls 
+       function to generate a graph of the given graph type
 
        Parameters
        ----------
@@ -310,175 +1064,2589 @@ def solve_Q5(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFram
            Pandas DataFrame containing list of dictionaries from routes.yaml
        graph_type: str
            String that specifies what type of graph should be created
+       joins: dict
+           Joins shared with the other questions being solved, see join_routes
+       output: str
+           Directory the csv and pdf files are written to
+       charts: list
+           If given, the graph is queued on it for render_charts instead of being drawn right away
+       country: str
+           Country the routes start and end in
+       tables: list
+           If given, the csv file is queued on it for write_tables instead of being written right away
     """
-    to_airports = pd.merge(
-        routes, airports, left_on='route_to_airport_id', right_on='airport_id'
-    )
-
-    to_airports = to_airports[
-        ['route_from_aiport_id', 'airport_country', 'airport_icao_unique_code', 'airport_altitude']
-    ].rename(columns={
-        'airport_country': 'dest_airport_country',
-        'airport_icao_unique_code': 'dest_airport_icao_unique_code',
-        'airport_altitude': 'dest_airport_altitude'
-    })
+    joins = {} if joins is None else joins
 
-    from_airports = pd.merge(
-        to_airports, airports, left_on='route_from_aiport_id', right_on='airport_id'
+    # Unique routes within the country, from the pair index shared by all countries
+    pairs = altitude_pairs(airlines, airports, routes, joins)
+    merged_airports = pairs[pairs['country'] == country_code(airports, joins, country)]
+    sorted_merged_airports = top_k(
+        merged_airports, 10, by='statistic', ascending=False
     )
 
-    from_airports = from_airports.rename(columns={
-        'airport_country': 'origin_airport_country',
-        'airport_icao_unique_code': 'origin_airport_icao_unique_code',
-        'airport_altitude': 'origin_airport_altitude'
-    })
-    # Created a df from_airports that has the origin and destination information for each flight in routes
-
-    # Creates df of routes that are within Canada
-    merged_airports = from_airports[
-        (from_airports['dest_airport_country'] == 'Canada') & 
-        (from_airports['origin_airport_country'] == 'Canada')
-    ]
-
-    merged_airports = merged_airports.copy()
+    icao_codes = airports['airport_icao_unique_code'].array
+    sorted_merged_airports['origin_airport_icao_unique_code'] = icao_codes[sorted_merged_airports['origin'].to_numpy()]
+    sorted_merged_airports['dest_airport_icao_unique_code'] = icao_codes[sorted_merged_airports['destination'].to_numpy()]
 
-    # Turns the origin and destination altitudes from strings to numbers
-    merged_airports['origin_airport_altitude'] = pd.to_numeric(
-        merged_airports['origin_airport_altitude'], errors='coerce'
-    )
-    merged_airports['dest_airport_altitude'] = pd.to_numeric(
-        merged_airports['dest_airport_altitude'], errors='coerce'
-    )
-
-    merged_airports['statistic'] = (
-        merged_airports['origin_airport_altitude'] - 
-        merged_airports['dest_airport_altitude']
-    ).abs()
     # Format strings into format specified in test cases
-    merged_airports['subject'] = merged_airports.apply(
-        lambda x: f"{x['origin_airport_icao_unique_code']}-{x['dest_airport_icao_unique_code']}", axis=1
+    sorted_merged_airports['subject'] = build_subject(
+        sorted_merged_airports, 
+        '{origin_airport_icao_unique_code}-{dest_airport_icao_unique_code}'
     )
 
-    merged_airports = merged_airports.drop_duplicates(subset='subject')
-    sorted_merged_airports = merged_airports.sort_values(
-        by='statistic', ascending=False
-    ).head(10)
-
-    sorted_merged_airports[['subject', 'statistic']].to_csv('q5.csv', index=False)
+    write_csv(tables, sorted_merged_airports[['subject', 'statistic']], os.path.join(output, 'q5.csv'))
 
+    title = 'Top 10 Canadian Routes' if country == 'Canada' else f'Top 10 Routes within {country}'
     if graph_type == 'pie':
-        pie_graph(
+        draw(
+            charts, 
+            pie_graph, 
             sorted_merged_airports[['subject', 'statistic']],
-            'q5.pdf',
-            'Top 10 Canadian Routes with Biggest Altitude Difference'
+            os.path.join(output, 'q5.pdf'),
+            f'{title} with Biggest Altitude Difference'
         )
     elif graph_type == 'bar':
-        bar_graph(
+        draw(
+            charts, 
+            bar_graph, 
             sorted_merged_airports[['subject', 'statistic']],
-            'q5.pdf',
-            'Top 10 Canadian Routes with Biggest Altitude Difference',
+            os.path.join(output, 'q5.pdf'),
+            f'{title} with Biggest Altitude Difference',
             'Subject',
             'Altitude Difference'
         )
 
 
-def pie_graph(data: pd.DataFrame, question_number: str, graph_title: str):
-    """Creates a pie chart using the passed in data, and saves it to a pdf
+def country_filename(output: str, question: str, country: str, extension: str = 'csv') -> str:
+    """Returns the path of the output file of a question for one country, e.g. q5-Canada.csv
 
     Parameters
     ----------
-    data: pd.DataFrame
-        A DataFrame with the columns 'subject' and 'statistic'
-    question_number: str
-        The current question the bar graph is being generated for
-    graph_title: str
+    output: str
+        Directory the file is written to
+    question: str
+        The question, e.g. 'q5'
+    country: str
+        Name of the country, characters that do not belong in file names become '_'
+    extension: str
+        Extension of the file
     """
-    data.set_index('subject')['statistic'].plot.pie(
-        autopct='%1.1f%%', 
-        startangle=140, 
-        legend=False, 
-        textprops={'fontsize': 5}
-    )
-    plt.figsize=(24, 16)
+    name = re.sub(r'[^\w.-]+', '_', country.strip())
+    return os.path.join(output, f"{question}-{name}.{extension}")
 
-    plt.ylabel('')
-    plt.title(graph_title, y=1.05)
-    plt.axis('equal')
 
-    plt.savefig(question_number)
-    plt.close()
+# Arrays and tables of the sweep attached by a worker process, see attach_sweep
+SWEEP = {}
 
 
-def bar_graph(data: pd.DataFrame, question_number: str, graph_title: str, x_axis: str, y_axis: str):
-    """Creates a bar graph using the passed in data, and saves it to a pdf
+def share_arrays(arrays: dict) -> tuple:
+    """Copies arrays into one block of shared memory, so worker processes can read them without 
+       a copy of their own
 
     Parameters
     ----------
-    data: pd.DataFrame
-        A DataFrame with the columns 'subject' and 'statistic'
-    question_number: str
-        The current question the bar graph is being generated for
-    graph_title: str
-    x_axis: str
-        Label for x-axis
-    y_axis: str
-        Label for y-axis   
+    arrays: dict
+        The numpy arrays to share, keyed by name
+
+    Returns
+    -------
+    tuple
+        The SharedMemory block, which the caller closes and unlinks, and the layout of the arrays 
+        in it for shared_arrays
     """
-    data.set_index('subject', inplace=True)
-    ax = data['statistic'].plot.bar(
-        legend=False, 
-        figsize=(10, 10), 
-        color='blue'
-    )
+    layout = {}
+    size = 0
+    for name, array in arrays.items():
+        layout[name] = (size, array.dtype.str, array.shape)
+        # Keep every array aligned on 64 bytes
+        size += -(-array.nbytes // 64) * 64
+    memory = multiprocessing.shared_memory.SharedMemory(create=True, size=max(size, 1))
+    for name, view in shared_arrays(memory, layout).items():
+        view[...] = arrays[name]
+    return memory, layout
+
 
-    plt.ylabel(y_axis)
-    plt.xlabel(x_axis)
-    plt.title(graph_title, y=1.05)
-    plt.xticks(rotation=90, ha='right', fontsize=8)
-    plt.tight_layout()
+def shared_arrays(memory, layout: dict) -> dict:
+    """Returns views of the arrays in a block of shared memory
 
-    plt.savefig(question_number)
-    plt.close()
+    Parameters
+    ----------
+    memory: multiprocessing.shared_memory.SharedMemory
+        The block written by share_arrays
+    layout: dict
+        The layout returned by share_arrays
+    """
+    return {
+        name: np.ndarray(shape, dtype=dtype, buffer=memory.buf, offset=offset)
+        for name, (offset, dtype, shape) in layout.items()
+    }
 
 
-def format_args(input: str) -> str:
+def attach_sweep(memory_name: str, layout: dict, tables: dict) -> None:
+    """Initializer of the sweep worker processes, attaches the shared arrays of the sweep
+
+    Parameters
+    ----------
+    memory_name: str
+        Name of the SharedMemory block
+    layout: dict
+        The layout returned by share_arrays
+    tables: dict
+        The string columns of the sweep, see sweep_countries
     """
-    Splits the command line argument by the "=" symbol to isolate the value.
+    memory = multiprocessing.shared_memory.SharedMemory(name=memory_name)
+    SWEEP.update(memory=memory, arrays=shared_arrays(memory, layout), tables=tables)
+
+
+def sweep_batch(questions: list, codes: np.ndarray, output: str) -> None:
+    """Writes the reports of a batch of countries in a worker process attached with attach_sweep"""
+    write_country_reports(questions, SWEEP['arrays'], SWEEP['tables'], codes, output)
+
+
+def write_country_reports(questions: list, arrays: dict, tables: dict, codes: np.ndarray, output: str) -> None:
+    """Writes q1-<country>.csv and q5-<country>.csv for a batch of countries
 
     Parameters
     ----------
-    input : str
-        The command line argument in the form of --OPTION="value".
+    questions: list
+        'q1' and/or 'q5'
+    arrays: dict
+        The numeric arrays of the sweep, see sweep_countries
+    tables: dict
+        The string columns of the sweep, see sweep_countries
+    codes: np.ndarray
+        Airport country codes of the batch
+    output: str
+        Directory the csv files are written to
+    """
+    for code in codes:
+        country = tables['countries'][code]
+        if 'q1' in questions:
+            top_20_airlines = rank_airlines(tables['airlines'], arrays['airline_name_codes'], arrays['q1_counts'][code])
+            top_20_airlines.to_csv(country_filename(output, 'q1', country), index=False)
+        if 'q5' in questions:
+            # The ranked pairs are sorted by country
+            start, end = np.searchsorted(arrays['q5_country'], [code, code + 1])
+            icao_codes = tables['airport_icao_unique_code']
+            top_pairs = pd.DataFrame({
+                'origin_airport_icao_unique_code': icao_codes[arrays['q5_origin'][start:end]], 
+                'dest_airport_icao_unique_code': icao_codes[arrays['q5_destination'][start:end]], 
+                'statistic': arrays['q5_statistic'][start:end]
+            })
+            top_pairs['subject'] = build_subject(
+                top_pairs, 
+                '{origin_airport_icao_unique_code}-{dest_airport_icao_unique_code}'
+            )
+            top_pairs[['subject', 'statistic']].to_csv(country_filename(output, 'q5', country), index=False)
+
+
+@profiled
+def sweep_countries(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, questions: list, joins: dict = None, output: str = '.', workers: int = None) -> None:
+    """Answers q1 and/or q5 for every country of airports.yaml, writing one csv file per country 
+       such as q1-Canada.csv. The routes of all countries are counted and ranked in one pass, then 
+       the countries are split between worker processes, which read the counts from shared memory 
+       and only receive the string columns they print. No graphs are drawn
+
+    Parameters
+    ----------
+    airlines: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airlines.yaml
+    airports: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airports.yaml
+    routes: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from routes.yaml
+    questions: list
+        'q1' and/or 'q5'
+    joins: dict
+        Joins shared with the other questions being solved, see join_routes
+    output: str
+        Directory the csv files are written to
+    workers: int
+        Number of processes writing the reports, defaults to the number of CPUs
+    """
+    joins = {} if joins is None else joins
+    _, first_rows = group_codes(airports, joins, ['airport_country'])
+    arrays = {}
+    tables = {'countries': airports['airport_country'].iloc[first_rows].to_numpy()}
+
+    if 'q1' in questions:
+        arrays['q1_counts'] = country_airline_counts(airlines, airports, routes, joins)
+        arrays['airline_name_codes'] = group_codes(airlines, joins, ['airline_name'])[0]
+        tables['airlines'] = airlines[['airline_name', 'airline_icao_unique_code']]
+    if 'q5' in questions:
+        # Sort the pairs by country then altitude difference and keep the top 10 of every country
+        pairs = altitude_pairs(airlines, airports, routes, joins)
+        ranked = pairs.sort_values(
+            by=['country', 'statistic'], ascending=[True, False], kind='stable'
+        ).groupby('country', sort=False).head(10)
+        for column in ('country', 'origin', 'destination', 'statistic'):
+            arrays['q5_' + column] = ranked[column].to_numpy()
+        tables['airport_icao_unique_code'] = airports['airport_icao_unique_code'].array
+
+    workers = max(1, min(len(first_rows), workers or os.cpu_count() or 1))
+    batches = np.array_split(np.arange(len(first_rows)), workers)
+    if workers == 1:
+        write_country_reports(questions, arrays, tables, batches[0], output)
+        return
+
+    memory, layout = share_arrays(arrays)
+    try:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, 
+            initializer=attach_sweep, 
+            initargs=(memory.name, layout, tables)
+        ) as pool:
+            for future in [pool.submit(sweep_batch, questions, batch, output) for batch in batches]:
+                future.result()
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+def csr_adjacency(sources: np.ndarray, targets: np.ndarray, size: int) -> tuple:
+    """Builds a compressed sparse row adjacency structure from the edges of a directed graph
+
+    Parameters
+    ----------
+    sources: np.ndarray
+        Source node of every edge
+    targets: np.ndarray
+        Target node of every edge
+    size: int
+        Number of nodes
 
     Returns
     -------
-    str
-        The isolated value from the command line argument, e.g., "value".
+    tuple
+        indptr and indices: the targets of node i are indices[indptr[i]:indptr[i + 1]], in the 
+        order of the edges
     """
-    sorted = input.split("=")
-    return sorted[1]
+    order = np.argsort(sources, kind='stable')
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=size), out=indptr[1:])
+    return indptr, targets[order].astype(np.int32)
 
 
-def main() -> None:
-    """Formats arguments from command line, then loads airline data and calls solve function"""
-    for x in range(1, 6):
-        sys.argv[x] = format_args(sys.argv[x])
+@profiled
+def route_graph(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, joins: dict) -> dict:
+    """Builds the route network, a directed graph over airport rows with an edge from the origin to 
+       the destination of every route, and shares it between questions
+
+    Parameters
+    ----------
+    airlines: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airlines.yaml
+    airports: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airports.yaml
+    routes: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from routes.yaml
+    joins: dict
+        Joins and indexes computed so far, keyed by name
+
+    Returns
+    -------
+    dict
+        'out_degree' and 'in_degree', the number of routes leaving and reaching every airport, 
+        'forward' and 'backward', the CSR adjacency (see csr_adjacency) of the distinct 
+        origin-destination pairs and of their reverse
+    """
+    if 'graph' in joins:
+        return joins['graph']
+
+    origin_rows = join_routes(airlines, airports, routes, joins, 'origin')
+    destination_rows = join_routes(airlines, airports, routes, joins, 'destination')
+    matched = (origin_rows >= 0) & (destination_rows >= 0)
+    origin_rows = origin_rows[matched].astype(np.int64)
+    destination_rows = destination_rows[matched].astype(np.int64)
+    size = len(airports)
+
+    # Routes flown by several airlines are one edge
+    edges = np.unique(origin_rows * size + destination_rows)
+    sources, targets = np.divmod(edges, size)
+    joins['graph'] = {
+        'out_degree': np.bincount(origin_rows, minlength=size),
+        'in_degree': np.bincount(destination_rows, minlength=size),
+        'forward': csr_adjacency(sources, targets, size),
+        'backward': csr_adjacency(targets, sources, size)
+    }
+    return joins['graph']
+
+
+def neighbours(adjacency: tuple, nodes: np.ndarray) -> tuple:
+    """Gathers the targets of many nodes of a CSR adjacency at once
+
+    Parameters
+    ----------
+    adjacency: tuple
+        indptr and indices, see csr_adjacency
+    nodes: np.ndarray
+        The nodes whose targets are gathered
+
+    Returns
+    -------
+    tuple
+        For every gathered edge, the position in nodes of its source and its target
+    """
+    indptr, indices = adjacency
+    starts = indptr[nodes]
+    lengths = indptr[nodes + 1] - starts
+    owners = np.repeat(np.arange(len(nodes)), lengths)
+    # Position of every edge in indices: its source's start plus its offset among the source's edges
+    offsets = np.arange(len(owners)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return owners, indices[np.repeat(starts, lengths) + offsets]
+
+
+# Unsigned words holding one bit per search, from the smallest, see breadth_first
+SEARCH_WORDS = (np.uint8, np.uint16, np.uint32, np.uint64)
+
+
+@profiled
+def breadth_first(adjacency: tuple, sources: np.ndarray, max_hops: int = None) -> tuple:
+    """Runs a breadth first search from a batch of sources together. Up to 64 searches share 
+       one machine word per node, with one bit per search, so every level expands the frontiers 
+       of all of them with a single pass over the edges of the nodes any of them just reached, 
+       see search_words. Larger batches are searched 64 sources at a time, a single source node 
+       by node with search_nodes
+
+    Parameters
+    ----------
+    adjacency: tuple
+        indptr and indices, see csr_adjacency
+    sources: np.ndarray
+        The start node of every search
+    max_hops: int
+        Depth at which the searches stop, None to search until nothing new is reached
+
+    Returns
+    -------
+    tuple
+        hops and parents, arrays of shape (len(sources), number of nodes). hops is the fewest edges 
+        from the source to every node, -1 if it is not reached, and parents the node before it on 
+        such a path, -1 for the source and unreached nodes
+    """
+    size = len(adjacency[0]) - 1
+    sources = np.asarray(sources, dtype=np.int64)
+    hops = np.full((len(sources), size), -1, dtype=np.int32)
+    parents = np.full((len(sources), size), -1, dtype=np.int32)
+    if len(sources) == 1:
+        # A lone search has nothing to share a word with
+        search_nodes(adjacency, int(sources[0]), max_hops, hops[0], parents[0])
+        return hops, parents
+    width = np.iinfo(SEARCH_WORDS[-1]).bits
+    for start in range(0, len(sources), width):
+        stop = min(start + width, len(sources))
+        search_words(adjacency, sources[start:stop], max_hops, hops[start:stop], parents[start:stop])
+    return hops, parents
+
+
+def search_nodes(adjacency: tuple, source: int, max_hops: int, hops: np.ndarray, parents: np.ndarray) -> None:
+    """Runs the breadth first search of one source, expanding its frontier nodes with one gather 
+       over the CSR adjacency per level
+
+    Parameters
+    ----------
+    adjacency: tuple
+        indptr and indices, see csr_adjacency
+    source: int
+        The start node
+    max_hops: int
+        Depth at which the search stops, None to search until nothing new is reached
+    hops: np.ndarray
+        The row of hops of this search, filled in place, see breadth_first
+    parents: np.ndarray
+        The row of parents of this search, filled in place, see breadth_first
+    """
+    hops[source] = 0
+    frontier = np.array([source], dtype=np.int64)
+    level = 0
+    while len(frontier) and (max_hops is None or level < max_hops):
+        level += 1
+        owners, targets = neighbours(adjacency, frontier)
+        new = hops[targets] < 0
+        targets = targets[new]
+        candidates = frontier[owners[new]]
+        # A node reached from several frontier nodes keeps one of them as its parent, and enters 
+        # the next frontier once, through the edge from that parent
+        parents[targets] = candidates
+        hops[targets] = level
+        frontier = targets[parents[targets] == candidates]
+
+
+def search_words(adjacency: tuple, sources: np.ndarray, max_hops: int, hops: np.ndarray, parents: np.ndarray) -> None:
+    """Runs the breadth first searches of up to 64 sources, bit i of the word of a node standing 
+       for the search from sources[i]. A level ORs the frontier word of every active node into its 
+       targets, the boolean product of the adjacency with the frontiers of the whole batch
+
+    Parameters
+    ----------
+    adjacency: tuple
+        indptr and indices, see csr_adjacency
+    sources: np.ndarray
+        The start node of every search, at most as many as the bits of a word
+    max_hops: int
+        Depth at which the searches stop, None to search until nothing new is reached
+    hops: np.ndarray
+        The rows of hops of these searches, filled in place, see breadth_first
+    parents: np.ndarray
+        The rows of parents of these searches, filled in place, see breadth_first
+    """
+    size = len(adjacency[0]) - 1
+    word = np.dtype(next(word for word in SEARCH_WORDS if np.iinfo(word).bits >= len(sources)))
+    hops[np.arange(len(sources)), sources] = 0
+
+    frontier = np.zeros(size, dtype=word)
+    np.bitwise_or.at(frontier, sources, np.left_shift(1, np.arange(len(sources))).astype(word))
+    seen = frontier.copy()
+    active = np.flatnonzero(frontier)
+    level = 0
+    while len(active) and (max_hops is None or level < max_hops):
+        level += 1
+        owners, targets = neighbours(adjacency, active)
+        new = frontier[active[owners]] & ~seen[targets]
+        edges = np.flatnonzero(new)
+        order = np.argsort(targets[edges])
+        owners, targets, new = active[owners[edges[order]]], targets[edges[order]], new[edges[order]]
+        frontier = np.zeros(size, dtype=word)
+        np.bitwise_or.at(frontier, targets, new)
+        seen |= frontier
+        active = np.flatnonzero(frontier)
+
+        # A node reached from several frontier nodes takes its parent in every search from one 
+        # edge that brought that search: an edge only claims the searches none of the edges sorted 
+        # before it to the same node brought, their OR being a segmented scan
+        brought = exclusive_or_scan(targets, new)
+        claimed = np.flatnonzero(new & ~brought)
+        owners, targets, words = owners[claimed], targets[claimed], new[claimed] & ~brought[claimed]
+        # The claimed words hold every new (search, node) pair once, taken a lowest bit at a time
+        while len(words):
+            lowest = words & (~words + word.type(1))
+            search = np.frexp(lowest.astype(np.float64))[1] - 1
+            hops[search, targets] = level
+            parents[search, targets] = owners
+            words = words ^ lowest
+            left = np.flatnonzero(words)
+            owners, targets, words = owners[left], targets[left], words[left]
+
+
+def exclusive_or_scan(keys: np.ndarray, words: np.ndarray) -> np.ndarray:
+    """Returns for every word the OR of the words before it with the same key, keys being sorted. 
+       Each of the log2(longest run of a key) steps ORs in the words twice as far back
+
+    Parameters
+    ----------
+    keys: np.ndarray
+        Sorted keys, the words of a key are the run of its positions
+    words: np.ndarray
+        Unsigned integer words
+    """
+    scan = words.copy()
+    shift = 1
+    while shift < len(words):
+        same = keys[shift:] == keys[:-shift]
+        if not same.any():
+            break
+        scan[shift:] |= np.where(same, scan[:-shift], 0).astype(words.dtype)
+        shift *= 2
+    brought = np.zeros_like(words)
+    brought[1:] = np.where(keys[1:] == keys[:-1], scan[:-1], 0).astype(words.dtype)
+    return brought
+
+
+def airport_row(airports: pd.DataFrame, joins: dict, airport: str) -> int:
+    """Finds the row of an airport given by ICAO code or airport id
+
+    Parameters
+    ----------
+    airports: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airports.yaml
+    joins: dict
+        Joins and indexes computed so far, keyed by name
+    airport: str
+        ICAO code, e.g. 'CYYZ', or airport id, e.g. '193'
+
+    Returns
+    -------
+    int
+        The first row of the airport
+    """
+    if airport.isdigit():
+        rows = lookup_rows(airport_index(airports, joins), np.array([int(airport)]))
+        rows = rows[rows >= 0]
+    else:
+        rows = lookup_value(attribute_index(airports, joins, 'airport_icao_unique_code'), airport)
+        if 'airport_rows' in joins:
+            rows = np.intersect1d(rows, joins['airport_rows'])
+    if len(rows) == 0:
+        raise ValueError(f'unknown airport {airport}')
+    return int(rows[0])
+
+
+def query_airports(airports: pd.DataFrame, joins: dict, query: dict, question: str) -> list:
+    """Finds the rows of the airports a route network question is asked about
+
+    Parameters
+    ----------
+    airports: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airports.yaml
+    joins: dict
+        Joins and indexes computed so far, keyed by name
+    query: dict
+        The 'from' and 'to' airports and the number of 'hops', see graph_query
+    question: str
+        The route network question, "reach" or "path"
+
+    Returns
+    -------
+    list
+        The row of every airport in QUERY_AIRPORTS of the question, in that order
+    """
+    check_query(question, query)
+    return [airport_row(airports, joins, query[name]) for name in QUERY_AIRPORTS[question]]
+
+
+def check_query(question: str, query: dict) -> None:
+    """Raises a ValueError if the query misses an airport one of the route network questions 
+       needs, e.g. --FROM for reach
+
+    Parameters
+    ----------
+    question: str
+        The questions being asked, see solve
+    query: dict
+        The 'from' and 'to' airports and the number of 'hops', see graph_query
+    """
+    for name in question.split(","):
+        missing = ['--' + option.upper() for option in QUERY_AIRPORTS.get(name, ()) if not query.get(option)]
+        if missing:
+            raise ValueError(f'{name} needs {" and ".join(missing)}')
+
+
+def airport_subjects(airports: pd.DataFrame, rows: np.ndarray) -> pd.Series:
+    """Labels airport rows as 'name (ICAO code)'"""
+    return build_subject(
+        airports.iloc[rows][['airport_name', 'airport_icao_unique_code']].reset_index(drop=True), 
+        '{airport_name} ({airport_icao_unique_code})'
+    )
+
+
+@profiled
+def solve_degree(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, graph_type: str, joins: dict = None, output: str = '.', charts: list = None, query: dict = None, tables: list = None):
+    """Generates a csv file containing the top 20 hub airports with the most routes leaving and 
+       reaching them, and calls function to generate a graph of the given graph type
+
+    Parameters
+    ----------
+    airlines: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airlines.yaml
+    airports: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airports.yaml
+    routes: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from routes.yaml
+    graph_type: str
+        String that specifies what type of graph should be created
+    joins: dict
+        Joins shared with the other questions being solved, see join_routes
+    output: str
+        Directory the csv and pdf files are written to
+    charts: list
+        If given, the graph is queued on it for render_charts instead of being drawn right away
+    query: dict
+        Not used, the ranking covers every airport
+    tables: list
+        If given, the csv file is queued on it for write_tables instead of being written right away
+    """
+    joins = {} if joins is None else joins
+    graph = route_graph(airlines, airports, routes, joins)
+
+    degrees = pd.DataFrame({
+        'airport_name': airports['airport_name'], 
+        'out_degree': graph['out_degree'], 
+        'in_degree': graph['in_degree'], 
+        'statistic': graph['out_degree'] + graph['in_degree']
+    })
+    hubs = top_k(
+        degrees[degrees['statistic'] > 0], 
+        20, 
+        by=['statistic', 'airport_name'], 
+        ascending=[False, True]
+    )
+    hubs['subject'] = airport_subjects(airports, hubs.index.to_numpy()).to_numpy()
+    hubs = hubs[['subject', 'statistic', 'out_degree', 'in_degree']]
+    write_csv(tables, hubs, os.path.join(output, 'degree.csv'))
+
+    if graph_type == 'pie':
+        draw(charts, pie_graph, hubs, os.path.join(output, 'degree.pdf'), 'Top 20 Hub Airports by Number of Routes')
+    elif graph_type == 'bar':
+        draw(
+            charts, 
+            bar_graph, 
+            hubs, 
+            os.path.join(output, 'degree.pdf'), 
+            'Top 20 Hub Airports by Number of Routes', 
+            'Subject', 
+            'Number of Routes'
+        )
+
+
+@profiled
+def solve_reach(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, graph_type: str, joins: dict = None, output: str = '.', charts: list = None, query: dict = None, tables: list = None):
+    """Generates a csv file containing the airports that can be reached from query['from'] with at 
+       most query['hops'] flights (1 by default) and the fewest flights to each of them
+
+    Parameters
+    ----------
+    airlines: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airlines.yaml
+    airports: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airports.yaml
+    routes: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from routes.yaml
+    graph_type: str
+        Not used, the list is too long for a graph
+    joins: dict
+        Joins shared with the other questions being solved, see join_routes
+    output: str
+        Directory the csv file is written to
+    charts: list
+        Not used
+    query: dict
+        The 'from' airport and the number of 'hops'
+    tables: list
+        If given, the csv file is queued on it for write_tables instead of being written right away
+    """
+    joins = {} if joins is None else joins
+    graph = route_graph(airlines, airports, routes, joins)
+    source, = query_airports(airports, joins, query, 'reach')
+    try:
+        max_hops = int(query.get('hops', 1))
+    except ValueError:
+        raise ValueError(f'--HOPS must be a whole number, not {query["hops"]}') from None
+    hops, _ = breadth_first(graph['forward'], np.array([source]), max_hops)
+
+    reached = np.flatnonzero(hops[0] > 0)
+    reachable = pd.DataFrame({
+        'subject': airport_subjects(airports, reached), 
+        'statistic': hops[0][reached]
+    }).sort_values(by=['statistic', 'subject'], kind='stable')
+    write_csv(tables, reachable, os.path.join(output, 'reach.csv'))
+
+
+@profiled
+def solve_path(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, graph_type: str, joins: dict = None, output: str = '.', charts: list = None, query: dict = None, tables: list = None):
+    """Generates a csv file containing a path with the fewest flights from query['from'] to 
+       query['to'], one airport per line with the number of flights taken to get there. The file 
+       only has its header if there is no such path
+
+    Parameters
+    ----------
+    airlines: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airlines.yaml
+    airports: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airports.yaml
+    routes: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from routes.yaml
+    graph_type: str
+        Not used
+    joins: dict
+        Joins shared with the other questions being solved, see join_routes
+    output: str
+        Directory the csv file is written to
+    charts: list
+        Not used
+    query: dict
+        The 'from' and 'to' airports
+    tables: list
+        If given, the csv file is queued on it for write_tables instead of being written right away
+    """
+    joins = {} if joins is None else joins
+    graph = route_graph(airlines, airports, routes, joins)
+    source, target = query_airports(airports, joins, query, 'path')
+    hops, parents = breadth_first(graph['forward'], np.array([source]))
+
+    # Walk back from the target along the parents
+    path = []
+    if hops[0][target] >= 0:
+        node = target
+        while node >= 0:
+            path.append(node)
+            node = parents[0][node]
+    path = np.array(path[::-1], dtype=np.int64)
+    steps = pd.DataFrame({
+        'subject': airport_subjects(airports, path), 
+        'statistic': np.arange(len(path))
+    })
+    write_csv(tables, steps, os.path.join(output, 'path.csv'))
 
-    #load yaml files
-    with open(sys.argv[1], 'r') as file:
-        yaml_airlines: Any = yaml.safe_load(file)
-    with open(sys.argv[2], 'r') as file:
-        yaml_airports: Any = yaml.safe_load(file)
-    with open(sys.argv[3], 'r') as file:
-        yaml_routes: Any = yaml.safe_load(file)
 
-    # Loading individual data for pandas dataframe
-    airlines_list = yaml_airlines['airlines']
-    airports_list = yaml_airports['airports']
-    routes_list = yaml_routes['routes']
+@profiled
+def top_k(data: pd.DataFrame, k: int, by, ascending=True) -> pd.DataFrame:
+    """Selects the first k rows of data in sorted order without sorting all of it. Rows tied with 
+       the k-th row on the first sort column are found with np.partition, and only those are sorted
 
-    solve(pd.DataFrame(airlines_list), pd.DataFrame(airports_list), pd.DataFrame(routes_list), sys.argv[4], sys.argv[5])
+    Parameters
+    ----------
+    data: pd.DataFrame
+        The rows to select from
+    k: int
+        Number of rows to select
+    by: str or list
+        Column or columns to sort by, the first one should be numeric
+    ascending: bool or list
+        Sort order, one per column of by
+
+    Returns
+    -------
+    pd.DataFrame
+        The same rows, in the same order, as data.sort_values(by, ascending, kind='stable').head(k)
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    ascending = [ascending] * len(by) if isinstance(ascending, bool) else list(ascending)
+
+    first = data[by[0]]
+    if len(data) > k > 0 and pd.api.types.is_numeric_dtype(first):
+        # Missing values go last in either order, like in sort_values
+        values = first.to_numpy(dtype=np.float64)
+        values = np.where(np.isnan(values), np.inf, values if ascending[0] else -values)
+        threshold = np.partition(values, k - 1)[k - 1]
+        data = data[values <= threshold]
+
+    return data.sort_values(by=by, ascending=ascending, kind='stable').head(k)
+
+
+@profiled
+def build_subject(data: pd.DataFrame, template: str) -> pd.Series:
+    """Builds the subject labels of a result with column-wise string concatenation, instead of 
+       formatting every row on its own. Call it after the top rows have been selected
+
+    Parameters
+    ----------
+    data: pd.DataFrame
+        The selected result rows
+    template: str
+        The label format, with column names in braces, e.g. '{airport_city}, {airport_country}'
+
+    Returns
+    -------
+    pd.Series
+        The label of every row, equal to formatting the template with the row values
+    """
+    subject = pd.Series('', index=data.index, dtype=object)
+    for literal, column, _, _ in string.Formatter().parse(template):
+        if literal:
+            subject = subject + literal
+        if column is not None:
+            subject = subject + label_text(data[column])
+    return subject
+
+
+def label_text(values: pd.Series) -> pd.Series:
+    """Converts a column to the text build_subject puts in a label, the same as formatting one 
+       row at a time did: missing strings become 'None', like the yaml nulls, and missing numbers 
+       'nan', where astype(str) would give 'nan' for both or keep them missing
+
+    Parameters
+    ----------
+    values: pd.Series
+        A column of the selected result rows
+
+    Returns
+    -------
+    pd.Series
+        The text of every value
+    """
+    text = values.astype(object)
+    if not pd.api.types.is_numeric_dtype(values):
+        text = text.where(values.notna(), None)
+    return text.map(str)
+
+
+def new_figure(figsize: tuple = None):
+    """Creates a matplotlib Figure that pyplot does not know about, so graphs share no global state 
+       and can be drawn by several threads or processes. matplotlib is imported the first time a 
+       graph is drawn, with the non-interactive Agg backend selected up front
+
+    Parameters
+    ----------
+    figsize: tuple
+        Width and height in inches, matplotlib's default when None
+
+    Returns
+    -------
+    matplotlib.figure.Figure
+        The new figure
+    """
+    if 'matplotlib' not in sys.modules:
+        import matplotlib
+        matplotlib.use('Agg')
+    from matplotlib.figure import Figure
+    return Figure(figsize=figsize)
+
+
+@profiled
+def pie_graph(data: pd.DataFrame, question_number: str, graph_title: str):
+    """Creates a pie chart using the passed in data, and saves it to a pdf
+
+    Parameters
+    ----------
+    data: pd.DataFrame
+        A DataFrame with the columns 'subject' and 'statistic'
+    question_number: str
+        The current question the bar graph is being generated for
+    graph_title: str
+    """
+    figure = new_figure()
+    ax = figure.subplots()
+    data.set_index('subject')['statistic'].plot.pie(
+        ax=ax, 
+        autopct='%1.1f%%', 
+        startangle=140, 
+        legend=False, 
+        textprops={'fontsize': 5}
+    )
+
+    ax.set_ylabel('')
+    ax.set_title(graph_title, y=1.05)
+    ax.axis('equal')
+
+    figure.savefig(question_number, metadata=GRAPH_METADATA)
+
+
+@profiled
+def bar_graph(data: pd.DataFrame, question_number: str, graph_title: str, x_axis: str, y_axis: str):
+    """Creates a bar graph using the passed in data, and saves it to a pdf
+
+    Parameters
+    ----------
+    data: pd.DataFrame
+        A DataFrame with the columns 'subject' and 'statistic'
+    question_number: str
+        The current question the bar graph is being generated for
+    graph_title: str
+    x_axis: str
+        Label for x-axis
+    y_axis: str
+        Label for y-axis   
+    """
+    figure = new_figure((10, 10))
+    ax = figure.subplots()
+    data.set_index('subject')['statistic'].plot.bar(
+        ax=ax, 
+        legend=False, 
+        color='blue'
+    )
+
+    ax.set_ylabel(y_axis)
+    ax.set_xlabel(x_axis)
+    ax.set_title(graph_title, y=1.05)
+    for label in ax.get_xticklabels():
+        label.set_rotation(90)
+        label.set_horizontalalignment('right')
+        label.set_fontsize(8)
+    figure.tight_layout()
+
+    figure.savefig(question_number, metadata=GRAPH_METADATA)
+
+
+def draw(charts: list, graph, *args) -> None:
+    """Draws a graph right away, or queues it to be drawn by render_charts
+
+    Parameters
+    ----------
+    charts: list
+        Queue of graphs to draw, or None to draw the graph now
+    graph: function
+        pie_graph or bar_graph
+    args: tuple
+        The arguments of graph
+    """
+    if charts is None:
+        graph(*args)
+    else:
+        charts.append((graph, args))
+
+
+def write_csv(tables: list, frame: pd.DataFrame, path: str) -> None:
+    """Writes the csv file of a question right away, or queues it to be written by write_tables
+
+    Parameters
+    ----------
+    tables: list
+        Queue of csv files to write, or None to write the file now
+    frame: pd.DataFrame
+        The rows of the csv file
+    path: str
+        Path of the csv file
+    """
+    if tables is None:
+        frame.to_csv(path, index=False)
+    else:
+        tables.append((frame, path))
+
+
+def write_tables(tables: list) -> None:
+    """Writes the csv files queued by write_csv
+
+    Parameters
+    ----------
+    tables: list
+        Csv files queued by write_csv
+    """
+    for frame, path in tables:
+        frame.to_csv(path, index=False)
+
+
+@profiled
+def render_charts(charts: list, workers: int = None) -> None:
+    """Draws queued graphs, spreading them over a pool of processes when there are several. Each 
+       graph only depends on its own arguments, so the files are the same as when drawn one by one
+
+    Parameters
+    ----------
+    charts: list
+        Graphs queued by draw
+    workers: int
+        Maximum number of processes, defaults to the number of CPUs
+    """
+    workers = min(len(charts), workers or os.cpu_count() or 1)
+    if workers <= 1:
+        for graph, args in charts:
+            graph(*args)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        if PROFILE is None:
+            for future in [pool.submit(graph, *args) for graph, args in charts]:
+                future.result()
+            return
+        # Collect the trace events of the graphs drawn by the workers
+        for future in [pool.submit(profiled_call, PROFILE['trace_memory'], graph, *args) for graph, args in charts]:
+            events = future.result()
+            with PROFILE['lock']:
+                PROFILE['events'].extend(events)
+
+
+def format_args(input: str) -> str:
+    """
+    Splits the command line argument by the "=" symbol to isolate the value.
+
+    Parameters
+    ----------
+    input : str
+        The command line argument in the form of --OPTION="value".
+
+    Returns
+    -------
+    str
+        The isolated value from the command line argument, e.g., "value".
+    """
+    sorted = input.split("=", 1)
+    return sorted[1]
+
+
+def parse_args(arguments: list) -> dict:
+    """
+    Collects command line arguments of the form --OPTION="value" into a dictionary.
+
+    Parameters
+    ----------
+    arguments : list
+        The command line arguments, without the program name.
+
+    Returns
+    -------
+    dict
+        The value of every option keyed by its name, e.g., {"QUESTION": "q1"}. Options given 
+        without a value map to an empty string.
+    """
+    options = {}
+    for argument in arguments:
+        name = argument.split("=", 1)[0].lstrip("-")
+        options[name] = format_args(argument) if "=" in argument else ""
+    return options
+
+
+def graph_query(options: dict) -> dict:
+    """Collects the --FROM, --TO and --HOPS options of the route network questions
+
+    Parameters
+    ----------
+    options: dict
+        The command line options, see parse_args
+
+    Returns
+    -------
+    dict
+        The given options under the keys 'from', 'to' and 'hops'
+    """
+    return {name.lower(): options[name] for name in ('FROM', 'TO', 'HOPS') if name in options}
+
+
+def filter_options(options: dict) -> dict:
+    """Collects the airport filter options, see select_airports. They have their own FILTER_ names, 
+       --COUNTRY only sets the country of q1 and q5
+
+    Parameters
+    ----------
+    options: dict
+        The command line options, see parse_args
+
+    Returns
+    -------
+    dict
+        The given filters under the keys 'country', 'city', 'icao', 'min_alt' and 'max_alt'
+    """
+    airport_filter = {
+        name.lower(): options['FILTER_' + name] for name in ('COUNTRY', 'CITY', 'ICAO') if 'FILTER_' + name in options
+    }
+    for name in ('MIN_ALT', 'MAX_ALT'):
+        if 'FILTER_' + name in options:
+            airport_filter[name.lower()] = float(options['FILTER_' + name])
+    return airport_filter
+
+
+CACHE_DIRECTORY = '.route_cache'
+CACHE_VERSION = 5
+ROUTE_COLUMNS = ['route_airline_id', 'route_from_aiport_id', 'route_to_airport_id']
+ROUTE_CHUNK_SIZE = 65536
+# Ids such as '\N' that are not numbers; never equal to a real airline or airport id
+MISSING_ID = np.iinfo(np.int32).min
+# Start of every route in routes.yaml, where the file can be split for parallel parsing
+ROUTE_BOUNDARY = b'\n- route_airline_id:'
+CSV_CHUNK_SIZE = 65536
+COLUMNAR_EXTENSION = '.npz'
+# Columns of airlines, airports and routes read by every question
+QUESTION_COLUMNS = {
+    'q1': (['airline_id', 'airline_name', 'airline_icao_unique_code'], ['airport_id', 'airport_country'], ['route_airline_id', 'route_to_airport_id']),
+    'q2': (['airline_id'], ['airport_id', 'airport_country'], ['route_to_airport_id']),
+    'q3': (['airline_id'], ['airport_id', 'airport_name', 'airport_icao_unique_code', 'airport_city', 'airport_country'], ['route_to_airport_id']),
+    'q4': (['airline_id'], ['airport_id', 'airport_city', 'airport_country'], ['route_to_airport_id']),
+    'q5': (['airline_id'], ['airport_id', 'airport_icao_unique_code', 'airport_country', 'airport_altitude'], ['route_from_aiport_id', 'route_to_airport_id']),
+    'degree': (['airline_id'], ['airport_id', 'airport_name', 'airport_icao_unique_code'], ['route_from_aiport_id', 'route_to_airport_id']),
+    'reach': (['airline_id'], ['airport_id', 'airport_name', 'airport_icao_unique_code'], ['route_from_aiport_id', 'route_to_airport_id']),
+    'path': (['airline_id'], ['airport_id', 'airport_name', 'airport_icao_unique_code'], ['route_from_aiport_id', 'route_to_airport_id'])
+}
+# Airport columns read by the airport filters, see select_airports
+FILTER_COLUMNS = {
+    'country': 'airport_country', 
+    'city': 'airport_city', 
+    'icao': 'airport_icao_unique_code', 
+    'min_alt': 'airport_altitude', 
+    'max_alt': 'airport_altitude'
+}
+
+
+def question_columns(question: str, airport_filter: dict = None) -> tuple:
+    """Returns the columns of airlines, airports and routes needed to answer questions
+
+    Parameters
+    ----------
+    question: str
+        The questions, as given to solve
+    airport_filter: dict
+        The airport filter, see select_airports
+
+    Returns
+    -------
+    tuple
+        Lists of the airlines, airports and routes columns, or None for a dataset whose columns are 
+        all needed, e.g. for an unknown question
+    """
+    questions = ["q1", "q2", "q3", "q4", "q5"] if question == "all" else question.split(",")
+    if any(name not in QUESTION_COLUMNS for name in questions):
+        return None, None, None
+    columns = ([], [], [])
+    for name in questions:
+        for needed, wanted in zip(columns, QUESTION_COLUMNS[name]):
+            needed.extend(column for column in wanted if column not in needed)
+    columns[1].extend(FILTER_COLUMNS[name] for name in airport_filter or {} if FILTER_COLUMNS[name] not in columns[1])
+    return columns
+
+
+def file_fingerprint(path: str, with_hash: bool = True) -> dict:
+    """Describes a source file by its absolute path, size, modification time and content hash
+
+    Parameters
+    ----------
+    path: str
+        Path of the source file
+    with_hash: bool
+        Whether the sha256 digest of the file contents should be computed
+
+    Returns
+    -------
+    dict
+        The fingerprint used as the key of the dataset cache
+    """
+    stat = os.stat(path)
+    fingerprint = {
+        'path': os.path.abspath(path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns
+    }
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+        fingerprint['sha256'] = digest.hexdigest()
+    return fingerprint
+
+
+def cache_path(path: str) -> str:
+    """Returns the directory holding the binary columnar cache of a source file
+
+    Parameters
+    ----------
+    path: str
+        Path of the source file
+    """
+    source = os.path.abspath(path)
+    return os.path.join(os.path.dirname(source), CACHE_DIRECTORY, os.path.basename(source))
+
+
+@profiled
+def write_dataset_cache(path: str, frame: pd.DataFrame) -> None:
+    """Writes a parsed dataset to a binary columnar cache next to its source file. Numeric columns
+       are stored as typed arrays, categorical string columns as their codes, in the integer type 
+       pandas picks for them, plus the string dictionary
+
+    Parameters
+    ----------
+    path: str
+        Path of the source file the DataFrame was parsed from
+    frame: pd.DataFrame
+        The parsed dataset
+    """
+    # Every run stages into its own directory, so concurrent first runs never share files
+    target = cache_path(path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=os.path.basename(target) + '.', suffix='.tmp', dir=os.path.dirname(target))
+    try:
+        stage_dataset_cache(path, frame, staging)
+        # The old cache is moved aside before it is removed, so readers see either cache or none
+        stale = tempfile.mkdtemp(prefix=os.path.basename(target) + '.', suffix='.old', dir=os.path.dirname(target))
+        try:
+            os.replace(target, stale)
+        except FileNotFoundError:
+            pass
+        try:
+            os.replace(staging, target)
+        except OSError:
+            # A concurrent run put its cache in place first
+            pass
+        shutil.rmtree(stale, ignore_errors=True)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def stage_dataset_cache(path: str, frame: pd.DataFrame, staging: str) -> None:
+    """Writes the files of the binary columnar cache of a dataset into a staging directory, see 
+       write_dataset_cache
+
+    Parameters
+    ----------
+    path: str
+        Path of the source file the DataFrame was parsed from
+    frame: pd.DataFrame
+        The parsed dataset
+    staging: str
+        The empty directory the files are written to
+    """
+    columns = []
+    for index, name in enumerate(frame.columns):
+        column = frame[name]
+        if pd.api.types.is_numeric_dtype(column):
+            np.save(os.path.join(staging, f'{index}.data.npy'), column.to_numpy())
+            columns.append({'name': name, 'kind': 'numeric'})
+        else:
+            column = pd.Categorical(column)
+            np.save(os.path.join(staging, f'{index}.codes.npy'), column.codes)
+            np.save(os.path.join(staging, f'{index}.dictionary.npy'), np.array(column.categories, dtype=str))
+            columns.append({'name': name, 'kind': 'string'})
+
+    meta = {'version': CACHE_VERSION, 'source': file_fingerprint(path), 'rows': len(frame), 'columns': columns}
+    with open(os.path.join(staging, 'meta.json'), 'w') as file:
+        json.dump(meta, file)
+
+
+@profiled
+def read_dataset_cache(path: str, columns: list = None) -> pd.DataFrame:
+    """Reads a dataset back from its binary columnar cache. The DataFrame is backed by the 
+       memory-mapped column arrays, nothing is copied until a column is written to
+
+    Parameters
+    ----------
+    path: str
+        Path of the source file
+    columns: list
+        The columns to read, all of them if None
+
+    Returns
+    -------
+    pd.DataFrame
+        The cached dataset, or None if there is no cache or it no longer matches the source file
+    """
+    target = cache_path(path)
+    try:
+        with open(os.path.join(target, 'meta.json'), 'r') as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    # Size and mtime are checked first, the content hash only when the file was touched
+    source = meta.get('source', {})
+    current = file_fingerprint(path, with_hash=False)
+    if meta.get('version') != CACHE_VERSION or source.get('path') != current['path'] or source.get('size') != current['size']:
+        return None
+    if source.get('mtime_ns') != current['mtime_ns']:
+        if source.get('sha256') != file_fingerprint(path)['sha256']:
+            return None
+        meta['source']['mtime_ns'] = current['mtime_ns']
+        try:
+            with open(os.path.join(target, 'meta.json'), 'w') as file:
+                json.dump(meta, file)
+        except OSError:
+            pass
+
+    data = {}
+    try:
+        for index, column in enumerate(meta['columns']):
+            if columns is not None and column['name'] not in columns:
+                continue
+            if column['kind'] == 'numeric':
+                data[column['name']] = np.load(os.path.join(target, f'{index}.data.npy'), mmap_mode='r')
+            else:
+                # The strings are never expanded to one per row, and the codes were written in the
+                # dtype from_codes keeps, so they are not copied either
+                codes = np.load(os.path.join(target, f'{index}.codes.npy'), mmap_mode='r')
+                dictionary = np.load(os.path.join(target, f'{index}.dictionary.npy'))
+                dtype = pd.CategoricalDtype(dictionary.tolist())
+                data[column['name']] = pd.Categorical.from_codes(codes, dtype=dtype, validate=False)
+    except (OSError, ValueError):
+        # The cache was replaced by a concurrent run while it was read
+        return None
+    return pd.DataFrame(data, index=pd.RangeIndex(meta['rows']), copy=False)
+
+
+def parse_id(value) -> int:
+    """Converts an id from the yaml files to an integer
+
+    Parameters
+    ----------
+    value: str
+        The id as found in the yaml file, e.g. '2009' or '\\N'
+
+    Returns
+    -------
+    int
+        The numeric id, or MISSING_ID if the value is not a number
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return MISSING_ID
+
+
+def ids_to_int(frame: pd.DataFrame) -> pd.DataFrame:
+    """Converts every id column ('*_id') of a DataFrame to int32 in place
+
+    Parameters
+    ----------
+    frame: pd.DataFrame
+        DataFrame loaded from one of the yaml files
+
+    Returns
+    -------
+    pd.DataFrame
+        The same DataFrame
+    """
+    for name in frame.columns:
+        if name.endswith('_id') and not pd.api.types.is_integer_dtype(frame[name]):
+            frame[name] = np.fromiter((parse_id(value) for value in frame[name]), dtype=np.int32, count=len(frame))
+    return frame
+
+
+def encode_strings(frame: pd.DataFrame) -> pd.DataFrame:
+    """Converts every string column of a DataFrame, such as the names, cities, countries and ICAO 
+       codes, to a categorical in place. Rows then only hold small integer codes into one sorted 
+       dictionary of distinct strings, and sorting by the column sorts by name
+
+    Parameters
+    ----------
+    frame: pd.DataFrame
+        DataFrame loaded from one of the yaml files
+
+    Returns
+    -------
+    pd.DataFrame
+        The same DataFrame
+    """
+    for name in frame.columns:
+        column = frame[name]
+        if not pd.api.types.is_numeric_dtype(column) and not isinstance(column.dtype, pd.CategoricalDtype):
+            frame[name] = pd.Categorical(column)
+    return frame
+
+
+def yaml_loader():
+    """Returns the libyaml based safe loader when PyYAML was built with it, otherwise the pure Python one"""
+    return getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+def count_routes(path: str, block_size: int = 1 << 20) -> int:
+    """Counts the entries of the routes sequence without parsing the file, by counting the lines 
+       that start a new sequence item
+
+    Parameters
+    ----------
+    path: str
+        Path of routes.yaml
+    block_size: int
+        Number of bytes read at a time
+    """
+    item = b'\n- '
+    count = 0
+    previous = b'\n'
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            count += (previous + block).count(item)
+            # Too short to hold a whole item, so an item split between blocks is counted once
+            previous = (previous + block)[-(len(item) - 1):]
+    return count
+
+
+class RouteLayoutError(ValueError):
+    """Raised by stream_routes for a routes.yaml it cannot stream without losing routes"""
+
+
+def stream_routes(path: str, chunk_size: int = ROUTE_CHUNK_SIZE, start: int = 0, end: int = None):
+    """Walks the routes sequence of routes.yaml with the low level yaml event API, without ever 
+       building the list of dictionaries. Aliases (*name) would need the anchored nodes to be kept, 
+       so they raise RouteLayoutError, see read_routes
+
+    Parameters
+    ----------
+    path: str
+        Path of routes.yaml
+    chunk_size: int
+        Number of routes per chunk
+    start: int
+        Byte offset to start at, either 0 or the start of a route found by split_routes
+    end: int
+        Byte offset to stop at, the end of the file if None
+
+    Yields
+    ------
+    np.ndarray
+        A (3, n) int32 array per chunk holding route_airline_id, route_from_aiport_id and 
+        route_to_airport_id. The buffer is reused, so it must be consumed before the next chunk
+    """
+    positions = {name: index for index, name in enumerate(ROUTE_COLUMNS)}
+    buffer = np.full((len(ROUTE_COLUMNS), chunk_size), MISSING_ID, dtype=np.int32)
+    filled = 0
+    depth = 0
+    in_routes = False
+    key = None
+
+    with open(path, 'r') if start == 0 and end is None else route_range(path, start, end) as file:
+        for event in yaml.parse(file, Loader=yaml_loader()):
+            if isinstance(event, (yaml.MappingStartEvent, yaml.SequenceStartEvent)):
+                depth += 1
+                if depth == 2 and isinstance(event, yaml.SequenceStartEvent) and key == 'routes':
+                    in_routes = True
+                key = None
+            elif isinstance(event, (yaml.MappingEndEvent, yaml.SequenceEndEvent)):
+                depth -= 1
+                if in_routes and depth == 2:
+                    # End of one route
+                    filled += 1
+                    if filled == chunk_size:
+                        yield buffer
+                        buffer.fill(MISSING_ID)
+                        filled = 0
+                elif in_routes and depth == 1:
+                    in_routes = False
+            elif isinstance(event, yaml.AliasEvent):
+                raise RouteLayoutError(f'{path} uses the alias *{event.anchor}, which cannot be streamed')
+            elif isinstance(event, yaml.ScalarEvent):
+                if key is None:
+                    key = event.value
+                    continue
+                if in_routes and depth == 3 and key in positions:
+                    buffer[positions[key], filled] = parse_id(event.value)
+                key = None
+    if filled:
+        yield buffer[:, :filled]
+
+
+def route_range(path: str, start: int, end: int = None) -> io.StringIO:
+    """Reads the bytes [start, end) of routes.yaml as a document of its own. Ranges after the 
+       first one get the 'routes:' key back, so they parse like a file with fewer routes
+
+    Parameters
+    ----------
+    path: str
+        Path of routes.yaml
+    start: int
+        Byte offset of the first route, see split_routes
+    end: int
+        Byte offset after the last route, the end of the file if None
+    """
+    with open(path, 'rb') as file:
+        file.seek(start)
+        text = (file.read() if end is None else file.read(end - start)).decode()
+    return io.StringIO(text if start == 0 else 'routes:\n' + text)
+
+
+def splittable_routes(path: str) -> bool:
+    """Checks that every route of routes.yaml starts on a '- route_airline_id:' line, the layout 
+       split_routes relies on. Files written otherwise, e.g. with another key order or an indented 
+       sequence, are parsed in one part
+
+    Parameters
+    ----------
+    path: str
+        Path of routes.yaml
+    """
+    items = 0
+    boundaries = 0
+    previous = b'\n'
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            # Lines that straddle two blocks are counted once, in the block where they end
+            window = previous + block
+            cut = window.rfind(b'\n')
+            items += window[:cut].count(b'\n- ')
+            boundaries += window[:cut].count(ROUTE_BOUNDARY)
+            previous = window[cut:]
+    items += previous.count(b'\n- ')
+    boundaries += previous.count(ROUTE_BOUNDARY)
+    return items == boundaries
+
+
+def split_routes(path: str, parts: int) -> list:
+    """Splits routes.yaml into byte ranges of about the same size that can be parsed on their own. 
+       Every range but the first starts on a '- route_airline_id:' line, the key the file starts 
+       each route with, so no route is cut in two
+
+    Parameters
+    ----------
+    path: str
+        Path of routes.yaml
+    parts: int
+        Number of ranges wanted, fewer are returned when the file has no boundary near a split
+
+    Returns
+    -------
+    list
+        (start, end) byte offsets, end is None for the last range
+    """
+    if parts > 1 and not splittable_routes(path):
+        return [(0, None)]
+    size = os.path.getsize(path)
+    boundaries = [0]
+    with open(path, 'rb') as file:
+        for part in range(1, parts):
+            offset = max(size * part // parts, boundaries[-1])
+            file.seek(offset)
+            # Search forward in blocks for the next route, the marker may span two blocks
+            window = b''
+            found = -1
+            for block in iter(lambda: file.read(1 << 16), b''):
+                window += block
+                found = window.find(ROUTE_BOUNDARY)
+                if found >= 0:
+                    break
+                tail = window[-len(ROUTE_BOUNDARY):]
+                offset += len(window) - len(tail)
+                window = tail
+            if found < 0:
+                break
+            boundary = offset + found + 1
+            if boundary > boundaries[-1]:
+                boundaries.append(boundary)
+    return list(zip(boundaries, boundaries[1:] + [None]))
+
+
+def parse_route_range(path: str, start: int, end: int = None) -> np.ndarray:
+    """Parses one range of split_routes into a (3, n) int32 array of route_airline_id, 
+       route_from_aiport_id and route_to_airport_id. Runs in the worker processes of load_datasets
+
+    Parameters
+    ----------
+    path: str
+        Path of routes.yaml
+    start: int
+        Byte offset of the first route
+    end: int
+        Byte offset after the last route, the end of the file if None
+    """
+    chunks = [chunk.copy() for chunk in stream_routes(path, ROUTE_CHUNK_SIZE, start, end)]
+    if not chunks:
+        return np.empty((len(ROUTE_COLUMNS), 0), dtype=np.int32)
+    return np.concatenate(chunks, axis=1)
+
+
+def routes_to_frame(columns: np.ndarray) -> pd.DataFrame:
+    """Wraps the (3, n) int32 array of parse_route_range in the DataFrame of read_routes"""
+    return pd.DataFrame({name: columns[index] for index, name in enumerate(ROUTE_COLUMNS)}, copy=False)
+
+
+@profiled
+def read_routes(path: str, chunk_size: int = ROUTE_CHUNK_SIZE) -> pd.DataFrame:
+    """Reads routes.yaml chunk by chunk into preallocated int32 columns, so peak memory is the 
+       final columns plus one chunk. A file with aliases is loaded as a whole instead
+
+    Parameters
+    ----------
+    path: str
+        Path of routes.yaml
+    chunk_size: int
+        Number of routes parsed before they are copied into the columns
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame with the int32 columns route_airline_id, route_from_aiport_id and route_to_airport_id
+    """
+    try:
+        return stream_route_columns(path, chunk_size)
+    except RouteLayoutError:
+        return load_route_records(path)
+
+
+def stream_route_columns(path: str, chunk_size: int = ROUTE_CHUNK_SIZE) -> pd.DataFrame:
+    """Streams routes.yaml into preallocated int32 columns, see read_routes"""
+    columns = np.empty((len(ROUTE_COLUMNS), count_routes(path)), dtype=np.int32)
+    size = 0
+    for chunk in stream_routes(path, chunk_size):
+        end = size + chunk.shape[1]
+        if end > columns.shape[1]:
+            # Only reached if the file does not use one '- ' line per route
+            grown = np.empty((len(ROUTE_COLUMNS), max(2 * columns.shape[1], end)), dtype=np.int32)
+            grown[:, :size] = columns[:, :size]
+            columns = grown
+        columns[:, size:end] = chunk
+        size = end
+    return routes_to_frame(columns[:, :size])
+
+
+def load_route_records(path: str) -> pd.DataFrame:
+    """Loads routes.yaml as a whole with the yaml loader, which resolves anchors and aliases, and 
+       converts the ids like stream_routes
+
+    Parameters
+    ----------
+    path: str
+        Path of routes.yaml
+    """
+    with open(path, 'r') as file:
+        records = yaml.load(file, Loader=yaml_loader())['routes'] or []
+    return pd.DataFrame({
+        name: np.fromiter((parse_id(record.get(name)) for record in records), dtype=np.int32, count=len(records)) 
+        for name in ROUTE_COLUMNS
+    })
+
+
+@profiled
+def read_yaml(path: str, key: str) -> pd.DataFrame:
+    """Parses one of the yaml files into a DataFrame with int32 id columns, float altitudes and 
+       categorical string columns
+
+    Parameters
+    ----------
+    path: str
+        Path of the yaml file
+    key: str
+        Top level key of the yaml file holding the list of records, e.g. 'airlines'
+    """
+    with open(path, 'r') as file:
+        return records_to_frame(yaml.load(file, Loader=yaml_loader())[key])
+
+
+def records_to_frame(records: list) -> pd.DataFrame:
+    """Builds the DataFrame of read_yaml from the parsed list of dictionaries
+
+    Parameters
+    ----------
+    records: list
+        The records under the top level key of airlines.yaml or airports.yaml
+    """
+    frame = encode_strings(ids_to_int(pd.DataFrame(records)))
+    if 'airport_altitude' in frame.columns:
+        # Altitudes are stored as strings such as '5388.0'
+        frame['airport_altitude'] = pd.to_numeric(frame['airport_altitude'], errors='coerce')
+    return frame
+
+
+def ids_to_int32(values: pd.Series) -> np.ndarray:
+    """Converts a column of string ids to int32 without a Python call per value, like parse_id"""
+    numbers = pd.to_numeric(values, errors='coerce')
+    return np.where(numbers.isna(), MISSING_ID, numbers.fillna(0)).astype(np.int32)
+
+
+@profiled
+def read_csv(path: str, key: str) -> pd.DataFrame:
+    """Reads one of the datasets from a csv file whose header holds the keys of the yaml records, 
+       chunk by chunk. Routes are turned into int32 columns chunk by chunk, so peak memory stays 
+       close to the final columns
+
+    Parameters
+    ----------
+    path: str
+        Path of the csv file
+    key: str
+        Which dataset the file holds, e.g. 'airlines'
+
+    Returns
+    -------
+    pd.DataFrame
+        The same DataFrame as read from the yaml file
+    """
+    # Keep values such as 'nan' and '\N' as they are, only empty fields are missing
+    chunks = pd.read_csv(
+        path, dtype=str, keep_default_na=False, na_values=[''], chunksize=CSV_CHUNK_SIZE
+    )
+    if key != 'routes':
+        return records_to_frame(pd.concat(list(chunks), ignore_index=True))
+
+    parts = [{name: ids_to_int32(chunk[name]) for name in ROUTE_COLUMNS} for chunk in chunks]
+    return pd.DataFrame({
+        name: np.concatenate([part[name] for part in parts]) if parts else np.empty(0, dtype=np.int32) 
+        for name in ROUTE_COLUMNS
+    })
+
+
+def read_columnar(path: str, columns: list = None) -> pd.DataFrame:
+    """Reads a dataset from a columnar .npz file written by write_columnar. The members of the file 
+       are read one by one, so only the requested columns are ever loaded
+
+    Parameters
+    ----------
+    path: str
+        Path of the .npz file
+    columns: list
+        The columns to read, all of them if None
+
+    Returns
+    -------
+    pd.DataFrame
+        The same DataFrame as read from the yaml file, with only the requested columns
+    """
+    data = {}
+    with np.load(path, allow_pickle=False) as archive:
+        names = archive['columns'].tolist()
+        for name in names:
+            if columns is not None and name not in columns:
+                continue
+            if f'{name}.codes' in archive.files:
+                # The categories are stored as one block of utf-8 bytes and their end offsets
+                text = archive[f'{name}.text'].tobytes()
+                ends = archive[f'{name}.ends'].tolist()
+                categories = [text[start:end].decode() for start, end in zip([0] + ends[:-1], ends)]
+                data[name] = pd.Categorical.from_codes(archive[f'{name}.codes'], categories)
+            else:
+                data[name] = archive[f'{name}.values']
+        rows = int(archive['rows'])
+    return pd.DataFrame(data, index=pd.RangeIndex(rows))
+
+
+def write_columnar(path: str, frame: pd.DataFrame) -> None:
+    """Writes a dataset to a columnar .npz file: numeric columns as typed arrays, string columns 
+       as codes plus the sorted categories in utf-8
+
+    Parameters
+    ----------
+    path: str
+        Path of the .npz file
+    frame: pd.DataFrame
+        The dataset, as loaded by load_dataset
+    """
+    members = {'columns': np.array(list(frame.columns)), 'rows': np.array(len(frame))}
+    for name in frame.columns:
+        column = frame[name]
+        if pd.api.types.is_numeric_dtype(column):
+            members[f'{name}.values'] = column.to_numpy()
+        else:
+            column = pd.Categorical(column)
+            encoded = [category.encode() for category in column.categories]
+            members[f'{name}.codes'] = column.codes
+            members[f'{name}.text'] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+            members[f'{name}.ends'] = np.cumsum([len(category) for category in encoded], dtype=np.int64)
+    with open(path, 'wb') as file:
+        np.savez(file, **members)
+
+
+def frame_to_records(frame: pd.DataFrame) -> pd.DataFrame:
+    """Turns a dataset back into the strings of the yaml files: ids as numbers or '\\N', altitudes 
+       such as '5388.0' and missing values as None"""
+    records = pd.DataFrame(index=frame.index)
+    for name in frame.columns:
+        column = frame[name]
+        if name.endswith('_id'):
+            records[name] = np.where(column.to_numpy() == MISSING_ID, '\\N', column.astype(str))
+        else:
+            records[name] = column.astype(object).where(column.notna(), None)
+            if pd.api.types.is_numeric_dtype(column):
+                records[name] = records[name].map(lambda value: None if value is None else str(value))
+    return records
+
+
+@profiled
+def write_dataset(path: str, key: str, frame: pd.DataFrame) -> None:
+    """Writes a dataset in the format given by the extension of path, .yaml, .csv or .npz, such that 
+       load_dataset reads the same DataFrame back
+
+    Parameters
+    ----------
+    path: str
+        Path of the file
+    key: str
+        Which dataset frame is, e.g. 'airlines'
+    frame: pd.DataFrame
+        The dataset, as loaded by load_dataset
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == COLUMNAR_EXTENSION:
+        write_columnar(path, frame)
+    elif extension == '.csv':
+        frame_to_records(frame).to_csv(path, index=False)
+    else:
+        dumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+        with open(path, 'w') as file:
+            yaml.dump({key: frame_to_records(frame).to_dict('records')}, file, Dumper=dumper, sort_keys=False, allow_unicode=True)
+
+
+def convert_datasets(options: dict) -> None:
+    """Converts the three datasets to the format of --CONVERT, e.g. "npz", writing airlines.npz, 
+       airports.npz and routes.npz to --OUTPUT
+
+    Parameters
+    ----------
+    options: dict
+        The command line options, see parse_args
+    """
+    output = options.get('OUTPUT', '.')
+    extension = '.' + options['CONVERT'].lstrip('.').lower()
+    if extension not in ('.yaml', '.csv', COLUMNAR_EXTENSION):
+        raise ValueError(f'cannot convert to {options["CONVERT"]}, use yaml, csv or npz')
+    for key in ('airlines', 'airports', 'routes'):
+        frame = load_dataset(options[key.upper()], key)
+        write_dataset(os.path.join(output, key + extension), key, frame)
+
+
+def cached_dataset(path: str, columns: list = None) -> pd.DataFrame:
+    """Returns the dataset without parsing yaml or csv: directly for columnar .npz files, from the 
+       binary columnar cache when it is up to date, None otherwise
+
+    Parameters
+    ----------
+    path: str
+        Path of the .yaml, .csv or .npz file
+    columns: list
+        The columns to keep, all of them if None
+    """
+    if os.path.splitext(path)[1].lower() == COLUMNAR_EXTENSION:
+        return read_columnar(path, columns)
+    return read_dataset_cache(path, columns)
+
+
+def parse_dataset(path: str, key: str) -> pd.DataFrame:
+    """Parses a yaml or csv dataset with the reader of its extension. Yaml routes are streamed, 
+       the smaller yaml files are parsed in one go
+
+    Parameters
+    ----------
+    path: str
+        Path of the .yaml or .csv file
+    key: str
+        Top level key of the yaml file holding the list of records, e.g. 'airlines'
+    """
+    if os.path.splitext(path)[1].lower() == '.csv':
+        return read_csv(path, key)
+    return read_routes(path) if key == 'routes' else read_yaml(path, key)
+
+
+def store_dataset(path: str, frame: pd.DataFrame, columns: list = None) -> pd.DataFrame:
+    """Refreshes the binary columnar cache of a parsed dataset and keeps the columns asked for
+
+    Parameters
+    ----------
+    path: str
+        Path of the .yaml or .csv file
+    frame: pd.DataFrame
+        The parsed dataset, with all of its columns
+    columns: list
+        The columns to keep, all of them if None
+    """
+    try:
+        write_dataset_cache(path, frame)
+    except OSError:
+        # A read-only data directory only costs us the cache
+        pass
+    return frame if columns is None else frame[[name for name in frame.columns if name in columns]]
+
+
+@profiled
+def load_dataset(path: str, key: str, columns: list = None) -> pd.DataFrame:
+    """Loads one of the datasets with the reader of its extension. Columnar .npz files are read 
+       directly. Yaml and csv files go through the binary columnar cache when it is up to date, and 
+       refresh it otherwise
+
+    Parameters
+    ----------
+    path: str
+        Path of the .yaml, .csv or .npz file
+    key: str
+        Top level key of the yaml file holding the list of records, e.g. 'airlines'
+    columns: list
+        The columns to keep, all of them if None
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame containing the list of dictionaries from the yaml file, with int32 id columns 
+        and categorical string columns
+    """
+    frame = cached_dataset(path, columns)
+    if frame is not None:
+        return frame
+    return store_dataset(path, parse_dataset(path, key), columns)
+
+
+@profiled
+def parse_datasets(paths: dict, workers: int) -> dict:
+    """Parses several datasets at once in a pool of processes. A yaml routes file is also split 
+       with split_routes into one range per worker, and the int32 columns of the ranges are put 
+       back together in file order, so the result is the same as parse_dataset
+
+    Parameters
+    ----------
+    paths: dict
+        Path of every dataset to parse, by top level key
+    workers: int
+        Number of processes
+
+    Returns
+    -------
+    dict
+        The parsed DataFrames, by top level key
+    """
+    routes_path = paths.get('routes')
+    if routes_path is not None and os.path.splitext(routes_path)[1].lower() == '.csv':
+        routes_path = None
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        # The routes ranges are the largest tasks, so they are queued first
+        ranges = []
+        if routes_path is not None:
+            ranges = [pool.submit(parse_route_range, routes_path, start, end) for start, end in split_routes(routes_path, workers)]
+        futures = {
+            key: pool.submit(parse_dataset, path, key) 
+            for key, path in paths.items() if not (key == 'routes' and ranges)
+        }
+        frames = {key: future.result() for key, future in futures.items()}
+        if ranges:
+            try:
+                frames['routes'] = routes_to_frame(np.concatenate([future.result() for future in ranges], axis=1))
+            except RouteLayoutError:
+                frames['routes'] = read_routes(routes_path)
+    return frames
+
+
+@profiled
+def load_datasets(airlines_path: str, airports_path: str, routes_path: str, columns: tuple = (None, None, None), workers: int = None):
+    """Loads the airlines, airports and routes datasets. The ones that have to be parsed are parsed 
+       concurrently by parse_datasets when there is more than one CPU
+
+    Parameters
+    ----------
+    airlines_path: str
+        Path of airlines.yaml
+    airports_path: str
+        Path of airports.yaml
+    routes_path: str
+        Path of routes.yaml
+    columns: tuple
+        The columns to keep of every dataset, see question_columns
+    workers: int
+        Maximum number of parsing processes, defaults to the number of CPUs
+
+    Returns
+    -------
+    tuple
+        The airlines, airports and routes DataFrames
+    """
+    paths = {'airlines': airlines_path, 'airports': airports_path, 'routes': routes_path}
+    columns = dict(zip(paths, columns))
+    frames = {key: cached_dataset(path, columns[key]) for key, path in paths.items()}
+    pending = {key: paths[key] for key, frame in frames.items() if frame is None}
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and pending:
+        parsed = parse_datasets(pending, workers)
+    else:
+        parsed = {key: parse_dataset(path, key) for key, path in pending.items()}
+    for key, frame in parsed.items():
+        frames[key] = store_dataset(paths[key], frame, columns[key])
+    return frames['airlines'], frames['airports'], frames['routes']
+
+
+AGGREGATE_VERSION = 2
+# Key columns of the counters kept by the aggregate store, q1 is kept for every destination country
+AGGREGATE_KEYS = {
+    'q1': ['airport_country', 'airline_name'],
+    'q2': ['airport_country'],
+    'q3': ['airport_name'],
+    'q4': ['airport_city', 'airport_country']
+}
+
+
+def route_counters(airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, joins: dict = None) -> dict:
+    """Counts routes per key of AGGREGATE_KEYS. Keys are tuples of names rather than row positions, 
+       so counters stay valid when the yaml files are loaded again. The indexes and key codes of 
+       the airlines and airports come from joins, so with warm joins the work grows with the 
+       routes only
+
+    Parameters
+    ----------
+    airlines: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airlines.yaml
+    airports: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airports.yaml
+    routes: pd.DataFrame
+        The routes to count, e.g. all of routes.yaml or the routes of a delta file
+    joins: dict
+        Joins and indexes computed so far, keyed by name. The indexes and codes computed here are 
+        added to it, the joins of these routes are not
+
+    Returns
+    -------
+    dict
+        For every question, a dictionary from key tuples to numbers of routes
+    """
+    joins = {} if joins is None else joins
+    route_joins = {key: value for key, value in joins.items() if key not in ROUTE_JOINS}
+    destination_rows = join_routes(airlines, airports, routes, route_joins, 'destination')
+    airline_rows = join_routes(airlines, airports, routes, route_joins, 'airline')
+    matched = (destination_rows >= 0) & (airline_rows >= 0)
+    rows = {
+        'airport': destination_rows[destination_rows >= 0], 
+        'q1_airport': destination_rows[matched], 
+        'q1_airline': airline_rows[matched]
+    }
+
+    # Count the group codes of the key columns, only the distinct keys are decoded to strings
+    counters = {}
+    for question, columns in AGGREGATE_KEYS.items():
+        if question == 'q1':
+            groups = [
+                (airports, ['airport_country'], rows['q1_airport']), 
+                (airlines, ['airline_name'], rows['q1_airline'])
+            ]
+        else:
+            groups = [(airports, columns, rows['airport'])]
+        codes = []
+        decoders = []
+        for frame, group_columns, group_rows in groups:
+            group, first_rows = group_codes(frame, route_joins, group_columns)
+            codes.append(group[group_rows])
+            decoders.append((frame[group_columns], first_rows))
+        sizes = [len(first_rows) for _, first_rows in decoders]
+        known = np.logical_and.reduce([code >= 0 for code in codes])
+        keys, counts = np.unique(
+            np.ravel_multi_index([code[known] for code in codes], sizes), 
+            return_counts=True
+        )
+        decoded = [
+            values.iloc[first_rows[code]].itertuples(index=False, name=None) 
+            for (values, first_rows), code in zip(decoders, np.unravel_index(keys, sizes))
+        ]
+        counters[question] = {sum(key, ()): int(count) for key, count in zip(zip(*decoded), counts)}
+    publish_joins(joins, route_joins, ROUTE_JOINS)
+    return counters
+
+
+def add_counters(counters: dict, delta: dict, sign: int) -> None:
+    """Adds (sign 1) or subtracts (sign -1) the counters of a delta in place, dropping keys that reach zero
+
+    Parameters
+    ----------
+    counters: dict
+        Counters from route_counters, updated in place
+    delta: dict
+        Counters of the added or removed routes
+    sign: int
+        1 or -1
+    """
+    for question, changes in delta.items():
+        counts = counters.setdefault(question, {})
+        for key, count in changes.items():
+            total = counts.get(key, 0) + sign * count
+            if total:
+                counts[key] = total
+            else:
+                counts.pop(key, None)
+
+
+def build_aggregates(airlines_path: str, airports_path: str, airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, joins: dict = None) -> dict:
+    """Creates an aggregate store from all routes
+
+    Parameters
+    ----------
+    airlines_path: str
+        Path of airlines.yaml, whose content hash is recorded in the store
+    airports_path: str
+        Path of airports.yaml, whose content hash is recorded in the store
+    airlines: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airlines.yaml
+    airports: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airports.yaml
+    routes: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from routes.yaml
+    joins: dict
+        Joins and indexes shared with the questions, see route_counters
+
+    Returns
+    -------
+    dict
+        The store, with the 'sources' it was built from, its 'counters' and the content hashes of 
+        the 'deltas' applied to it
+    """
+    return {
+        'sources': [file_fingerprint(airlines_path)['sha256'], file_fingerprint(airports_path)['sha256']],
+        'counters': route_counters(airlines, airports, routes, joins),
+        'deltas': []
+    }
+
+
+def load_aggregates(path: str, airlines_path: str, airports_path: str) -> dict:
+    """Reads an aggregate store written by save_aggregates
+
+    Parameters
+    ----------
+    path: str
+        Path of the store
+    airlines_path: str
+        Path of airlines.yaml, which must be the one the store was built with
+    airports_path: str
+        Path of airports.yaml, which must be the one the store was built with
+
+    Returns
+    -------
+    dict
+        The store, see build_aggregates
+    """
+    with open(path, 'r') as file:
+        saved = json.load(file)
+    sources = [file_fingerprint(airlines_path)['sha256'], file_fingerprint(airports_path)['sha256']]
+    if saved.get('version') != AGGREGATE_VERSION or saved.get('sources') != sources:
+        raise ValueError(f'{path} was built from other airlines or airports files, remove it to rebuild it')
+    counters = {
+        question: {tuple(entry[:-1]): entry[-1] for entry in entries} 
+        for question, entries in saved['counters'].items()
+    }
+    return {'sources': sources, 'counters': counters, 'deltas': saved['deltas']}
+
+
+def save_aggregates(path: str, store: dict) -> None:
+    """Writes an aggregate store as json, replacing the previous file only once it is complete
+
+    Parameters
+    ----------
+    path: str
+        Path of the store
+    store: dict
+        The store, see build_aggregates
+    """
+    saved = {
+        'version': AGGREGATE_VERSION,
+        'sources': store['sources'],
+        'counters': {
+            question: [list(key) + [count] for key, count in counts.items()] 
+            for question, counts in store['counters'].items()
+        },
+        'deltas': store['deltas']
+    }
+    with open(path + '.tmp', 'w') as file:
+        json.dump(saved, file)
+    os.replace(path + '.tmp', path)
+
+
+def read_route_delta(path: str) -> tuple:
+    """Reads a delta file, a yaml file with 'added' and 'removed' lists of routes written like 
+       the ones of routes.yaml
+
+    Parameters
+    ----------
+    path: str
+        Path of the delta file
+
+    Returns
+    -------
+    tuple
+        DataFrames of the added and the removed routes
+    """
+    with open(path, 'r') as file:
+        delta = yaml.load(file, Loader=yaml_loader()) or {}
+    return tuple(
+        ids_to_int(pd.DataFrame(delta.get(name) or [], columns=ROUTE_COLUMNS)).astype(np.int32) 
+        for name in ('added', 'removed')
+    )
+
+
+def apply_route_delta(store: dict, airlines: pd.DataFrame, airports: pd.DataFrame, delta_path: str, joins: dict = None) -> None:
+    """Updates the counters of a store with a delta file. With the joins of the airlines and 
+       airports already computed, the time is proportional to the delta
+
+    Parameters
+    ----------
+    store: dict
+        The store, see build_aggregates
+    airlines: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airlines.yaml
+    airports: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airports.yaml
+    delta_path: str
+        Path of the delta file, see read_route_delta
+    joins: dict
+        Joins and indexes shared with the questions, see route_counters
+
+    Raises
+    ------
+    ValueError
+        If the delta file was already applied to the store, or removes routes the store never 
+        counted. The store is left unchanged
+    """
+    fingerprint = file_fingerprint(delta_path)['sha256']
+    if fingerprint in store['deltas']:
+        raise ValueError(f'{delta_path} was already applied')
+    added, removed = read_route_delta(delta_path)
+    changes = route_counters(airlines, airports, added, joins)
+    add_counters(changes, route_counters(airlines, airports, removed, joins), -1)
+
+    negative = [
+        (question, key) for question, counts in changes.items() for key, count in counts.items() 
+        if count < 0 and store['counters'].get(question, {}).get(key, 0) + count < 0
+    ]
+    if negative:
+        question, key = negative[0]
+        raise ValueError(
+            f'{delta_path} removes routes that were never counted, e.g. {question} {", ".join(key)} '
+            f'({len(negative)} counters would go below zero)'
+        )
+    add_counters(store['counters'], changes, 1)
+    store['deltas'].append(fingerprint)
+
+
+def verify_aggregates(store: dict, airlines: pd.DataFrame, airports: pd.DataFrame, routes: pd.DataFrame, joins: dict = None) -> list:
+    """Compares the counters of a store with a full recount of the routes
+
+    Parameters
+    ----------
+    store: dict
+        The store, see build_aggregates
+    airlines: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airlines.yaml
+    airports: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airports.yaml
+    routes: pd.DataFrame
+        All current routes
+    joins: dict
+        Joins and indexes shared with the questions, see route_counters
+
+    Returns
+    -------
+    list
+        The questions whose counters differ, empty when the store is consistent
+    """
+    expected = route_counters(airlines, airports, routes, joins)
+    return [question for question in AGGREGATE_KEYS if store['counters'].get(question, {}) != expected[question]]
+
+
+def aggregate_joins(store: dict, airlines: pd.DataFrame, airports: pd.DataFrame, joins: dict, country: str = 'Canada') -> None:
+    """Puts the counts of q1 to q4 from a store into joins, where question_counts picks them up 
+       instead of counting routes
+
+    Parameters
+    ----------
+    store: dict
+        The store, see build_aggregates
+    airlines: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airlines.yaml
+    airports: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airports.yaml
+    joins: dict
+        Joins and indexes shared by the questions, updated in place
+    country: str
+        The destination country of q1, or "all" for the counts of every country
+    """
+    if country == 'all':
+        _, country_rows = group_codes(airports, joins, ['airport_country'])
+        _, name_rows = group_codes(airlines, joins, ['airline_name'])
+        countries = airports['airport_country'].iloc[country_rows].to_numpy()
+        names = airlines['airline_name'].iloc[name_rows].to_numpy()
+        counts = store['counters'].get('q1', {})
+        joins[('counts', 'q1', 'all')] = np.array(
+            [[counts.get((country_name, name), 0) for name in names] for country_name in countries], 
+            dtype=np.int64
+        ).reshape(len(countries), len(names))
+
+    for question, columns in QUESTION_GROUPS.items():
+        if question == 'q1' and country == 'all':
+            continue
+        frame = airlines if question == 'q1' else airports
+        codes, first_rows = group_codes(frame, joins, columns)
+        keys = frame[columns].iloc[first_rows].to_numpy()
+        counts = store['counters'].get(question, {})
+        if question == 'q1':
+            values = [counts.get((country, key[0]), 0) for key in keys]
+        else:
+            values = [counts.get(tuple(key), 0) for key in keys]
+        key = ('counts', question, country) if question == 'q1' else ('counts', question)
+        joins[key] = np.array(values, dtype=np.int64)
+
+
+@profiled
+def solve_from_aggregates(options: dict) -> None:
+    """Answers q1 to q4 from an aggregate store, creating it from --ROUTES if it does not exist 
+       yet and updating it with --DELTA. --VERIFY compares it with a full recount of --ROUTES
+
+    Parameters
+    ----------
+    options: dict
+        The command line options, see parse_args
+    """
+    airlines = load_dataset(options['AIRLINES'], 'airlines')
+    airports = load_dataset(options['AIRPORTS'], 'airports')
+    path = options['AGGREGATES']
+    routes = None
+    joins = {}
+
+    if os.path.exists(path):
+        store = load_aggregates(path, options['AIRLINES'], options['AIRPORTS'])
+    else:
+        routes = load_dataset(options['ROUTES'], 'routes')
+        store = build_aggregates(options['AIRLINES'], options['AIRPORTS'], airlines, airports, routes, joins)
+        save_aggregates(path, store)
+    if options.get('DELTA'):
+        apply_route_delta(store, airlines, airports, options['DELTA'], joins)
+        save_aggregates(path, store)
+
+    if 'VERIFY' in options:
+        routes = load_dataset(options['ROUTES'], 'routes') if routes is None else routes
+        mismatches = verify_aggregates(store, airlines, airports, routes, joins)
+        if mismatches:
+            print(f'{path} differs from {options["ROUTES"]} for {", ".join(mismatches)}', file=sys.stderr)
+            sys.exit(1)
+
+    question = options.get('QUESTION')
+    if question:
+        aggregate_joins(store, airlines, airports, joins, options.get('COUNTRY', 'Canada'))
+        # Only q5 and filtered questions need the routes themselves, the store covers all airports
+        airport_filter = filter_options(options)
+        if routes is None and ('q5' in question.split(',') or question == 'all' or airport_filter):
+            routes = load_dataset(options['ROUTES'], 'routes')
+        if routes is None:
+            routes = pd.DataFrame({name: np.empty(0, dtype=np.int32) for name in ROUTE_COLUMNS})
+        solve(
+            airlines, 
+            airports, 
+            routes, 
+            question, 
+            options.get('GRAPH_TYPE', 'none'), 
+            joins, 
+            options.get('OUTPUT', '.'), 
+            int(options['WORKERS']) if options.get('WORKERS') else None, 
+            options.get('COUNTRY', 'Canada'), 
+            airport_filter=airport_filter
+        )
+
+
+# Joins holding one entry per route, computed again for every chunk by stream_counts
+ROUTE_JOINS = ('destination', 'origin', 'airline')
+OUT_OF_CORE_QUESTIONS = ['q1', 'q2', 'q3', 'q4']
+
+
+def route_chunks(path: str, chunk_size: int = ROUTE_CHUNK_SIZE):
+    """Reads the routes dataset chunk by chunk with the reader of its extension, never holding more 
+       than one chunk of routes.yaml or routes.csv. A columnar .npz file only holds the three int32 
+       columns, which are read at once and sliced
+
+    Parameters
+    ----------
+    path: str
+        Path of the .yaml, .csv or .npz routes file
+    chunk_size: int
+        Number of routes per chunk
+
+    Yields
+    ------
+    pd.DataFrame
+        The int32 route_airline_id, route_from_aiport_id and route_to_airport_id columns of a 
+        chunk. The yaml chunks share a buffer, so each must be consumed before the next one
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == COLUMNAR_EXTENSION:
+        routes = read_columnar(path, ROUTE_COLUMNS)
+        for start in range(0, len(routes), chunk_size):
+            yield routes.iloc[start:start + chunk_size]
+    elif extension == '.csv':
+        chunks = pd.read_csv(
+            path, dtype=str, keep_default_na=False, na_values=[''], usecols=ROUTE_COLUMNS, chunksize=chunk_size
+        )
+        for chunk in chunks:
+            yield pd.DataFrame({name: ids_to_int32(chunk[name]) for name in ROUTE_COLUMNS})
+    else:
+        for chunk in stream_routes(path, chunk_size):
+            yield routes_to_frame(chunk)
+
+
+@profiled
+def stream_counts(airlines: pd.DataFrame, airports: pd.DataFrame, routes_path: str, questions: list, joins: dict, country: str = 'Canada', chunk_size: int = ROUTE_CHUNK_SIZE) -> None:
+    """Counts the routes behind q1 to q4 one chunk of routes at a time and puts the totals in joins, 
+       where question_counts picks them up instead of counting routes. Every chunk is joined with 
+       the airports and airlines through the shared indexes, so memory grows with the chunk size and 
+       the number of airports and airlines, not with the number of routes
+
+    Parameters
+    ----------
+    airlines: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airlines.yaml
+    airports: pd.DataFrame
+        Pandas DataFrame containing list of dictionaries from airports.yaml
+    routes_path: str
+        Path of the routes file, see route_chunks
+    questions: list
+        Some of q1 to q4
+    joins: dict
+        Joins and indexes shared by the questions, updated in place
+    country: str
+        The destination country of q1, or "all" for the counts of every country
+    chunk_size: int
+        Number of routes per chunk
+    """
+    totals = {}
+    for routes in route_chunks(routes_path, chunk_size):
+        # The indexes are shared, the joins and counts belong to this chunk only
+        chunk_joins = copy_joins(joins)
+        for question in questions:
+            if question == 'q1' and country == 'all':
+                key = ('counts', 'q1', 'all')
+                counts = country_airline_counts(airlines, airports, routes, chunk_joins)
+            else:
+                key = ('counts', question, country) if question == 'q1' else ('counts', question)
+                counts = question_counts(airlines, airports, routes, chunk_joins, question, country)
+            totals[key] = counts + totals[key] if key in totals else counts.astype(np.int64)
+        publish_joins(joins, chunk_joins, ROUTE_JOINS + tuple(totals))
+    joins.update(totals)
+
+
+@profiled
+def solve_out_of_core(options: dict) -> None:
+    """Answers q1 to q4 without loading the routes, see stream_counts. --OUT_OF_CORE="n" sets the 
+       number of routes per chunk, and --QUESTION="all" stands for q1 to q4
+
+    Parameters
+    ----------
+    options: dict
+        The command line options, see parse_args
+    """
+    question = options['QUESTION']
+    questions = OUT_OF_CORE_QUESTIONS if question == 'all' else question.split(',')
+    unsupported = [name for name in questions if name not in OUT_OF_CORE_QUESTIONS]
+    if unsupported:
+        raise ValueError(f'--OUT_OF_CORE only answers q1 to q4, not {", ".join(unsupported)}')
+
+    airport_filter = filter_options(options)
+    columns = question_columns(','.join(questions), airport_filter)
+    airlines = load_dataset(options['AIRLINES'], 'airlines', columns[0])
+    airports = load_dataset(options['AIRPORTS'], 'airports', columns[1])
+    country = options.get('COUNTRY', 'Canada')
+    chunk_size = int(options['OUT_OF_CORE']) if options['OUT_OF_CORE'] else ROUTE_CHUNK_SIZE
+
+    joins = {}
+    stream_counts(
+        airlines, 
+        airports, 
+        options['ROUTES'], 
+        questions, 
+        filter_joins(airports, joins, airport_filter) if airport_filter else joins, 
+        country, 
+        chunk_size
+    )
+    routes = pd.DataFrame({name: np.empty(0, dtype=np.int32) for name in ROUTE_COLUMNS})
+    solve(
+        airlines, 
+        airports, 
+        routes, 
+        ','.join(questions), 
+        options.get('GRAPH_TYPE', 'none'), 
+        joins, 
+        options.get('OUTPUT', '.'), 
+        int(options['WORKERS']) if options.get('WORKERS') else None, 
+        country, 
+        airport_filter=airport_filter
+    )
+
+
+class QueryHandler(socketserver.StreamRequestHandler):
+    """Answers question requests sent to a running server, one JSON object per line"""
+
+    def handle(self) -> None:
+        """Reads requests until the client closes the connection and writes one response per request"""
+        for line in self.rfile:
+            start = time.perf_counter()
+            try:
+                request = json.loads(line)
+                self.server.answer(request)
+                response = {'status': 'ok', 'seconds': time.perf_counter() - start}
+            except Exception as error:
+                response = {'status': 'error', 'message': f'{type(error).__name__}: {error}'}
+            self.wfile.write((json.dumps(response) + '\n').encode())
+            self.wfile.flush()
+
+
+class QueryServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server that keeps the datasets and their joins in memory between requests. Every 
+       request is solved on its own copy of the joins, and the joins it computed are published 
+       under a lock, so requests answered at the same time never see a half built join"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, airlines_path: str, airports_path: str, routes_path: str):
+        """Loads the datasets, computes the joins of every question and starts listening on socket_path"""
+        self.paths = [os.path.abspath(path) for path in (airlines_path, airports_path, routes_path)]
+        self.airlines, self.airports, self.routes = load_datasets(airlines_path, airports_path, routes_path)
+        self.joins = {}
+        self.joins_lock = threading.Lock()
+        with tempfile.TemporaryDirectory() as folder:
+            # Warm up every join and group code so requests mostly find them in self.joins
+            solve(self.airlines, self.airports, self.routes, 'all', 'none', self.joins, folder)
+            solve(self.airlines, self.airports, self.routes, 'degree', 'none', self.joins, folder)
+        super().__init__(socket_path, QueryHandler)
+
+    def answer(self, request: dict) -> None:
+        """Solves one request
+
+        Parameters
+        ----------
+        request: dict
+            The 'question', 'graph_type', 'output' directory, 'country', route network 'query' and 
+            airport 'filter', and the 'airlines', 'airports' and 'routes' paths, which must be the 
+            files the server loaded
+        """
+        paths = [os.path.abspath(request[name]) for name in ('airlines', 'airports', 'routes')]
+        if paths != self.paths:
+            raise ValueError(f'server was started with {self.paths}')
+        with self.joins_lock:
+            joins = copy_joins(self.joins)
+        solve(
+            self.airlines, 
+            self.airports, 
+            self.routes, 
+            request['question'], 
+            request['graph_type'], 
+            joins, 
+            request.get('output', '.'), 
+            workers=1, 
+            country=request.get('country', 'Canada'), 
+            query=request.get('query'), 
+            airport_filter=request.get('filter')
+        )
+        with self.joins_lock:
+            publish_joins(self.joins, joins)
+
+
+def serve(socket_path: str, airlines_path: str, airports_path: str, routes_path: str) -> None:
+    """Runs the query server until it is interrupted
+
+    Parameters
+    ----------
+    socket_path: str
+        Path of the unix socket to listen on, replaced if it already exists
+    airlines_path: str
+        Path of airlines.yaml
+    airports_path: str
+        Path of airports.yaml
+    routes_path: str
+        Path of routes.yaml
+    """
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    with QueryServer(socket_path, airlines_path, airports_path, routes_path) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(socket_path)
+
+
+def main() -> None:
+    """Formats arguments from command line, then loads airline data and calls solve function, 
+       or starts a query server when --SERVE="socket path" is given. With --PROFILE="trace.json" 
+       or the ROUTE_MANAGER_PROFILE environment variable, the run is written to a trace file"""
+    options = parse_args(sys.argv[1:])
+    profile_path = options.get('PROFILE') or os.environ.get(PROFILE_VARIABLE)
+    if not profile_path:
+        run(options)
+        return
+
+    enable_profile('PROFILE_MEMORY' in options or bool(os.environ.get(PROFILE_MEMORY_VARIABLE)))
+    try:
+        with profile_span('main'):
+            run(options)
+    finally:
+        write_profile(profile_path)
+
+
+def run(options: dict) -> None:
+    """Runs the command line options, see main
+
+    Parameters
+    ----------
+    options: dict
+        The command line options, see parse_args
+    """
+    if 'SERVE' in options:
+        serve(options['SERVE'], options['AIRLINES'], options['AIRPORTS'], options['ROUTES'])
+        return
+    if 'AGGREGATES' in options:
+        solve_from_aggregates(options)
+        return
+    if 'CONVERT' in options:
+        convert_datasets(options)
+        return
+    if 'OUT_OF_CORE' in options:
+        solve_out_of_core(options)
+        return
+
+    airport_filter = filter_options(options)
+    query = graph_query(options)
+    check_query(options['QUESTION'], query)
+    workers = int(options['WORKERS']) if options.get('WORKERS') else None
+    airlines, airports, routes = load_datasets(
+        options['AIRLINES'], 
+        options['AIRPORTS'], 
+        options['ROUTES'], 
+        question_columns(options['QUESTION'], airport_filter), 
+        workers
+    )
+
+    solve(
+        airlines, 
+        airports, 
+        routes, 
+        options['QUESTION'], 
+        options['GRAPH_TYPE'], 
+        output=options.get('OUTPUT', '.'), 
+        workers=workers, 
+        country=options.get('COUNTRY', 'Canada'), 
+        query=query, 
+        airport_filter=airport_filter
+    )
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
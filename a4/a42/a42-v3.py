@@ -3,7 +3,11 @@
 print(__doc__)
 import random
 
-from typing import NamedTuple, Tuple, List
+from typing import NamedTuple, Tuple, List, Iterator
+
+import numpy as np
+
+SHAPE_TYPES = [0, 1, 3]  # 0: Circle, 1: Rectangle, 3: Ellipse
 
 class PyArtConfig:
     """PyArtConfig class"""
@@ -72,12 +76,45 @@ class RandomShape:
             return f'<ellipse cx="{self.x}" cy="{self.y}" rx="{self.rx}" ry="{self.ry}" fill="rgb({self.red}, {self.green}, {self.blue})" fill-opacity="{self.opacity}"></ellipse>'
         return ""
 
-def generate_random_art_table(num_shapes: int, config: PyArtConfig) -> None:
+def random_integers(generator: np.random.Generator, value_range: Tuple[int, int], count: int) -> np.ndarray:
+    """random_integers() function: count integers between both ends of value_range, like random.randint"""
+    return generator.integers(value_range[0], value_range[1], size=count, dtype=np.int32, endpoint=True)
+
+class RandomShapeBatch:
+    """RandomShapeBatch class: the attributes of many random shapes, one array per attribute"""
+
+    def __init__(self, config: PyArtConfig, count: int, generator: np.random.Generator = None):
+        """__init__ method"""
+        generator = np.random.default_rng() if generator is None else generator
+        self.count = count
+        self.shape_type = generator.choice(np.array(SHAPE_TYPES, dtype=np.int8), size=count)
+        self.x = random_integers(generator, config.x_range, count)
+        self.y = random_integers(generator, config.y_range, count)
+        self.radius = random_integers(generator, config.radius_range, count)
+        self.rx = random_integers(generator, config.rx_range, count)
+        self.ry = random_integers(generator, config.ry_range, count)
+        self.width = random_integers(generator, config.width_range, count)
+        self.height = random_integers(generator, config.height_range, count)
+        self.red = random_integers(generator, config.color_range, count)
+        self.green = random_integers(generator, config.color_range, count)
+        self.blue = random_integers(generator, config.color_range, count)
+        self.opacity = np.round(generator.uniform(*config.opacity_range, size=count), 1)
+
+    def as_Part2_lines(self) -> Iterator[str]:
+        """as_Part2_lines() method: yields the as_Part2_line() of every shape"""
+        columns = zip(self.shape_type.tolist(), self.x.tolist(), self.y.tolist(), self.radius.tolist(), 
+                      self.rx.tolist(), self.ry.tolist(), self.width.tolist(), self.height.tolist(), 
+                      self.red.tolist(), self.green.tolist(), self.blue.tolist(), self.opacity.tolist())
+        for shape_type, x, y, radius, rx, ry, width, height, red, green, blue, opacity in columns:
+            yield (f"{shape_type:2d} {x:4d} {y:4d} {radius:4d} {rx:4d} {ry:4d} "
+                   f"{width:3d} {height:3d} {red:3d} {green:3d} {blue:3d} {opacity:.1f}")
+
+def generate_random_art_table(num_shapes: int, config: PyArtConfig, seed: int = None) -> None:
     """generate_random_art_table() method"""
-    shapes = [RandomShape(config) for _ in range(num_shapes)]
+    shapes = RandomShapeBatch(config, num_shapes, np.random.default_rng(seed))
     print(f"{'CNT':3} {'SHA':3} {'X':4} {'Y':4} {'RAD':4} {'RX':4} {'RY':4} {'W':3} {'H':3} {'R':3} {'G':3} {'B':3} {'OP':2}")
-    for i, shape in enumerate(shapes):
-        print(f"{i:3d} {shape.as_Part2_line()}")
+    for i, line in enumerate(shapes.as_Part2_lines()):
+        print(f"{i:3d} {line}")
 
 def main() -> None:
     """main() method"""
@@ -2,22 +2,54 @@
 """Assignment 4 Part 3"""
 print(__doc__)
 
-import random
-from typing import Tuple, List
+import concurrent.futures
+import json
+import os
+import sys
+import time
+from typing import NamedTuple, Tuple, List, Iterable, Iterator, IO, Dict
+
+import numpy as np
+
+WRITE_BUFFER_SIZE = 1 << 16  # characters gathered before each write to the file
+SHAPE_TYPES = [0, 1, 3]  # 0: Circle, 1: Rectangle, 3: Ellipse
+SHAPE_BATCH_SIZE = 1 << 16  # shapes drawn at once by GreetingCard
+
+def write_chunks(file: IO[str], chunks: Iterable[str], buffer_size: int = WRITE_BUFFER_SIZE) -> None:
+    """write_chunks() function: writes chunks to file in blocks of about buffer_size characters"""
+    buffer = []
+    size = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= buffer_size:
+            file.write("".join(buffer))
+            buffer.clear()
+            size = 0
+    file.write("".join(buffer))
 
 class HtmlComponent:
     """HtmlComponent class"""
     def __init__(self):
         """__init__ method"""
-        self.html_content = ""
+        self.contents = []
 
-    def add(self, content: str) -> None:
-        """add() method"""
-        self.html_content += content
+    def add(self, content) -> None:
+        """add() method: content is a string, or a component such as an SvgCanvas that is only 
+        rendered when the document is"""
+        self.contents.append(content)
+
+    def stream(self) -> Iterator[str]:
+        """stream() method"""
+        for content in self.contents:
+            if isinstance(content, str):
+                yield content
+            else:
+                yield from content.stream()
 
     def render(self) -> str:
         """render() method"""
-        return self.html_content
+        return "".join(self.stream())
 
 class HtmlDocument(HtmlComponent):
     """HtmlDocument class"""
@@ -27,15 +59,25 @@ class HtmlDocument(HtmlComponent):
         super().__init__()
         self.title = title
 
+    def header(self) -> Iterator[str]:
+        """header() method"""
+        yield "<html>\n<head>\n"
+        yield f"   <title>{self.title}</title>\n"
+        yield "</head>\n<body>\n"
+
+    def footer(self) -> Iterator[str]:
+        """footer() method"""
+        yield "</body>\n</html>\n"
+
     def write_header(self) -> None:
         """write_header() method"""
-        self.add("<html>\n<head>\n")
-        self.add(f"   <title>{self.title}</title>\n")
-        self.add("</head>\n<body>\n")
+        for content in self.header():
+            self.add(content)
 
     def write_footer(self) -> None:
         """write_footer() method"""
-        self.add("</body>\n</html>\n")
+        for content in self.footer():
+            self.add(content)
 
 class SvgCanvas:
     """SvgCanvas class"""
@@ -45,22 +87,63 @@ class SvgCanvas:
         self.width = width
         self.height = height
         self.shapes = []
+        self.store = ShapeStore()
 
     def add_shape(self, shape: str) -> None:
         """add_shape() method"""
         self.shapes.append(shape)
 
+    def add_shapes(self, batch: "RandomShapeBatch") -> None:
+        """add_shapes() method: keeps a batch of shapes in the store, they are drawn when rendered"""
+        self.store.extend(batch)
+
+    def stream(self, stores: Iterable["ShapeStore"] = None) -> Iterator[str]:
+        """stream() method: yields the canvas with the shapes of stores, or with the added shapes if None"""
+        yield '   <!--Define SVG drawing box-->\n'
+        yield f'   <svg width="{self.width}" height="{self.height}">\n'
+        if stores is None:
+            for shape in self.shapes:
+                yield f"      {shape}"
+            stores = [self.store]
+        for store in stores:
+            yield from store.serialize("      ")
+        yield '   </svg>\n'
+
     def render(self) -> str:
         """render() method"""
-        content = '   <!--Define SVG drawing box-->\n'
-        content += f'   <svg width="{self.width}" height="{self.height}">\n'
-        for shape in self.shapes:
-            content += f"      {shape}"
-        content += '   </svg>\n'
-        return content
-
-class CircleShape:
+        return "".join(self.stream())
+
+COLOR_COLUMNS = ("red", "green", "blue")
+
+class TemplateShape:
+    """TemplateShape class: a shape drawn by filling its TEMPLATE with the attributes in FIELDS, 
+    the same TEMPLATE ShapeStore.serialize() fills a column at a time"""
+    TEMPLATE = ""
+    FIELDS = ()
+
+    @property
+    def red(self) -> int:
+        """red property"""
+        return self.color[0]
+
+    @property
+    def green(self) -> int:
+        """green property"""
+        return self.color[1]
+
+    @property
+    def blue(self) -> int:
+        """blue property"""
+        return self.color[2]
+
+    def draw(self) -> str:
+        """draw() method"""
+        return self.TEMPLATE % tuple(getattr(self, field) for field in self.FIELDS)
+
+class CircleShape(TemplateShape):
     """CircleShape class"""
+    TEMPLATE = '<circle cx="%s" cy="%s" r="%s" fill="rgb(%s, %s, %s)" fill-opacity="%s"></circle>\n'
+    FIELDS = ("cx", "cy", "radius") + COLOR_COLUMNS + ("opacity",)
 
     def __init__(self, cx: int, cy: int, radius: int, color: Tuple[int, int, int], opacity: float):
         """__init__ method"""
@@ -70,12 +153,10 @@ class CircleShape:
         self.color = color
         self.opacity = opacity
 
-    def draw(self) -> str:
-        """draw() method"""
-        return f'<circle cx="{self.cx}" cy="{self.cy}" r="{self.radius}" fill="rgb({self.color[0]}, {self.color[1]}, {self.color[2]})" fill-opacity="{self.opacity}"></circle>\n'
-
-class RectangleShape:
+class RectangleShape(TemplateShape):
     """RectangleShape class"""
+    TEMPLATE = '<rect x="%s" y="%s" width="%s" height="%s" fill="rgb(%s, %s, %s)" fill-opacity="%s"></rect>\n'
+    FIELDS = ("x", "y", "width", "height") + COLOR_COLUMNS + ("opacity",)
 
     def __init__(self, x: int, y: int, width: int, height: int, color: Tuple[int, int, int], opacity: float):
         """__init__ method"""
@@ -86,12 +167,10 @@ class RectangleShape:
         self.color = color
         self.opacity = opacity
 
-    def draw(self) -> str:
-        """draw() method"""
-        return f'<rect x="{self.x}" y="{self.y}" width="{self.width}" height="{self.height}" fill="rgb({self.color[0]}, {self.color[1]}, {self.color[2]})" fill-opacity="{self.opacity}"></rect>\n'
-
-class EllipseShape:
+class EllipseShape(TemplateShape):
     """EllipseShape class"""
+    TEMPLATE = '<ellipse cx="%s" cy="%s" rx="%s" ry="%s" fill="rgb(%s, %s, %s)" fill-opacity="%s"></ellipse>\n'
+    FIELDS = ("cx", "cy", "rx", "ry") + COLOR_COLUMNS + ("opacity",)
 
     def __init__(self, cx: int, cy: int, rx: int, ry: int, color: Tuple[int, int, int], opacity: float):
         """__init__ method"""
@@ -102,9 +181,178 @@ class EllipseShape:
         self.color = color
         self.opacity = opacity
 
+SHAPE_CLASSES = {0: CircleShape, 1: RectangleShape, 3: EllipseShape}
+# Columns of every shape type in a ShapeStore, named like the attributes of its class
+SHAPE_COLUMNS = {
+    0: ("cx", "cy", "radius"),
+    1: ("x", "y", "width", "height"),
+    3: ("cx", "cy", "rx", "ry")
+}
+class ShapeView:
+    """ShapeView class: one shape of a ShapeStore, read and written through the store arrays. 
+    A view is only valid until the store is extended or filtered"""
+    __slots__ = ("columns", "shape_type", "row")
+
+    def __init__(self, columns: Dict[str, np.ndarray], shape_type: int, row: int):
+        """__init__ method"""
+        object.__setattr__(self, "columns", columns)
+        object.__setattr__(self, "shape_type", shape_type)
+        object.__setattr__(self, "row", row)
+
+    def __getattr__(self, name: str):
+        """__getattr__() method: the attributes of the shape class, e.g. cx, color and opacity"""
+        if name == "color":
+            return tuple(self.columns[column][self.row].item() for column in COLOR_COLUMNS)
+        try:
+            return self.columns[name][self.row].item()
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name: str, value) -> None:
+        """__setattr__() method"""
+        if name == "color":
+            for column, component in zip(COLOR_COLUMNS, value):
+                self.columns[column][self.row] = component
+        elif name in self.columns and name != "position":
+            self.columns[name][self.row] = value
+        else:
+            raise AttributeError(name)
+
     def draw(self) -> str:
-        """draw() method"""
-        return f'<ellipse cx="{self.cx}" cy="{self.cy}" rx="{self.rx}" ry="{self.ry}" fill="rgb({self.color[0]}, {self.color[1]}, {self.color[2]})" fill-opacity="{self.opacity}"></ellipse>\n'
+        """draw() method: the same element as the draw() method of the shape class"""
+        shape_class = SHAPE_CLASSES[self.shape_type]
+        return shape_class.TEMPLATE % tuple(getattr(self, field) for field in shape_class.FIELDS)
+
+def column_text(values: np.ndarray) -> List[str]:
+    """column_text() function: str(value) of every value, computed once per distinct value. 
+    Floats are told apart by their bits, so 0.0 and -0.0 keep their own text"""
+    if values.dtype.kind in "iu" and len(values):
+        # Small integer ranges are looked up in a table of every value between the extremes
+        low = int(values.min())
+        high = int(values.max())
+        if high - low <= max(len(values), 1 << 16):
+            texts = np.array([str(value) for value in range(low, high + 1)], dtype=object)
+            return texts[values - low].tolist()
+    keys = values.view(f"i{values.itemsize}") if values.dtype.kind == "f" else values
+    distinct, inverse = np.unique(keys, return_inverse=True)
+    texts = np.array([str(value) for value in distinct.view(values.dtype).tolist()], dtype=object)
+    return texts[inverse].tolist()
+
+def serialize_shapes(shape_class: type, columns: Dict[str, np.ndarray], start: int, stop: int, indent: str = "") -> np.ndarray:
+    """serialize_shapes() function: the svg elements of rows start to stop of the columns of a 
+    ShapeStore as one row of pieces per element, the text of each column of FIELDS between the 
+    literal parts of the TEMPLATE of shape_class, so that joining a row gives the element"""
+    parts = shape_class.TEMPLATE.split("%s")
+    parts[0] = indent + parts[0]
+    pieces = np.empty((stop - start, 2 * len(parts) - 1), dtype=object)
+    pieces[:, 0::2] = parts
+    for index, name in enumerate(shape_class.FIELDS):
+        pieces[:, 2 * index + 1] = column_text(columns[name][start:stop])
+    return pieces
+
+class ShapeStore:
+    """ShapeStore class: shapes kept as one array per attribute and shape type, in the order 
+    they were added, and only turned into svg elements by draw()"""
+
+    def __init__(self):
+        """__init__ method"""
+        self.chunks = {shape_type: [] for shape_type in SHAPE_COLUMNS}
+        self.arrays = {}
+        self.order = None
+        self.count = 0
+
+    def extend(self, batch: "RandomShapeBatch") -> None:
+        """extend() method: adds the shapes of a RandomShapeBatch after the current ones"""
+        for shape_type, names in SHAPE_COLUMNS.items():
+            rows = np.flatnonzero(batch.shape_type == shape_type)
+            # The shape classes name the position cx, cy or x, y depending on the type
+            sources = ("x", "y") + names[2:]
+            chunk = {name: getattr(batch, source)[rows] for name, source in zip(names, sources)}
+            chunk.update({name: getattr(batch, name)[rows] for name in COLOR_COLUMNS})
+            chunk["opacity"] = batch.opacity[rows]
+            chunk["position"] = self.count + rows
+            self.chunks[shape_type].append(chunk)
+        self.count += batch.count
+        self.arrays = {}
+        self.order = None
+
+    def columns(self, shape_type: int) -> Dict[str, np.ndarray]:
+        """columns() method: the arrays of one shape type, which can be modified in place"""
+        if shape_type not in self.arrays:
+            chunks = self.chunks[shape_type]
+            if len(chunks) != 1:
+                names = SHAPE_COLUMNS[shape_type] + COLOR_COLUMNS + ("opacity", "position")
+                empty = {name: np.empty(0, dtype=np.float64 if name == "opacity" else np.int64) for name in names}
+                chunks[:] = [{name: np.concatenate([chunk[name] for chunk in chunks] or [empty[name]]) for name in names}]
+            self.arrays[shape_type] = chunks[0]
+        return self.arrays[shape_type]
+
+    def filter(self, shape_type: int, keep: np.ndarray) -> None:
+        """filter() method: keeps the shapes of shape_type where keep is True, e.g. 
+        store.filter(0, store.columns(0)["radius"] > 10)"""
+        columns = self.columns(shape_type)
+        self.chunks[shape_type] = [{name: column[keep] for name, column in columns.items()}]
+        self.arrays.pop(shape_type)
+        self.order = None
+
+    def ordered(self) -> Tuple[np.ndarray, np.ndarray]:
+        """ordered() method: the shape type and row of every shape, in the order they were added"""
+        if self.order is None:
+            types = np.concatenate([np.full(len(self.columns(shape_type)["position"]), shape_type, dtype=np.int8) 
+                                    for shape_type in SHAPE_COLUMNS])
+            rows = np.concatenate([np.arange(len(self.columns(shape_type)["position"])) for shape_type in SHAPE_COLUMNS])
+            positions = np.concatenate([self.columns(shape_type)["position"] for shape_type in SHAPE_COLUMNS])
+            order = np.argsort(positions, kind="stable")
+            self.order = (types[order], rows[order])
+        return self.order
+
+    def __len__(self) -> int:
+        """__len__() method"""
+        return len(self.ordered()[0])
+
+    def __getitem__(self, index: int) -> ShapeView:
+        """__getitem__() method: a view of the index-th shape"""
+        types, rows = self.ordered()
+        shape_type = int(types[index])
+        return ShapeView(self.columns(shape_type), shape_type, int(rows[index]))
+
+    def __iter__(self) -> Iterator[ShapeView]:
+        """__iter__() method"""
+        types, rows = self.ordered()
+        columns = {shape_type: self.columns(shape_type) for shape_type in SHAPE_COLUMNS}
+        for shape_type, row in zip(types.tolist(), rows.tolist()):
+            yield ShapeView(columns[shape_type], shape_type, row)
+
+    def elements(self, indent: str = "") -> Iterator[np.ndarray]:
+        """elements() method: yields the svg elements of SHAPE_BATCH_SIZE shapes at a time, in the 
+        order the shapes were added, as one row of pieces per element (see serialize_shapes), 
+        padded with empty pieces, each element after indent"""
+        types, rows = self.ordered()
+        width = max(2 * len(shape_class.FIELDS) + 1 for shape_class in SHAPE_CLASSES.values())
+        for start in range(0, len(types), SHAPE_BATCH_SIZE):
+            block = types[start:start + SHAPE_BATCH_SIZE]
+            block_rows = rows[start:start + SHAPE_BATCH_SIZE]
+            pieces = np.full((len(block), width), "", dtype=object)
+            for shape_type, shape_class in SHAPE_CLASSES.items():
+                selected = block == shape_type
+                if selected.any():
+                    # The rows of a type are consecutive within a block
+                    selected_rows = block_rows[selected]
+                    shape_pieces = serialize_shapes(shape_class, self.columns(shape_type), int(selected_rows[0]), 
+                                                    int(selected_rows[-1]) + 1, indent)
+                    pieces[selected, :shape_pieces.shape[1]] = shape_pieces
+            yield pieces
+
+    def draw(self) -> Iterator[str]:
+        """draw() method: yields the svg element of every shape"""
+        for pieces in self.elements():
+            yield from map("".join, pieces.tolist())
+
+    def serialize(self, indent: str = "") -> Iterator[str]:
+        """serialize() method: yields the svg elements of SHAPE_BATCH_SIZE shapes at a time as one 
+        string, each element after indent"""
+        for pieces in self.elements(indent):
+            yield "".join(pieces.ravel().tolist())
 
 class PyArtConfig:
     """PyArtConfig class"""
@@ -129,62 +377,165 @@ class PyArtConfig:
         self.color_range = color_range
         self.opacity_range = opacity_range
 
-class RandomShape:
-    """RandomShape class"""
-
-    count: int = 0
-    def __init__(self, config: PyArtConfig):
-        """__init__ method"""
-        RandomShape.count += 1
-        self.shape_type = random.choice([0, 1, 3])  # 0: Circle, 1: Rectangle, 3: Ellipse
-        self.x = random.randint(*config.x_range)
-        self.y = random.randint(*config.y_range)
-        self.radius = random.randint(*config.radius_range)
-        self.rx = random.randint(*config.rx_range)
-        self.ry = random.randint(*config.ry_range)
-        self.width = random.randint(*config.width_range)
-        self.height = random.randint(*config.height_range)
-        self.red = random.randint(*config.color_range)
-        self.green = random.randint(*config.color_range)
-        self.blue = random.randint(*config.color_range)
-        self.opacity = round(random.uniform(*config.opacity_range), 1)
-
-    def draw(self) -> str:
-        """draw() method"""
-        if self.shape_type == 0:
-            return CircleShape(self.x, self.y, self.radius, (self.red, self.green, self.blue), self.opacity).draw()
-        elif self.shape_type == 1:
-            return RectangleShape(self.x, self.y, self.width, self.height, (self.red, self.green, self.blue), self.opacity).draw()
-        elif self.shape_type == 3:
-            return EllipseShape(self.x, self.y, self.rx, self.ry, (self.red, self.green, self.blue), self.opacity).draw()
-        return ""
+def random_integers(generator: np.random.Generator, value_range: Tuple[int, int], count: int) -> np.ndarray:
+    """random_integers() function: count integers between both ends of value_range, like random.randint"""
+    return generator.integers(value_range[0], value_range[1], size=count, dtype=np.int32, endpoint=True)
+
+class RandomShapeBatch:
+    """RandomShapeBatch class: the attributes of many random shapes, one array per attribute"""
+
+    def __init__(self, config: PyArtConfig, count: int, generator: np.random.Generator = None):
+        """__init__ method: only the sizes a shape type uses are drawn, the others stay 0"""
+        generator = np.random.default_rng() if generator is None else generator
+        self.count = count
+        self.shape_type = generator.choice(np.array(SHAPE_TYPES, dtype=np.int8), size=count)
+        self.x = random_integers(generator, config.x_range, count)
+        self.y = random_integers(generator, config.y_range, count)
+        self.radius = np.zeros(count, dtype=np.int32)
+        self.rx = np.zeros(count, dtype=np.int32)
+        self.ry = np.zeros(count, dtype=np.int32)
+        self.width = np.zeros(count, dtype=np.int32)
+        self.height = np.zeros(count, dtype=np.int32)
+        for shape_type, columns in ((0, [(self.radius, config.radius_range)]), 
+                                    (1, [(self.width, config.width_range), (self.height, config.height_range)]), 
+                                    (3, [(self.rx, config.rx_range), (self.ry, config.ry_range)])):
+            rows = np.flatnonzero(self.shape_type == shape_type)
+            for column, value_range in columns:
+                column[rows] = random_integers(generator, value_range, len(rows))
+        self.red = random_integers(generator, config.color_range, count)
+        self.green = random_integers(generator, config.color_range, count)
+        self.blue = random_integers(generator, config.color_range, count)
+        self.opacity = np.round(generator.uniform(*config.opacity_range, size=count), 1)
+
+    def draw(self) -> Iterator[str]:
+        """draw() method: yields the svg element of every shape, as the draw() method of its shape class does"""
+        store = ShapeStore()
+        store.extend(self)
+        return store.draw()
 
 class GreetingCard:
     """GreetingCard class"""
 
-    def __init__(self, title: str, width: int, height: int, num_shapes: int, config: PyArtConfig):
+    def __init__(self, title: str, width: int, height: int, num_shapes: int, config: PyArtConfig, seed: int = None):
         """__init__ method"""
         self.document = HtmlDocument(title)
         self.canvas = SvgCanvas(width, height)
         self.config = config
         self.num_shapes = num_shapes
+        self.seed = seed
+        self.generated = False
+
+    def random_batches(self) -> Iterator[RandomShapeBatch]:
+        """random_batches() method: draws the random shapes of the card in batches of SHAPE_BATCH_SIZE, 
+        the same shapes for the same seed"""
+        generator = np.random.default_rng(self.seed)
+        for start in range(0, self.num_shapes, SHAPE_BATCH_SIZE):
+            yield RandomShapeBatch(self.config, min(SHAPE_BATCH_SIZE, self.num_shapes - start), generator)
+
+    def random_stores(self) -> Iterator[ShapeStore]:
+        """random_stores() method: the random shapes of the card, one batch per store"""
+        for batch in self.random_batches():
+            store = ShapeStore()
+            store.extend(batch)
+            yield store
+
+    def random_shapes(self) -> Iterator[str]:
+        """random_shapes() method: draws the random shapes of the card one batch at a time"""
+        for store in self.random_stores():
+            yield from store.draw()
 
     def generate_card(self):
-        """generate_card() method"""
+        """generate_card() method: writes the card to the document, which render() returns in full. 
+        The random shapes are kept in the canvas store, where they can be changed or filtered 
+        before the document is rendered or saved"""
         self.document.write_header()
-        for _ in range(self.num_shapes):
-            shape = RandomShape(self.config)
-            self.canvas.add_shape(shape.draw())
-        self.document.add(self.canvas.render())
+        for batch in self.random_batches():
+            self.canvas.add_shapes(batch)
+        self.document.add(self.canvas)
         self.document.write_footer()
+        self.generated = True
+
+    def stream(self) -> Iterator[str]:
+        """stream() method: yields the document made by generate_card, or when it was not called, 
+        a new card whose shapes are drawn as they are yielded. Whatever was added to the document 
+        comes between its header and the canvas"""
+        if self.generated:
+            yield from self.document.stream()
+            return
+        yield from self.document.header()
+        yield from self.document.stream()
+        if self.canvas.shapes or len(self.canvas.store):
+            yield from self.canvas.stream()
+        else:
+            yield from self.canvas.stream(self.random_stores())
+        yield from self.document.footer()
 
     def save(self, filename: str) -> None:
         """save() method"""
         with open(filename, "w") as f:
-            f.write(self.document.render())
+            write_chunks(f, self.stream())
+
+class CardSpec(NamedTuple):
+    """CardSpec class: one card of a manifest, config holds the PyArtConfig arguments"""
+    title: str
+    width: int
+    height: int
+    num_shapes: int
+    config: Dict[str, List[float]]
+    seed: int
+    output: str
+
+def card_seed(base_seed: int, index: int) -> int:
+    """card_seed() function: the seed of the index-th card of a manifest that does not give one"""
+    return int(np.random.SeedSequence([base_seed, index]).generate_state(1)[0])
+
+def read_manifest(path: str, base_seed: int = 0) -> List[CardSpec]:
+    """read_manifest() function: reads a json list of cards, each with the fields of CardSpec. 
+    The seed may be left out, the card then gets card_seed(base_seed, its position)"""
+    with open(path) as f:
+        entries = json.load(f)
+    return [
+        CardSpec(entry["title"], entry["width"], entry["height"], entry["num_shapes"], entry.get("config", {}), 
+                 card_seed(base_seed, index) if entry.get("seed") is None else entry["seed"], entry["output"])
+        for index, entry in enumerate(entries)
+    ]
+
+def render_card(card: CardSpec) -> float:
+    """render_card() function: saves one card and returns how many seconds it took"""
+    start = time.perf_counter()
+    config = PyArtConfig(**{name: tuple(value) for name, value in card.config.items()})
+    GreetingCard(card.title, card.width, card.height, card.num_shapes, config, card.seed).save(card.output)
+    return time.perf_counter() - start
+
+def render_cards(cards: List[CardSpec], workers: int = None) -> List[float]:
+    """render_cards() function: saves the cards over a pool of processes and returns the seconds 
+    of every card. Every card is drawn from its own seed, so the files are the same whichever 
+    worker renders them"""
+    workers = min(len(cards), workers or os.cpu_count() or 1)
+    if workers <= 1:
+        return [render_card(card) for card in cards]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(render_card, cards, chunksize=max(1, len(cards) // (4 * workers))))
+
+def report_cards(cards: List[CardSpec], seconds: List[float], elapsed: float) -> None:
+    """report_cards() function: prints the time of every card and the throughput of the batch"""
+    for card, card_seconds in zip(cards, seconds):
+        print(f"{card.output:<40} {card.num_shapes:10d} shapes {card_seconds * 1000:10.1f} ms")
+    num_shapes = sum(card.num_shapes for card in cards)
+    print(f"{len(cards)} cards, {num_shapes} shapes in {elapsed:.2f} s: "
+          f"{len(cards) / elapsed:.1f} cards/s, {num_shapes / elapsed:.0f} shapes/s")
 
 def main() -> None:
-    """main() method"""
+    """main() method: with --MANIFEST="cards.json", renders the cards of the manifest over 
+    --WORKERS="n" processes (the number of CPUs by default), --SEED="n" seeds the cards without 
+    a seed of their own"""
+    options = dict(argument.lstrip("-").split("=", 1) for argument in sys.argv[1:] if "=" in argument)
+    if "MANIFEST" in options:
+        cards = read_manifest(options["MANIFEST"], int(options.get("SEED", 0)))
+        start = time.perf_counter()
+        seconds = render_cards(cards, int(options["WORKERS"]) if options.get("WORKERS") else None)
+        report_cards(cards, seconds, time.perf_counter() - start)
+        return
 
     config_one = PyArtConfig()
     greeting_card = GreetingCard("First Insance", 500, 300, 1000, config_one)
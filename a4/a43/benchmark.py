@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+"""
+Benchmarks for a43-v3.py
+Sample input: ./benchmark.py stream 1000000, ./benchmark.py batch 1000 100000 10000000, 
+./benchmark.py store 10000000, ./benchmark.py cards 1000 5000 8, 
+./benchmark.py serialize 10000000
+"""
+
+import importlib.util
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_a43():
+    """Imports a43-v3.py, whose name is not a valid module name"""
+    spec = importlib.util.spec_from_file_location("a43", os.path.join(FOLDER, "a43-v3.py"))
+    module = importlib.util.module_from_spec(spec)
+    # Registered so that worker processes can find its functions
+    sys.modules["a43"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+a43 = load_a43()
+
+
+def timed(function, *args, **kwargs):
+    """Calls function and returns its result together with the elapsed wall time in seconds"""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def traced(function, *args, **kwargs):
+    """Calls function and returns its result, the elapsed wall time in seconds and the peak of the
+    Python allocations in MB"""
+    tracemalloc.start()
+    try:
+        result, seconds = timed(function, *args, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def print_row(label: str, seconds: float, peak: float = None) -> None:
+    """Prints one line of benchmark output"""
+    line = f"{label:<40} {seconds * 1000:10.1f} ms"
+    print(line if peak is None else f"{line} {peak:10.1f} MB")
+
+
+def read_file(path: str) -> str:
+    """Returns the content of a text file"""
+    with open(path) as file:
+        return file.read()
+
+
+def bench_stream(num_shapes: int = 100000, seed: int = 431) -> None:
+    """Saves a card of num_shapes shapes built in memory with generate_card, then streamed shape by
+    shape, checks that the files are the same as the document render() gives and reports the time 
+    and peak memory of both"""
+
+    def in_memory(path: str) -> None:
+        card = a43.GreetingCard("Benchmark", 500, 300, num_shapes, a43.PyArtConfig(), seed)
+        card.generate_card()
+        card.save(path)
+
+    def streamed(path: str) -> None:
+        a43.GreetingCard("Benchmark", 500, 300, num_shapes, a43.PyArtConfig(), seed).save(path)
+
+    with tempfile.TemporaryDirectory() as folder:
+        paths = []
+        for label, save in (("generate_card and save", in_memory), ("streamed save", streamed)):
+            paths.append(os.path.join(folder, f"{save.__name__}.html"))
+            _, seconds, peak = traced(save, paths[-1])
+            print_row(f"{num_shapes} shapes, {label}", seconds, peak)
+        same = read_file(paths[0]) == read_file(paths[1])
+        card = a43.GreetingCard("Benchmark", 500, 300, num_shapes, a43.PyArtConfig(), seed)
+        card.generate_card()
+        rendered = card.document.render() == read_file(paths[0])
+
+    if not same:
+        print("ERROR: the streamed card differs from the one built in memory")
+        sys.exit(1)
+    if not rendered:
+        print("ERROR: the saved card differs from the rendered document")
+        sys.exit(1)
+
+
+def random_shape_loop(config, num_shapes: int) -> None:
+    """Draws the attributes of num_shapes shapes one shape at a time with the random module, the
+    way the RandomShape class of a42 does, without keeping them"""
+    for _ in range(num_shapes):
+        random.choice(a43.SHAPE_TYPES)
+        for value_range in (config.x_range, config.y_range, config.radius_range, config.rx_range, config.ry_range,
+                            config.width_range, config.height_range, config.color_range, config.color_range,
+                            config.color_range):
+            random.randint(*value_range)
+        round(random.uniform(*config.opacity_range), 1)
+
+
+def bench_batch(*sizes: int) -> None:
+    """Draws the attributes of 1e3, 1e5 and 1e7 random shapes (or the sizes given) one shape at a
+    time and at once with RandomShapeBatch, and checks that the batch stays within the ranges
+    of PyArtConfig"""
+    config = a43.PyArtConfig()
+    for num_shapes in sizes or (1000, 100000, 10000000):
+        random.seed(num_shapes)
+        _, loop_seconds = timed(random_shape_loop, config, num_shapes)
+        print_row(f"{num_shapes} shapes, one at a time", loop_seconds)
+        batch, batch_seconds = timed(a43.RandomShapeBatch, config, num_shapes, np.random.default_rng(num_shapes))
+        print_row(f"{num_shapes} shapes, RandomShapeBatch", batch_seconds)
+        print(f"{'speedup':<40} {loop_seconds / batch_seconds:10.1f}x")
+
+        circles = batch.shape_type == 0
+        in_range = (
+            np.isin(batch.shape_type, a43.SHAPE_TYPES).all()
+            and (batch.x >= config.x_range[0]).all() and (batch.x <= config.x_range[1]).all()
+            and (batch.radius[circles] >= config.radius_range[0]).all() and (batch.radius[circles] <= config.radius_range[1]).all()
+            and (batch.radius[~circles] == 0).all()
+            and (batch.opacity >= config.opacity_range[0]).all() and (batch.opacity <= config.opacity_range[1]).all()
+        )
+        if not in_range:
+            print("ERROR: RandomShapeBatch drew values outside of the PyArtConfig ranges")
+            sys.exit(1)
+
+
+def bench_store(num_shapes: int = 1000000, seed: int = 433) -> None:
+    """Keeps num_shapes random shapes as the list of svg elements SvgCanvas.add_shape() holds and in
+    a ShapeStore, reports the time and peak memory of both and checks that the store draws the same
+    elements, also after filtering out the small circles"""
+    config = a43.PyArtConfig()
+
+    def keep_strings() -> list:
+        batch = a43.RandomShapeBatch(config, num_shapes, np.random.default_rng(seed))
+        return list(batch.draw())
+
+    def keep_store() -> a43.ShapeStore:
+        store = a43.ShapeStore()
+        store.extend(a43.RandomShapeBatch(config, num_shapes, np.random.default_rng(seed)))
+        len(store)
+        return store
+
+    strings, seconds, peak = traced(keep_strings)
+    print_row(f"{num_shapes} shapes as svg elements", seconds, peak)
+    store, seconds, peak = traced(keep_store)
+    print_row(f"{num_shapes} shapes in a ShapeStore", seconds, peak)
+    drawn, seconds = timed(lambda: list(store.draw()))
+    print_row(f"draw {num_shapes} shapes from the store", seconds)
+    same = drawn == strings
+    del drawn
+
+    store.filter(0, store.columns(0)["radius"] >= 50)
+    _, seconds = timed(lambda: [view.opacity for view in store])
+    print_row(f"read opacity of {len(store)} shape views", seconds)
+    kept = [element for element in strings if not element.startswith("<circle") or int(element.split('r="')[1].split('"')[0]) >= 50]
+    if not same or list(store.draw()) != kept:
+        print("ERROR: the store draws other elements than the shapes it was given")
+        sys.exit(1)
+
+
+def draw_objects(batch) -> list:
+    """Draws every shape of a RandomShapeBatch through a CircleShape, RectangleShape or EllipseShape"""
+    columns = zip(batch.shape_type.tolist(), batch.x.tolist(), batch.y.tolist(), batch.radius.tolist(),
+                  batch.rx.tolist(), batch.ry.tolist(), batch.width.tolist(), batch.height.tolist(),
+                  batch.red.tolist(), batch.green.tolist(), batch.blue.tolist(), batch.opacity.tolist())
+    elements = []
+    for shape_type, x, y, radius, rx, ry, width, height, red, green, blue, opacity in columns:
+        if shape_type == 0:
+            elements.append(a43.CircleShape(x, y, radius, (red, green, blue), opacity).draw())
+        elif shape_type == 1:
+            elements.append(a43.RectangleShape(x, y, width, height, (red, green, blue), opacity).draw())
+        else:
+            elements.append(a43.EllipseShape(x, y, rx, ry, (red, green, blue), opacity).draw())
+    return elements
+
+
+def bench_serialize(num_shapes: int = 1000000, seed: int = 435) -> None:
+    """Serializes num_shapes random shapes with the draw() method of their classes and with the
+    TEMPLATE of their classes through a ShapeStore, reports elements per second and checks that the
+    text is byte-identical"""
+    batch = a43.RandomShapeBatch(a43.PyArtConfig(), num_shapes, np.random.default_rng(seed))
+    store = a43.ShapeStore()
+    store.extend(batch)
+    len(store)
+
+    expected, seconds = timed(lambda: "".join(draw_objects(batch)))
+    print_row(f"{num_shapes} shapes, draw() per object", seconds)
+    print(f"{'elements/s':<40} {num_shapes / seconds:10.0f}")
+    serialized, seconds = timed(lambda: "".join(store.serialize()))
+    print_row(f"{num_shapes} shapes, shape templates", seconds)
+    print(f"{'elements/s':<40} {num_shapes / seconds:10.0f}")
+
+    if serialized != expected:
+        print("ERROR: the shape templates differ from the draw() methods")
+        sys.exit(1)
+
+
+def bench_cards(num_cards: int = 200, num_shapes: int = 2000, workers: int = 0) -> None:
+    """Renders a manifest of num_cards cards with different configs and no seeds in one process and
+    over workers processes (the number of CPUs by default), reports the throughput of both and
+    checks that the files are the same"""
+    configs = [
+        {},
+        {"x_range": [0, 1000], "color_range": [0, 100], "opacity_range": [0.5, 1.0]},
+        {"x_range": [250, 500], "color_range": [155, 255], "opacity_range": [0.5, 1.0]}
+    ]
+    with tempfile.TemporaryDirectory() as folder:
+        contents = []
+        for label, processes in (("1 process", 1), (f"{workers or os.cpu_count()} processes", workers or None)):
+            output = os.path.join(folder, str(processes))
+            os.mkdir(output)
+            entries = [
+                {"title": f"Card {index}", "width": 500, "height": 300, "num_shapes": num_shapes,
+                 "config": configs[index % len(configs)], "output": os.path.join(output, f"card{index}.html")}
+                for index in range(num_cards)
+            ]
+            manifest = os.path.join(folder, f"cards{processes}.json")
+            with open(manifest, "w") as file:
+                json.dump(entries, file)
+            cards = a43.read_manifest(manifest, 434)
+            _, seconds = timed(a43.render_cards, cards, processes)
+            print_row(f"{num_cards} cards, {label}", seconds)
+            print(f"{'cards/s':<40} {num_cards / seconds:10.1f}")
+            print(f"{'shapes/s':<40} {num_cards * num_shapes / seconds:10.0f}")
+            contents.append([read_file(card.output) for card in cards])
+
+    if contents[0] != contents[1]:
+        print("ERROR: the cards depend on the number of processes")
+        sys.exit(1)
+
+
+BENCHMARKS = {
+    "stream": bench_stream,
+    "batch": bench_batch,
+    "store": bench_store,
+    "cards": bench_cards,
+    "serialize": bench_serialize
+}
+
+
+def main() -> None:
+    """Runs the benchmark named on the command line with its optional integer arguments, or all
+    benchmarks with their defaults"""
+    if len(sys.argv) > 1:
+        print(f"== {sys.argv[1]} ==")
+        BENCHMARKS[sys.argv[1]](*[int(value) for value in sys.argv[2:]])
+        return
+    for name, benchmark in BENCHMARKS.items():
+        print(f"== {name} ==")
+        benchmark()
+
+
+if __name__ == "__main__":
+    main()